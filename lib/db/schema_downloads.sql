@@ -29,7 +29,18 @@ CREATE TABLE IF NOT EXISTS download_jobs (
   started_at TIMESTAMP WITH TIME ZONE,
   completed_at TIMESTAMP WITH TIME ZONE,
   created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-  error_message TEXT
+  error_message TEXT,
+  claimed_by VARCHAR(100),
+  claimed_at TIMESTAMP WITH TIME ZONE,
+  heartbeat_at TIMESTAMP WITH TIME ZONE,
+  lease_expires_at TIMESTAMP WITH TIME ZONE,
+  priority INTEGER DEFAULT 0
+);
+
+-- Per-user fair-share weights for the download scheduler (default 1)
+CREATE TABLE IF NOT EXISTS download_user_shares (
+  user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+  weight NUMERIC NOT NULL DEFAULT 1 CHECK (weight > 0)
 );
 
 -- Download logs table (tracks individual file downloads)
@@ -49,6 +60,39 @@ CREATE TABLE IF NOT EXISTS download_logs (
   updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Durable per-filing task queue (leased to any worker replica)
+CREATE TABLE IF NOT EXISTS download_tasks (
+  id SERIAL PRIMARY KEY,
+  job_id INTEGER REFERENCES download_jobs(id) ON DELETE CASCADE NOT NULL,
+  company_id INTEGER REFERENCES companies(id) NOT NULL,
+  year INTEGER NOT NULL,
+  quarter VARCHAR(10) NOT NULL,
+  status VARCHAR(20) DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'done', 'failed', 'cancelled')),
+  attempts INTEGER DEFAULT 0,
+  log_id INTEGER REFERENCES download_logs(id) ON DELETE SET NULL,
+  leased_by VARCHAR(100),
+  lease_expires_at TIMESTAMP WITH TIME ZONE,
+  error_message TEXT,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  UNIQUE(job_id, company_id, year, quarter)
+);
+
+-- Wake idle workers immediately (LISTEN download_jobs) when a job becomes pending
+CREATE OR REPLACE FUNCTION notify_download_job() RETURNS trigger AS $$
+BEGIN
+  IF NEW.status = 'pending' THEN
+    PERFORM pg_notify('download_jobs', NEW.id::text);
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_download_jobs_notify ON download_jobs;
+CREATE TRIGGER trg_download_jobs_notify
+  AFTER INSERT OR UPDATE OF status ON download_jobs
+  FOR EACH ROW EXECUTE FUNCTION notify_download_job();
+
 -- Shared filings (财报永久存储, 所有用户共享, 按公司/年/季度去重)
 CREATE TABLE IF NOT EXISTS shared_filings (
   id SERIAL PRIMARY KEY,
@@ -60,17 +104,65 @@ CREATE TABLE IF NOT EXISTS shared_filings (
   content_type VARCHAR(100) DEFAULT 'text/html',
   file_size BIGINT NOT NULL,
   file_content BYTEA NOT NULL,
+  content_sha256 VARCHAR(64),  -- strong ETag for conditional/range downloads
   source VARCHAR(50) DEFAULT 'sec_edgar',
   created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
   UNIQUE(company_id, year, quarter)
 );
+-- Uncompressed TOAST so substring() streams a chunk without detoasting the whole file.
+-- Trade-off: filings are stored at full size (HTML would otherwise compress a few
+-- times over); a compressed value is decompressed from byte 0 on every chunk read,
+-- so a large download costs O(size^2) without this. Measure on real data with
+-- worker/benchmarks/bench_blob_storage.py.
+-- Only rows written afterwards are affected: existing compressed rows keep streaming
+-- slowly until rewritten, e.g.
+--   UPDATE shared_filings SET file_content = file_content || ''::bytea
+--   WHERE pg_column_size(file_content) < octet_length(file_content);
+ALTER TABLE shared_filings ALTER COLUMN file_content SET STORAGE EXTERNAL;
+
+-- Coverage matrix (company x period), kept in step with shared_filings by a trigger
+CREATE TABLE IF NOT EXISTS filing_coverage (
+  company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE NOT NULL,
+  year INTEGER NOT NULL,
+  quarter VARCHAR(10) NOT NULL,
+  filing_id INTEGER REFERENCES shared_filings(id) ON DELETE CASCADE NOT NULL,
+  source VARCHAR(50),
+  file_size BIGINT,
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  PRIMARY KEY (company_id, year, quarter)
+);
+
+CREATE OR REPLACE FUNCTION sync_filing_coverage() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO filing_coverage (company_id, year, quarter, filing_id, source, file_size)
+  VALUES (NEW.company_id, NEW.year, NEW.quarter, NEW.id, NEW.source, NEW.file_size)
+  ON CONFLICT (company_id, year, quarter) DO UPDATE SET
+    filing_id = EXCLUDED.filing_id,
+    source = EXCLUDED.source,
+    file_size = EXCLUDED.file_size,
+    updated_at = NOW();
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_shared_filings_coverage ON shared_filings;
+CREATE TRIGGER trg_shared_filings_coverage
+  AFTER INSERT OR UPDATE OF source, file_size ON shared_filings
+  FOR EACH ROW EXECUTE FUNCTION sync_filing_coverage();
 
 -- Indexes
 CREATE INDEX IF NOT EXISTS idx_download_jobs_status ON download_jobs(status);
 CREATE INDEX IF NOT EXISTS idx_download_jobs_user ON download_jobs(user_id);
+CREATE INDEX IF NOT EXISTS idx_download_jobs_pending ON download_jobs(user_id, created_at) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_download_jobs_running_user ON download_jobs(user_id) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_download_jobs_lease ON download_jobs(lease_expires_at) WHERE status = 'running';
 CREATE INDEX IF NOT EXISTS idx_download_logs_job ON download_logs(job_id);
 CREATE INDEX IF NOT EXISTS idx_download_logs_company ON download_logs(company_id);
+CREATE INDEX IF NOT EXISTS idx_download_tasks_runnable ON download_tasks(job_id, id) WHERE status IN ('pending', 'running');
 CREATE INDEX IF NOT EXISTS idx_shared_filings_lookup ON shared_filings(company_id, year, quarter);
+-- Keyset pagination of the filings listing (newest first, optional source filter)
+CREATE INDEX IF NOT EXISTS idx_shared_filings_keyset ON shared_filings(year, quarter, id);
+CREATE INDEX IF NOT EXISTS idx_shared_filings_source_keyset ON shared_filings(source, year, quarter, id);
 CREATE INDEX IF NOT EXISTS idx_companies_category ON companies(category);
 
 -- Seed AI companies (24 companies)
@@ -76,6 +76,19 @@ const migrations = [
   // Safely add user_id to existing download_jobs (no FK constraint for compatibility)
   `ALTER TABLE download_jobs ADD COLUMN IF NOT EXISTS user_id INTEGER`,
 
+  // Atomic job claiming (worker replicas claim with FOR UPDATE SKIP LOCKED)
+  `ALTER TABLE download_jobs ADD COLUMN IF NOT EXISTS claimed_by VARCHAR(100)`,
+  `ALTER TABLE download_jobs ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP WITH TIME ZONE`,
+  // Job leases: the owner heartbeats, expired running jobs are requeued
+  `ALTER TABLE download_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITH TIME ZONE`,
+  `ALTER TABLE download_jobs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITH TIME ZONE`,
+  // Scheduling: explicit priority lane and per-user fair-share weights
+  `ALTER TABLE download_jobs ADD COLUMN IF NOT EXISTS priority INTEGER DEFAULT 0`,
+  `CREATE TABLE IF NOT EXISTS download_user_shares (
+    user_id INTEGER PRIMARY KEY,
+    weight NUMERIC NOT NULL DEFAULT 1 CHECK (weight > 0)
+  )`,
+
   `CREATE TABLE IF NOT EXISTS download_logs (
     id SERIAL PRIMARY KEY,
     job_id INTEGER REFERENCES download_jobs(id) ON DELETE CASCADE,
@@ -92,6 +105,40 @@ const migrations = [
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
   )`,
 
+  // Wake idle workers immediately (LISTEN download_jobs) when a job becomes pending
+  `CREATE OR REPLACE FUNCTION notify_download_job() RETURNS trigger AS $$
+   BEGIN
+     IF NEW.status = 'pending' THEN
+       PERFORM pg_notify('download_jobs', NEW.id::text);
+     END IF;
+     RETURN NEW;
+   END;
+   $$ LANGUAGE plpgsql`,
+  `DROP TRIGGER IF EXISTS trg_download_jobs_notify ON download_jobs`,
+  `CREATE TRIGGER trg_download_jobs_notify
+   AFTER INSERT OR UPDATE OF status ON download_jobs
+   FOR EACH ROW EXECUTE FUNCTION notify_download_job()`,
+
+  // ================================================================
+  // 3b. Durable per-filing task queue (leased to any worker replica)
+  // ================================================================
+  `CREATE TABLE IF NOT EXISTS download_tasks (
+    id SERIAL PRIMARY KEY,
+    job_id INTEGER REFERENCES download_jobs(id) ON DELETE CASCADE NOT NULL,
+    company_id INTEGER REFERENCES companies(id) NOT NULL,
+    year INTEGER NOT NULL,
+    quarter VARCHAR(10) NOT NULL,
+    status VARCHAR(20) DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'done', 'failed', 'cancelled')),
+    attempts INTEGER DEFAULT 0,
+    log_id INTEGER REFERENCES download_logs(id) ON DELETE SET NULL,
+    leased_by VARCHAR(100),
+    lease_expires_at TIMESTAMP WITH TIME ZONE,
+    error_message TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE(job_id, company_id, year, quarter)
+  )`,
+
   // ================================================================
   // 4. Shared filings (SEC 财报永久存储, 所有用户共享)
   // ================================================================
@@ -109,6 +156,56 @@ const migrations = [
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     UNIQUE(company_id, year, quarter)
   )`,
+  // Uncompressed TOAST so substring() streams a chunk without detoasting the whole file.
+  // Costs disk (HTML compresses several times over) in exchange for O(chunk) reads;
+  // see worker/benchmarks/bench_blob_storage.py. Existing compressed rows are not
+  // rewritten here and stream slowly until rewritten (see schema_downloads.sql).
+  `ALTER TABLE shared_filings ALTER COLUMN file_content SET STORAGE EXTERNAL`,
+  // SHA-256 of file_content: strong ETag for conditional/range downloads
+  `ALTER TABLE shared_filings ADD COLUMN IF NOT EXISTS content_sha256 VARCHAR(64)`,
+  `UPDATE shared_filings SET content_sha256 = encode(sha256(file_content), 'hex') WHERE content_sha256 IS NULL`,
+  `ALTER TABLE IF EXISTS user_reports ADD COLUMN IF NOT EXISTS content_sha256 VARCHAR(64)`,
+  // Reports uploaded before the column existed would otherwise never get an
+  // ETag, Cache-Control or the disk cache (user_reports may not exist yet)
+  `DO $$
+   BEGIN
+     IF to_regclass('user_reports') IS NOT NULL THEN
+       UPDATE user_reports SET content_sha256 = encode(sha256(file_content), 'hex')
+       WHERE content_sha256 IS NULL;
+     END IF;
+   END $$`,
+
+  // Coverage matrix (company x period) kept in step with shared_filings by a
+  // trigger, so the dashboard heatmap never scans the filings table
+  `CREATE TABLE IF NOT EXISTS filing_coverage (
+    company_id INTEGER REFERENCES companies(id) ON DELETE CASCADE NOT NULL,
+    year INTEGER NOT NULL,
+    quarter VARCHAR(10) NOT NULL,
+    filing_id INTEGER REFERENCES shared_filings(id) ON DELETE CASCADE NOT NULL,
+    source VARCHAR(50),
+    file_size BIGINT,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (company_id, year, quarter)
+  )`,
+  `CREATE OR REPLACE FUNCTION sync_filing_coverage() RETURNS trigger AS $$
+   BEGIN
+     INSERT INTO filing_coverage (company_id, year, quarter, filing_id, source, file_size)
+     VALUES (NEW.company_id, NEW.year, NEW.quarter, NEW.id, NEW.source, NEW.file_size)
+     ON CONFLICT (company_id, year, quarter) DO UPDATE SET
+       filing_id = EXCLUDED.filing_id,
+       source = EXCLUDED.source,
+       file_size = EXCLUDED.file_size,
+       updated_at = NOW();
+     RETURN NULL;
+   END;
+   $$ LANGUAGE plpgsql`,
+  `DROP TRIGGER IF EXISTS trg_shared_filings_coverage ON shared_filings`,
+  `CREATE TRIGGER trg_shared_filings_coverage
+   AFTER INSERT OR UPDATE OF source, file_size ON shared_filings
+   FOR EACH ROW EXECUTE FUNCTION sync_filing_coverage()`,
+  `INSERT INTO filing_coverage (company_id, year, quarter, filing_id, source, file_size)
+   SELECT company_id, year, quarter, id, source, file_size FROM shared_filings
+   ON CONFLICT (company_id, year, quarter) DO NOTHING`,
 
   // ================================================================
   // 5. AI Analysis storage (new — replaces Vercel Blob)
@@ -158,8 +255,14 @@ const migrations = [
   `CREATE INDEX IF NOT EXISTS idx_stored_analyses_shared ON stored_analyses(is_shared) WHERE is_shared = true`,
   `CREATE INDEX IF NOT EXISTS idx_uploaded_files_user ON uploaded_files(user_id)`,
   `CREATE INDEX IF NOT EXISTS idx_download_jobs_status ON download_jobs(status)`,
+  `CREATE INDEX IF NOT EXISTS idx_download_jobs_pending ON download_jobs(user_id, created_at) WHERE status = 'pending'`,
+  `CREATE INDEX IF NOT EXISTS idx_download_jobs_running_user ON download_jobs(user_id) WHERE status = 'running'`,
+  `CREATE INDEX IF NOT EXISTS idx_download_jobs_lease ON download_jobs(lease_expires_at) WHERE status = 'running'`,
   `CREATE INDEX IF NOT EXISTS idx_download_logs_job ON download_logs(job_id)`,
+  `CREATE INDEX IF NOT EXISTS idx_download_tasks_runnable ON download_tasks(job_id, id) WHERE status IN ('pending', 'running')`,
   `CREATE INDEX IF NOT EXISTS idx_shared_filings_lookup ON shared_filings(company_id, year, quarter)`,
+  `CREATE INDEX IF NOT EXISTS idx_shared_filings_keyset ON shared_filings(year, quarter, id)`,
+  `CREATE INDEX IF NOT EXISTS idx_shared_filings_source_keyset ON shared_filings(source, year, quarter, id)`,
   `CREATE INDEX IF NOT EXISTS idx_companies_category ON companies(category)`,
 
   // ================================================================
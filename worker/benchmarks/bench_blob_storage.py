@@ -0,0 +1,89 @@
+"""
+Filing storage benchmark: TOAST STORAGE EXTENDED (compressed) vs EXTERNAL.
+
+Copies the largest shared_filings rows into two scratch tables, one per
+storage mode, and prints the on-disk size of each together with the time to
+stream every file chunk by chunk the way the download endpoints do
+(substring(file_content FROM .. FOR blob_stream_chunk_bytes)).
+
+file_content || '' forces a fresh, uncompressed value, so the EXTENDED copy
+is compressed with the server's default_toast_compression rather than
+inheriting whatever the source row was stored as. The scratch tables are
+dropped afterwards.
+
+    DATABASE_URL=postgresql://... python benchmarks/bench_blob_storage.py [rows]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from config import Settings
+from database import Database
+
+MODES = ('extended', 'external')
+
+
+def _stream_ms(db: Database, table: str, row_id: int, size: int, chunk: int) -> float:
+    started = time.perf_counter()
+    for offset in range(0, size, chunk):
+        db._execute_one(
+            f"SELECT substring(file_content FROM %s FOR %s) AS chunk FROM {table} WHERE id = %s",
+            (offset + 1, chunk, row_id),
+        )
+    return (time.perf_counter() - started) * 1000
+
+
+def run(rows: int) -> dict:
+    settings = Settings(db_blob_pool_max_connections=0)
+    db = Database(settings)
+    db.connect()
+    results = {}
+    try:
+        for mode in MODES:
+            table = f"bench_filings_{mode}"
+            db._execute_update(f"DROP TABLE IF EXISTS {table}")
+            db._execute_update(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, file_content BYTEA NOT NULL)")
+            db._execute_update(f"ALTER TABLE {table} ALTER COLUMN file_content SET STORAGE {mode.upper()}")
+            db._execute_update(
+                f"""INSERT INTO {table} (id, file_content)
+                    SELECT id, file_content || ''::bytea FROM shared_filings
+                    ORDER BY file_size DESC LIMIT %s""",
+                (rows,),
+            )
+            sizes = db._execute(f"SELECT id, octet_length(file_content) AS size FROM {table}")
+            disk = db._execute_one(f"SELECT pg_total_relation_size('{table}') AS bytes")['bytes']
+            stream_ms = [
+                _stream_ms(db, table, row['id'], row['size'], settings.blob_stream_chunk_bytes)
+                for row in sizes
+            ]
+            results[mode] = {
+                'raw_bytes': sum(row['size'] for row in sizes),
+                'disk_bytes': disk,
+                'stream_ms': stream_ms,
+            }
+    finally:
+        for mode in MODES:
+            db._execute_update(f"DROP TABLE IF EXISTS bench_filings_{mode}")
+        db.disconnect()
+    return results
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    results = run(rows)
+    print(f"{'storage':<10}{'raw MB':>10}{'disk MB':>10}{'ratio':>8}{'total ms':>12}{'max ms':>10}")
+    for mode, result in results.items():
+        raw_mb = result['raw_bytes'] / 1024 / 1024
+        disk_mb = result['disk_bytes'] / 1024 / 1024
+        ratio = result['raw_bytes'] / result['disk_bytes'] if result['disk_bytes'] else 0
+        print(
+            f"{mode:<10}{raw_mb:>10.1f}{disk_mb:>10.1f}{ratio:>8.2f}"
+            f"{sum(result['stream_ms']):>12.1f}{max(result['stream_ms'], default=0):>10.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
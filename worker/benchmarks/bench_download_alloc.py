@@ -0,0 +1,135 @@
+"""
+Download allocation benchmark (tracemalloc).
+
+Drives the ASGI app directly for GET /filings/{id}/download against an
+in-memory fake database whose read_blob_chunk returns views of one
+preallocated blob, so only the worker's own allocations are traced (the
+buffer psycopg2 decodes each bytea into is outside this measurement).
+Compares the original handler (whole row, bytes(raw), Response) with the
+streaming path and the on-disk cache path, and prints the traced peak per
+download.
+
+    python benchmarks/bench_download_alloc.py [size_mib] [downloads]
+"""
+
+import os
+import sys
+import gc
+import shutil
+import asyncio
+import hashlib
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi.responses import Response
+
+import main
+from chunk_cache import ChunkCache
+from disk_cache import DiskBlobCache
+
+
+class FakeDB:
+    def __init__(self, blob: bytes):
+        self.blob = memoryview(blob)
+        self.meta = {
+            'id': 1, 'filename': 'filing.pdf', 'content_type': 'application/pdf',
+            'content_sha256': hashlib.sha256(blob).hexdigest(), 'file_size': len(blob),
+            'created_at': datetime(2024, 5, 1, tzinfo=timezone.utc),
+        }
+
+    def get_blob_meta(self, table, row_id):
+        return self.meta
+
+    def read_blob_chunk(self, table, row_id, offset, length):
+        return self.blob[offset:offset + length]
+
+    def get_shared_filing_content(self, filing_id):
+        return {**self.meta, 'file_content': self.blob}
+
+
+async def legacy_download(scope, receive, send):
+    """The handler before streaming: whole row, bytes(raw), one Response"""
+    filing = await asyncio.get_running_loop().run_in_executor(
+        None, main.db.get_shared_filing_content, 1
+    )
+    raw = filing.get('file_content')
+    content = bytes(raw) if not isinstance(raw, bytes) else raw
+    response = Response(
+        content=content, media_type=filing.get('content_type'),
+        headers={"Content-Disposition": f"attachment; filename=\"{filing.get('filename')}\"",
+                 "Content-Length": str(len(content))},
+    )
+    await response(scope, receive, send)
+
+
+def _scope():
+    return {
+        'type': 'http', 'asgi': {'version': '3.0', 'spec_version': '2.4'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': '/filings/1/download',
+        'raw_path': b'/filings/1/download', 'root_path': '', 'query_string': b'',
+        'headers': [], 'server': ('bench', 80), 'client': ('bench', 1),
+    }
+
+
+async def download(app) -> int:
+    sent = 0
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal sent
+        if message['type'] == 'http.response.pathsend':
+            sent += os.path.getsize(message['path'])
+        sent += len(message.get('body', b''))
+
+    await app(_scope(), receive, send)
+    return sent
+
+
+def measure(app, downloads: int, size: int) -> int:
+    """Median traced peak (bytes above baseline) over `downloads` runs"""
+    peaks = []
+    for _ in range(downloads):
+        gc.collect()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        assert asyncio.run(download(app)) == size
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    return sorted(peaks)[len(peaks) // 2]
+
+
+def run():
+    size = int(float(sys.argv[1]) * 1024 * 1024) if len(sys.argv) > 1 else 20 * 1024 * 1024
+    downloads = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    main.db = FakeDB(os.urandom(size))
+    main.chunk_cache = ChunkCache(0)  # per-download cost, not what the LRU keeps
+    cache_dir = tempfile.mkdtemp()
+    try:
+        tracemalloc.start()
+        results = {'legacy bytes(raw) + Response': measure(legacy_download, downloads, size)}
+        main.disk_cache = DiskBlobCache(cache_dir, 0)
+        results['streamed from Postgres'] = measure(main.app, downloads, size)
+        main.disk_cache = DiskBlobCache(cache_dir, 2 * size)
+        asyncio.run(download(main.app))  # fill the disk cache
+        results['served from disk cache'] = measure(main.app, downloads, size)
+        tracemalloc.stop()
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    chunk = main.settings.blob_stream_chunk_bytes
+    print(f"{size / 2**20:.0f} MiB blob, {chunk // 1024} KiB chunks, median of {downloads} downloads")
+    for name, peak in results.items():
+        print(f"  {name:30s} peak {peak / 2**20:8.2f} MiB ({peak / size:.2f}x blob)")
+
+
+if __name__ == '__main__':
+    run()
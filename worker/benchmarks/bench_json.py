@@ -0,0 +1,78 @@
+"""
+Listing serialisation benchmark: FastAPI's default encoder vs fast_json.
+
+Builds a /filings-shaped page of synthetic rows (datetimes, strings, ints)
+and times the default path (jsonable_encoder + json.dumps, what FastAPI does
+for a returned dict) against orjson, with and without gzip. No database needed.
+
+    python benchmarks/bench_json.py [rows] [iterations]
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import statistics
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi.encoders import jsonable_encoder
+
+from fast_json import GZIP_LEVEL, dumps
+
+
+def make_rows(n: int) -> list:
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            'id': n - i, 'company_id': i % 500, 'year': 2020 + i % 5, 'quarter': f"Q{i % 4 + 1}",
+            'filename': f"TICK{i % 500}_{2020 + i % 5}_Q{i % 4 + 1}.pdf",
+            'file_url': f"https://www.sec.gov/Archives/edgar/data/{i}/{i:010d}.htm",
+            'content_type': 'application/pdf', 'file_size': 1_000_000 + i, 'source': 'sec_edgar',
+            'created_at': created + timedelta(minutes=i),
+            'company_name': f"Company {i % 500}", 'company_ticker': f"TICK{i % 500}",
+            'category': 'AI_Applications',
+        }
+        for i in range(n)
+    ]
+
+
+def default_path(payload) -> bytes:
+    return json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+        indent=None, separators=(',', ':'),
+    ).encode('utf-8')
+
+
+def timed(fn, iterations: int) -> float:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    payload = {'filings': make_rows(rows), 'next_cursor': None, 'total': rows}
+    plain = dumps(payload)
+    assert json.loads(plain) == json.loads(default_path(payload))
+
+    cases = {
+        'jsonable_encoder + json.dumps': lambda: default_path(payload),
+        'orjson': lambda: dumps(payload),
+        f"orjson + gzip({GZIP_LEVEL})": lambda: gzip.compress(dumps(payload), GZIP_LEVEL),
+    }
+    print(f"{rows} rows, median of {iterations} runs")
+    for name, fn in cases.items():
+        print(f"  {name:32s} {timed(fn, iterations):8.2f} ms")
+    print(f"  body: {len(plain) / 1024:.0f} KiB, gzipped "
+          f"{len(gzip.compress(plain, GZIP_LEVEL)) / 1024:.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
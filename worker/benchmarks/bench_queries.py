@@ -0,0 +1,79 @@
+"""
+Hot-query benchmark: plain SQL vs prepared statements.
+
+Runs the per-task hot path (get_job, get_shared_filing, update_download_log,
+finish_download_task) against DATABASE_URL with db_prepared_statements off
+and on, and prints mean / p50 / p95 latency per query.
+
+Uses a scratch 'cancelled' job (never picked up by workers) that is deleted
+afterwards, together with its logs.
+
+    DATABASE_URL=postgresql://... python benchmarks/bench_queries.py [iterations]
+"""
+
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from config import Settings
+from database import Database
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def run(prepared: bool, iterations: int) -> dict:
+    db = Database(Settings(db_prepared_statements=prepared, db_blob_pool_max_connections=0))
+    db.connect()
+    job = db._execute_one(
+        """INSERT INTO download_jobs (status, years, quarters)
+           VALUES ('cancelled', ARRAY[2024], ARRAY['Q1']) RETURNING id"""
+    )
+    job_id = job['id']
+    log_id = db.create_download_log(job_id, None, 2024, 'Q1')
+    queries = {
+        'get_job': lambda: db.get_job(job_id),
+        'get_shared_filing': lambda: db.get_shared_filing(-1, 2024, 'Q1'),
+        'update_download_log': lambda: db.update_download_log(
+            log_id, status='downloading', file_size=0
+        ),
+        'finish_download_task': lambda: db.finish_download_task(job_id, log_id, None, True),
+    }
+    results = {}
+    try:
+        for name, query in queries.items():
+            query()  # warm-up (prepares the statement when enabled)
+            samples = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                query()
+                samples.append((time.perf_counter() - started) * 1000)
+            results[name] = samples
+    finally:
+        db._execute_update("DELETE FROM download_jobs WHERE id = %s", (job_id,))
+        db.disconnect()
+    return results
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    plain = run(False, iterations)
+    prepared = run(True, iterations)
+    print(f"{'query':<24}{'mode':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name in plain:
+        for mode, samples in (('plain', plain[name]), ('prepared', prepared[name])):
+            print(
+                f"{name:<24}{mode:<10}{statistics.mean(samples):>10.3f}"
+                f"{_percentile(samples, 0.50):>10.3f}{_percentile(samples, 0.95):>10.3f}"
+            )
+        gain = 1 - statistics.mean(prepared[name]) / statistics.mean(plain[name])
+        print(f"{'':<24}{'gain':<10}{gain:>10.1%}")
+
+
+if __name__ == '__main__':
+    main()
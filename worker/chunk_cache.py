@@ -0,0 +1,82 @@
+"""
+Single-flight, byte-bounded LRU of blob chunks for downloads.
+When many clients open the same filing at once, each chunk is read from
+Postgres once: concurrent requests for a chunk that is already being read
+await the same task, and recently read chunks are kept in memory (up to
+max_bytes) so late joiners and repeat bursts skip the database entirely.
+Runs on the event loop only.
+"""
+
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+
+class ChunkCache:
+    """Keys are (table, row_id, content version, offset, length) tuples"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._chunks: 'OrderedDict[Hashable, memoryview]' = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+
+    async def get(self, key: Hashable, fetch: Callable[[], Awaitable[Optional[memoryview]]]) -> Optional[memoryview]:
+        """Cached chunk, else the result of the one in-flight `fetch()` for key"""
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+            self._hits += 1
+            return chunk
+        task = self._inflight.get(key)
+        if task is None:
+            self._misses += 1
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._landed(key, done))
+        else:
+            self._coalesced += 1
+        # Shielded: one client disconnecting must not cancel the read for the others
+        return await asyncio.shield(task)
+
+    def _landed(self, key: Hashable, task: asyncio.Future):
+        if self._inflight.get(key) is not task:
+            return  # invalidated while reading
+        del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        chunk = task.result()
+        if chunk and len(chunk) <= self.max_bytes:
+            self._chunks[key] = chunk
+            self._bytes += len(chunk)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._chunks.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._evictions += 1
+
+    def invalidate(self, table: str, row_id: int):
+        """Forget every chunk of one row (e.g. a deleted report)"""
+        for key in [k for k in self._chunks if k[:2] == (table, row_id)]:
+            self._bytes -= len(self._chunks.pop(key))
+        for key in [k for k in self._inflight if k[:2] == (table, row_id)]:
+            del self._inflight[key]
+
+    def clear(self):
+        self._chunks.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict:
+        return {
+            'max_bytes': self.max_bytes,
+            'bytes': self._bytes,
+            'chunks': len(self._chunks),
+            'in_flight': len(self._inflight),
+            'hits': self._hits,
+            'misses': self._misses,
+            'coalesced': self._coalesced,
+            'evictions': self._evictions,
+        }
@@ -0,0 +1,104 @@
+"""
+Worker settings loaded from the environment (pydantic-settings).
+Field names map to upper-case env vars, e.g. DB_POOL_MAX_CONNECTIONS.
+"""
+
+import os
+import socket
+import tempfile
+
+from pydantic import Field, field_validator
+from pydantic_settings import BaseSettings
+
+
+def _default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Settings(BaseSettings):
+    database_url: str = ''
+
+    # Identifies this process in download_jobs.claimed_by (one row owner per replica)
+    worker_id: str = Field(default_factory=_default_worker_id)
+    # A running job whose lease is not refreshed for this long is requeued by the reaper
+    job_lease_seconds: int = 120
+    # How often job/task leases are refreshed and expired jobs are reaped
+    # (must be well below job_lease_seconds)
+    job_heartbeat_interval: float = 30.0
+    # Safety-net poll interval; new jobs normally arrive via LISTEN/NOTIFY
+    job_poll_interval: float = 60.0
+    # Jobs processed concurrently by this worker (they share the downloader's
+    # engine-wide rate limiter and download semaphore)
+    max_active_jobs: int = 3
+    # Jobs with at most this many expected filings use the interactive lane
+    interactive_max_files: int = 8
+    # Durable task queue (download_tasks): a leased task not finished within
+    # task_lease_seconds is handed to another worker, at most max_task_attempts times
+    task_lease_seconds: int = 300
+    max_task_attempts: int = 3
+
+    # Connection pool sizing; DBExecutor runs one thread per max connection
+    db_pool_min_connections: int = 1
+    db_pool_max_connections: int = 5
+    # Seconds a thread may wait for a pooled connection before PoolTimeout
+    db_pool_acquire_timeout: float = 10.0
+    # Connections older than this are closed on release and replaced lazily
+    # (bounds server-side memory growth and survives failovers/PgBouncer rotation)
+    db_conn_max_lifetime: float = 1800.0
+    # Seconds to wait for a new connection (LISTEN reconnects during outages)
+    db_connect_timeout: int = 5
+    # Longest pause between LISTEN reconnect attempts (doubles from 1s)
+    db_listener_max_backoff: float = 60.0
+
+    # PREPARE hot-path queries once per connection; disable behind PgBouncer
+    # in transaction pooling mode (server sessions are not pinned)
+    db_prepared_statements: bool = True
+
+    # Separate pool for multi-megabyte BYTEA reads/writes (filings, reports)
+    # so blob transfers cannot starve metadata queries; 0 shares the main pool
+    db_blob_pool_min_connections: int = 0
+    db_blob_pool_max_connections: int = 2
+    db_blob_pool_acquire_timeout: float = 30.0
+
+    # Dedicated connections for NDJSON exports (each holds one for the whole
+    # stream); 0 shares the main pool
+    db_export_pool_max_connections: int = 2
+    db_export_pool_acquire_timeout: float = 5.0
+    # Rows fetched per server-side cursor round trip during exports
+    export_batch_rows: int = 2000
+
+    # Bytes read per query when streaming filing/report content to clients
+    blob_stream_chunk_bytes: int = 1024 * 1024
+    # Memory for recently streamed chunks; concurrent downloads of one blob
+    # share each chunk read (0 still coalesces, but keeps nothing)
+    blob_chunk_cache_bytes: int = 64 * 1024 * 1024
+    # On-disk LRU of downloaded filings/reports, served with FileResponse
+    # (sendfile where the server supports it); 0 disables
+    blob_disk_cache_bytes: int = 1024 * 1024 * 1024
+    blob_disk_cache_dir: str = os.path.join(tempfile.gettempdir(), 'finsight-blob-cache')
+    # Largest accepted report upload; larger bodies get a 413 while arriving
+    max_upload_bytes: int = 50 * 1024 * 1024
+    # Bytes of an upload hashed and sent to Postgres per COPY write
+    upload_chunk_bytes: int = 256 * 1024
+
+    # In-process response cache: seconds each endpoint's payload is reused.
+    # Writes made by this worker invalidate at once; other replicas' (and the
+    # web app's) show up within the TTL. 0 disables caching for that endpoint.
+    response_cache_max_entries: int = 512
+    # Job status changes invalidate at once; progress counters lag by up to this
+    cache_ttl_jobs: float = 2.0
+    cache_ttl_listings: float = 15.0
+    cache_ttl_health: float = 5.0
+    coverage_cache_ttl: float = 30.0
+
+    # Seconds a request may queue for a DB thread before a 503
+    db_executor_queue_timeout: float = 10.0
+    db_blob_executor_queue_timeout: float = 30.0
+
+    @field_validator('worker_id')
+    @classmethod
+    def _worker_id_or_default(cls, value: str) -> str:
+        return value or _default_worker_id()
+
+
+settings = Settings()
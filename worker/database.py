@@ -4,61 +4,332 @@ Synchronous psycopg2 with ThreadedConnectionPool.
 Column-name whitelists prevent SQL injection on dynamic updates.
 """
 
-import os
+import time
+import functools
+import hashlib
+import binascii
 import logging
-from typing import Optional, List, Dict, Any
+import threading
+from typing import Optional, List, Dict, Any, Tuple, Iterable, Set, Callable
 from contextlib import contextmanager
+from itertools import chain, islice
 
 import psycopg2
+import psycopg2.errors
 import psycopg2.extras
 import psycopg2.pool
 
+from config import Settings
+from metrics import Histogram
+from scheduler import PENDING_QUEUE_SQL, QUEUE_ORDER_SQL, queue_params
+from uploads import UploadTooLarge, too_large_detail
+
 logger = logging.getLogger('finsight-worker.db')
 
+# NOTIFY channel fired by the download_jobs trigger when a job becomes pending
+JOB_CHANNEL = 'download_jobs'
+
 # Whitelists for dynamic column updates (prevents SQL injection)
 _JOB_UPDATE_COLUMNS = frozenset({
     'status', 'started_at', 'completed_at', 'error_message',
     'total_files', 'completed_files', 'failed_files',
 })
-_LOG_UPDATE_COLUMNS = frozenset({
+_LOG_UPDATE_ORDER = (
     'status', 'filename', 'file_url', 'file_size',
     'error_message', 'download_duration_ms',
-})
+)
+_LOG_UPDATE_COLUMNS = frozenset(_LOG_UPDATE_ORDER)
+# Database attribute holding each named pool
+_POOL_ATTRS = {'meta': '_pool', 'blob': '_blob_pool', 'export': '_export_pool'}
+# Tables whose file_content can be streamed in chunks
+_BLOB_TABLES = frozenset({'shared_filings', 'user_reports'})
+# Row sources for the NDJSON exports (file_content is never exported)
+_EXPORT_SELECTS = {
+    'filings': """SELECT sf.id, sf.company_id, sf.year, sf.quarter, sf.filename,
+                         sf.file_url, sf.content_type, sf.file_size, sf.source, sf.created_at
+                  FROM shared_filings sf""",
+    'reports': """SELECT r.id, r.uploader_name, r.company_id, r.title, r.description,
+                         r.year, r.quarter, r.filename, r.content_type, r.file_size, r.created_at
+                  FROM user_reports r""",
+    'jobs': "SELECT * FROM download_jobs j",
+    'logs': "SELECT * FROM download_logs l",
+}
+
+
+def _listing_filters(
+    alias: str, company_id: Optional[int], category: Optional[str],
+    year_from: Optional[int], year_to: Optional[int], source: Optional[str] = None,
+) -> Tuple[List[str], list]:
+    """WHERE clauses shared by the filings/reports listings and their counts.
+    Category is resolved through a companies subquery so counts need no join.
+    """
+    clauses: List[str] = []
+    params: list = []
+    if company_id:
+        clauses.append(f"{alias}.company_id = %s")
+        params.append(company_id)
+    if category:
+        clauses.append(f"{alias}.company_id IN (SELECT id FROM companies WHERE category = %s)")
+        params.append(category)
+    if year_from:
+        clauses.append(f"{alias}.year >= %s")
+        params.append(year_from)
+    if year_to:
+        clauses.append(f"{alias}.year <= %s")
+        params.append(year_to)
+    if source:
+        clauses.append(f"{alias}.source = %s")
+        params.append(source)
+    return clauses, params
+
+
+def _writes(*groups: str):
+    """Mark a Database method as changing the data behind `groups` ('jobs',
+    'filings', 'reports'); write listeners are told once it returns.
+    Only job status/claim changes count for 'jobs': per-file progress
+    (counters, download logs) runs several times a second and is left to
+    cache_ttl_jobs.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return fn(self, *args, **kwargs)
+            finally:
+                self._notify_writes(groups)
+        return wrapper
+    return decorate
+
+
+def _copy_text(value: Any) -> bytes:
+    """One field in COPY text format"""
+    if value is None:
+        return b'\\N'
+    text = str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    return text.encode()
+
+
+class _ByteaCopyRow:
+    """File-like COPY FROM STDIN source for one row whose last column is a
+    bytea streamed from `source` as hex, `chunk_bytes` at a time.
+    """
+
+    def __init__(self, fields: Tuple, source, chunk_bytes: int):
+        self._prefix = b'\t'.join(_copy_text(f) for f in fields) + b'\t\\\\x'
+        self._source = source
+        self._chunk_bytes = chunk_bytes
+        self._done = False
+
+    def read(self, size: int = -1) -> bytes:
+        if self._prefix:
+            prefix, self._prefix = self._prefix, b''
+            return prefix
+        if self._done:
+            return b''
+        chunk = self._source.read(self._chunk_bytes)
+        if chunk:
+            return binascii.hexlify(chunk)
+        self._done = True
+        return b'\n'
+
+
+def _to_positional(sql: str) -> str:
+    """Rewrite %s placeholders as $1..$n for PREPARE (and escape literal %)"""
+    parts = sql.split('%s')
+    positional = parts[0] + ''.join(f"${i}{part}" for i, part in enumerate(parts[1:], 1))
+    return positional.replace('%', '%%')
+
+
+class PoolTimeout(psycopg2.pool.PoolError):
+    """No pooled connection became free within db_pool_acquire_timeout"""
+
+
+class PoolMonitor:
+    """Admission control and saturation metrics for one connection pool.
+    ThreadedConnectionPool raises immediately when exhausted; the semaphore
+    makes callers wait (bounded) for a free connection instead.
+    """
+
+    def __init__(self, name: str, min_connections: int, max_connections: int,
+                 acquire_timeout: float, max_lifetime: float):
+        self.name = name
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime = max_lifetime
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self._conn_born: Dict[int, float] = {}  # id(conn) -> monotonic time opened
+        self._in_use = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self.acquire_wait_ms = Histogram()
+
+    def acquire(self) -> float:
+        """Wait for a slot; returns the time the caller started waiting"""
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(
+                f"No {self.name} connection free within {self.acquire_timeout:.0f}s"
+            )
+        return started
+
+    def checked_out(self, conn, started: float) -> float:
+        """Record a connection handed out; returns when it was opened"""
+        now = time.monotonic()
+        self.acquire_wait_ms.observe((now - started) * 1000)
+        with self._lock:
+            self._in_use += 1
+            return self._conn_born.setdefault(id(conn), now)
+
+    def checked_in(self, conn, born: float) -> bool:
+        """Record a connection returned; True if it must be closed (too old or broken)"""
+        expired = time.monotonic() - born > self.max_lifetime
+        close = expired or bool(conn.closed)
+        with self._lock:
+            self._in_use -= 1
+            if close:
+                self._conn_born.pop(id(conn), None)
+                self._recycled += expired
+        return close
+
+    def release(self):
+        self._slots.release()
+
+    def clear(self):
+        with self._lock:
+            self._conn_born.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - born for born in self._conn_born.values()]
+            in_use, timeouts, recycled = self._in_use, self._timeouts, self._recycled
+        return {
+            'min_connections': self.min_connections,
+            'max_connections': self.max_connections,
+            'open': len(ages),
+            'in_use': in_use,
+            'timeouts': timeouts,
+            'recycled': recycled,
+            'max_lifetime_s': self.max_lifetime,
+            'oldest_connection_age_s': round(max(ages), 1) if ages else 0.0,
+            'avg_connection_age_s': round(sum(ages) / len(ages), 1) if ages else 0.0,
+            'acquire_wait_ms': self.acquire_wait_ms.snapshot(),
+        }
 
 
 class Database:
-    """PostgreSQL database wrapper with connection pooling"""
+    """PostgreSQL database wrapper with connection pooling.
+    Multi-megabyte BYTEA reads/writes use a separate 'blob' pool and
+    long-lived export cursors an 'export' pool, so neither can starve job
+    polling, heartbeats and other metadata queries.
+    """
 
-    def __init__(self):
+    def __init__(self, settings: Optional[Settings] = None):
+        self.settings = settings or Settings()
         self._pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
-        self.database_url = os.environ.get('DATABASE_URL', '')
+        # None when their max_connections is 0: that traffic shares _pool
+        self._blob_pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+        self._export_pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+        self.database_url = self.settings.database_url
+        s = self.settings
+        self._monitors: Dict[str, PoolMonitor] = {
+            'meta': PoolMonitor('meta', s.db_pool_min_connections, s.db_pool_max_connections,
+                                s.db_pool_acquire_timeout, s.db_conn_max_lifetime),
+        }
+        if s.db_blob_pool_max_connections:
+            self._monitors['blob'] = PoolMonitor(
+                'blob', s.db_blob_pool_min_connections, s.db_blob_pool_max_connections,
+                s.db_blob_pool_acquire_timeout, s.db_conn_max_lifetime,
+            )
+        if s.db_export_pool_max_connections:
+            self._monitors['export'] = PoolMonitor(
+                'export', 0, s.db_export_pool_max_connections,
+                s.db_export_pool_acquire_timeout, s.db_conn_max_lifetime,
+            )
+        # backend pid -> names of statements PREPAREd on that server session
+        self._prepared: Dict[int, Set[str]] = {}
+        # Called with the data groups a write touched (response cache invalidation)
+        self._write_listeners: List[Callable[..., None]] = []
 
     def connect(self):
         try:
-            self._pool = psycopg2.pool.ThreadedConnectionPool(
-                minconn=1, maxconn=5,
-                dsn=self.database_url,
-                cursor_factory=psycopg2.extras.RealDictCursor,
-            )
-            logger.info("Database pool created")
+            for name, monitor in self._monitors.items():
+                pool = psycopg2.pool.ThreadedConnectionPool(
+                    minconn=monitor.min_connections,
+                    maxconn=monitor.max_connections,
+                    dsn=self.database_url,
+                    cursor_factory=psycopg2.extras.RealDictCursor,
+                )
+                setattr(self, _POOL_ATTRS[name], pool)
+            logger.info(f"Database pools created: {', '.join(self._monitors)}")
         except Exception as e:
             logger.error(f"DB connection failed: {e}")
             raise
 
     def disconnect(self):
-        if self._pool:
-            self._pool.closeall()
+        for pool in (self._pool, self._blob_pool, self._export_pool):
+            if pool:
+                pool.closeall()
+        for monitor in self._monitors.values():
+            monitor.clear()
 
     @contextmanager
-    def _get_conn(self):
+    def _get_conn(self, pool: str = 'meta'):
+        """Borrow a connection from the 'meta' (default), 'blob' or 'export' pool"""
         if self._pool is None:
             raise RuntimeError("Database not connected. Call connect() first.")
-        conn = self._pool.getconn()
+        raw = getattr(self, _POOL_ATTRS.get(pool, '_pool'))
+        if raw is None or pool not in self._monitors:
+            raw, monitor = self._pool, self._monitors['meta']
+        else:
+            monitor = self._monitors[pool]
+        started = monitor.acquire()
+        try:
+            conn = raw.getconn()
+        except Exception:
+            monitor.release()
+            raise
+        born = monitor.checked_out(conn, started)
         conn.autocommit = True
         try:
             yield conn
         finally:
-            self._pool.putconn(conn)
+            try:
+                close = monitor.checked_in(conn, born)
+                if close:
+                    self._forget_prepared(conn)
+                raw.putconn(conn, close=close)
+            finally:
+                monitor.release()
+
+    def add_write_listener(self, listener: Callable[..., None]):
+        self._write_listeners.append(listener)
+
+    def _notify_writes(self, groups: Tuple[str, ...]):
+        for listener in self._write_listeners:
+            try:
+                listener(*groups)
+            except Exception as e:
+                logger.error(f"Write listener failed for {groups}: {e}")
+
+    def pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-pool saturation metrics for GET /metrics"""
+        return {name: monitor.stats() for name, monitor in self._monitors.items()}
+
+    def open_listener(self, channel: str = JOB_CHANNEL):
+        """Open a dedicated (non-pooled) connection that LISTENs on a channel.
+        Kept outside the pool because it stays idle for the worker's lifetime.
+        Blocking: call it from a thread.
+        """
+        conn = psycopg2.connect(self.database_url, connect_timeout=self.settings.db_connect_timeout)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {channel}")
+        return conn
 
     def check_connection(self) -> bool:
         try:
@@ -69,40 +340,244 @@ class Database:
         except Exception:
             return False
 
-    def _execute(self, sql: str, params: tuple = None) -> List[Dict[str, Any]]:
-        with self._get_conn() as conn:
+    def _execute(
+        self, sql: str, params: tuple = None, pool: str = 'meta', prepare: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        with self._get_conn(pool) as conn:
             with conn.cursor() as cur:
-                cur.execute(sql, params)
+                self._cursor_execute(conn, cur, sql, params, prepare)
                 if cur.description:
                     return [dict(row) for row in cur.fetchall()]
                 return []
 
-    def _execute_one(self, sql: str, params: tuple = None) -> Optional[Dict[str, Any]]:
-        results = self._execute(sql, params)
+    def _execute_one(
+        self, sql: str, params: tuple = None, pool: str = 'meta', prepare: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        results = self._execute(sql, params, pool, prepare)
         return results[0] if results else None
 
-    def _execute_update(self, sql: str, params: tuple = None) -> int:
+    def _execute_update(self, sql: str, params: tuple = None, prepare: Optional[str] = None) -> int:
         with self._get_conn() as conn:
             with conn.cursor() as cur:
-                cur.execute(sql, params)
+                self._cursor_execute(conn, cur, sql, params, prepare)
                 return cur.rowcount
 
+    # ----------------------------------------------------------------
+    # Prepared statements (fixed hot-path queries)
+    # ----------------------------------------------------------------
+    def _cursor_execute(self, conn, cur, sql: str, params: Optional[tuple], prepare: Optional[str]):
+        """Execute `sql`, or run it as the prepared statement `prepare`.
+        Statements are prepared lazily once per server session (keyed by backend
+        pid), in the same round trip as their first EXECUTE, so later calls skip
+        parsing and planning. Disabled by db_prepared_statements=false (needed
+        behind PgBouncer transaction pooling).
+        """
+        if not prepare or not self.settings.db_prepared_statements:
+            cur.execute(sql, params)
+            return
+        params = tuple(params or ())
+        execute = f"EXECUTE {prepare}({', '.join(['%s'] * len(params))})" if params else f"EXECUTE {prepare}"
+        prepared = self._prepared.setdefault(conn.get_backend_pid(), set())
+        if prepare in prepared:
+            try:
+                cur.execute(execute, params)
+                return
+            except psycopg2.errors.InvalidSqlStatementName:
+                prepared.discard(prepare)  # session was reset (DISCARD ALL, failover)
+            except psycopg2.errors.FeatureNotSupported:
+                # "cached plan must not change result type": the table was
+                # ALTERed under a SELECT */RETURNING * statement; re-prepare it
+                cur.execute(f"DEALLOCATE {prepare}")
+                prepared.discard(prepare)
+        try:
+            cur.execute(f"PREPARE {prepare} AS {_to_positional(sql)}; {execute}", params)
+        except psycopg2.errors.DuplicatePreparedStatement:
+            cur.execute(execute, params)
+        prepared.add(prepare)
+
+    def _forget_prepared(self, conn):
+        try:
+            self._prepared.pop(conn.get_backend_pid(), None)
+        except psycopg2.Error:
+            pass  # already closed; a reused pid re-prepares on InvalidSqlStatementName
+
     # ----------------------------------------------------------------
     # Job operations
     # ----------------------------------------------------------------
-    def get_next_pending_job(self) -> Optional[Dict]:
+    @_writes('jobs')
+    def claim_next_job(self, worker_id: Optional[str] = None) -> Optional[Dict]:
+        """Atomically claim the next pending job for this worker, in scheduler
+        order (priority, interactive lane, weighted fair share, FIFO).
+        FOR UPDATE SKIP LOCKED lets several replicas poll the same table
+        without ever handing the same job to two of them.
+        """
+        worker_id = worker_id or self.settings.worker_id
+        return self._execute_one(
+            f"""UPDATE download_jobs
+                SET status = 'running', claimed_by = %(worker_id)s, claimed_at = NOW(),
+                    heartbeat_at = NOW(),
+                    lease_expires_at = NOW() + make_interval(secs => %(lease_seconds)s),
+                    started_at = COALESCE(started_at, NOW())
+                WHERE id = (
+                    SELECT j.id FROM download_jobs j
+                    JOIN ({PENDING_QUEUE_SQL}) q ON q.id = j.id
+                    WHERE j.status = 'pending'
+                    ORDER BY {QUEUE_ORDER_SQL}
+                    FOR UPDATE OF j SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING *""",
+            {'worker_id': worker_id, 'lease_seconds': self.settings.job_lease_seconds, **queue_params(self.settings.interactive_max_files)}
+        )
+
+    @_writes('jobs')
+    def claim_job(self, job_id: int, worker_id: Optional[str] = None) -> Optional[Dict]:
+        """Claim a specific pending/failed job (manual trigger).
+        Returns None if another worker already owns it.
+        """
+        worker_id = worker_id or self.settings.worker_id
         return self._execute_one(
-            "SELECT * FROM download_jobs WHERE status = 'pending' ORDER BY created_at ASC LIMIT 1"
+            """UPDATE download_jobs
+               SET status = 'running', claimed_by = %s, claimed_at = NOW(),
+                   heartbeat_at = NOW(), lease_expires_at = NOW() + make_interval(secs => %s),
+                   started_at = COALESCE(started_at, NOW()), error_message = NULL
+               WHERE id = (
+                   SELECT id FROM download_jobs
+                   WHERE id = %s AND status IN ('pending', 'failed')
+                   FOR UPDATE SKIP LOCKED
+               )
+               RETURNING *""",
+            (worker_id, self.settings.job_lease_seconds, job_id)
+        )
+
+    def heartbeat_leases(
+        self, job_ids: List[int], task_ids: List[int], task_lease_seconds: int,
+        worker_id: Optional[str] = None
+    ) -> Tuple[List[int], List[int]]:
+        """Extend the leases of jobs and tasks this worker is processing.
+        Returns the (job ids, task ids) still owned; a missing id means it was
+        cancelled, finished or reclaimed elsewhere and should stop locally.
+        """
+        worker_id = worker_id or self.settings.worker_id
+        owned_jobs: List[int] = []
+        owned_tasks: List[int] = []
+        if job_ids:
+            rows = self._execute(
+                """UPDATE download_jobs
+                   SET heartbeat_at = NOW(), lease_expires_at = NOW() + make_interval(secs => %s)
+                   WHERE id = ANY(%s) AND claimed_by = %s AND status = 'running'
+                   RETURNING id""",
+                (self.settings.job_lease_seconds, list(job_ids), worker_id)
+            )
+            owned_jobs = [row['id'] for row in rows]
+        if task_ids:
+            rows = self._execute(
+                """UPDATE download_tasks
+                   SET lease_expires_at = NOW() + make_interval(secs => %s), updated_at = NOW()
+                   WHERE id = ANY(%s) AND leased_by = %s AND status = 'running'
+                   RETURNING id""",
+                (task_lease_seconds, list(task_ids), worker_id)
+            )
+            owned_tasks = [row['id'] for row in rows]
+        return owned_jobs, owned_tasks
+
+    @_writes('jobs')
+    def cancel_job(self, job_id: int) -> Optional[Dict]:
+        """Cancel a pending/running job in one statement: the job row, its
+        unfinished tasks, and its unfinished download logs (marked 'skipped').
+        Returns the cancelled job, or None if it was not cancellable.
+        """
+        return self._execute_one(
+            """WITH job AS (
+                   UPDATE download_jobs
+                   SET status = 'cancelled', completed_at = NOW(), lease_expires_at = NULL
+                   WHERE id = %s AND status IN ('pending', 'running')
+                   RETURNING *
+               ), tasks AS (
+                   UPDATE download_tasks t
+                   SET status = 'cancelled', lease_expires_at = NULL, updated_at = NOW()
+                   FROM job WHERE t.job_id = job.id AND t.status IN ('pending', 'running')
+               ), logs AS (
+                   UPDATE download_logs dl
+                   SET status = 'skipped', error_message = 'Job cancelled', updated_at = NOW()
+                   FROM job WHERE dl.job_id = job.id AND dl.status IN ('pending', 'downloading')
+               )
+               SELECT * FROM job""",
+            (job_id,)
+        )
+
+    def skip_unfinished_download_logs(self, job_id: int) -> int:
+        """Mark logs of a cancelled job 'skipped' if an in-flight download
+        touched them after cancel_job ran.
+        """
+        return self._execute_update(
+            """UPDATE download_logs
+               SET status = 'skipped', error_message = 'Job cancelled', updated_at = NOW()
+               WHERE job_id = %s AND status IN ('pending', 'downloading')
+                 AND EXISTS (SELECT 1 FROM download_jobs WHERE id = %s AND status = 'cancelled')""",
+            (job_id, job_id)
+        )
+
+    @_writes('jobs')
+    def reclaim_expired_jobs(self) -> List[Dict]:
+        """Requeue running jobs whose owner stopped heartbeating (crashed or killed).
+        Their finished download_tasks are kept, so the next owner resumes.
+        Legacy rows without a lease are reclaimed once started longer than a lease ago.
+        """
+        return self._execute(
+            """UPDATE download_jobs
+               SET status = 'pending', lease_expires_at = NULL
+               WHERE id IN (
+                   SELECT id FROM download_jobs
+                   WHERE status = 'running'
+                     AND (lease_expires_at < NOW()
+                          OR (lease_expires_at IS NULL
+                              AND started_at < NOW() - make_interval(secs => %s)))
+                   FOR UPDATE SKIP LOCKED
+               )
+               RETURNING id, claimed_by""",
+            (self.settings.job_lease_seconds,)
+        )
+
+    def list_job_queue(self) -> List[Dict]:
+        """Pending jobs in the order the scheduler will claim them"""
+        return self._execute(
+            f"""SELECT q.id, q.user_id, q.priority, q.lane, q.estimated_files, q.created_at
+                FROM ({PENDING_QUEUE_SQL}) q
+                ORDER BY {QUEUE_ORDER_SQL}""",
+            queue_params(self.settings.interactive_max_files)
+        )
+
+    def get_queue_backlog(self, window_minutes: int = 60) -> Dict:
+        """Outstanding filings of running jobs and recent fleet throughput,
+        used to estimate when queued jobs will start.
+        """
+        row = self._execute_one(
+            """SELECT
+                 (SELECT COALESCE(SUM(GREATEST(total_files - completed_files - failed_files, 0)), 0)
+                  FROM download_jobs WHERE status = 'running') AS backlog_files,
+                 (SELECT COUNT(*) FROM download_logs
+                  WHERE status IN ('success', 'failed')
+                    AND updated_at > NOW() - make_interval(mins => %s)) AS recent_files""",
+            (window_minutes,)
         )
+        row = row or {}
+        return {
+            'backlog_files': int(row.get('backlog_files') or 0),
+            'files_per_second': int(row.get('recent_files') or 0) / (window_minutes * 60),
+        }
 
     def get_job(self, job_id: int) -> Optional[Dict]:
-        return self._execute_one("SELECT * FROM download_jobs WHERE id = %s", (job_id,))
+        return self._execute_one(
+            "SELECT * FROM download_jobs WHERE id = %s", (job_id,), prepare='get_job'
+        )
 
     def list_jobs(self, limit: int = 20) -> List[Dict]:
         return self._execute(
             "SELECT * FROM download_jobs ORDER BY created_at DESC LIMIT %s", (limit,)
         )
 
+    @_writes('jobs')
     def update_job_status(self, job_id: int, status: str, **kwargs):
         """Update job status. Only whitelisted columns are allowed."""
         sets = ["status = %s"]
@@ -115,13 +590,16 @@ class Database:
         params.append(job_id)
         self._execute_update(f"UPDATE download_jobs SET {', '.join(sets)} WHERE id = %s", tuple(params))
 
-    def increment_job_counter(self, job_id: int, field: str):
-        allowed = {'completed_files', 'failed_files'}
-        if field not in allowed:
-            raise ValueError(f"Invalid counter field: {field}")
-        self._execute_update(
-            f"UPDATE download_jobs SET {field} = {field} + 1 WHERE id = %s", (job_id,)
-        )
+    def set_job_total_files(self, job_id: int, total_files: int, worker_id: Optional[str] = None) -> bool:
+        """Record a claimed job's planned file count. Returns False if the job
+        is no longer running under this worker (cancelled or reclaimed since).
+        """
+        worker_id = worker_id or self.settings.worker_id
+        return self._execute_update(
+            """UPDATE download_jobs SET total_files = %s
+               WHERE id = %s AND status = 'running' AND claimed_by = %s""",
+            (total_files, job_id, worker_id)
+        ) > 0
 
     # ----------------------------------------------------------------
     # Company operations
@@ -144,26 +622,38 @@ class Database:
     # ----------------------------------------------------------------
     # Download log operations
     # ----------------------------------------------------------------
-    def create_download_log(self, job_id: int, company_id: int, year: int, quarter: str) -> int:
+    def create_download_log(
+        self, job_id: int, company_id: int, year: int, quarter: str, task_id: Optional[int] = None
+    ) -> int:
+        """Insert a pending log and record it on its task row in one statement"""
         result = self._execute_one(
-            """INSERT INTO download_logs (job_id, company_id, year, quarter, status)
-               VALUES (%s, %s, %s, %s, 'pending') RETURNING id""",
-            (job_id, company_id, year, quarter)
+            """WITH log AS (
+                   INSERT INTO download_logs (job_id, company_id, year, quarter, status)
+                   VALUES (%s, %s, %s, %s, 'pending') RETURNING id
+               ), task AS (
+                   UPDATE download_tasks SET log_id = (SELECT id FROM log), updated_at = NOW()
+                   WHERE id = %s
+               )
+               SELECT id FROM log""",
+            (job_id, company_id, year, quarter, task_id),
+            prepare='create_download_log',
         )
         return result['id'] if result else 0
 
     def update_download_log(self, log_id: int, **kwargs):
         """Update download log. Only whitelisted columns are allowed."""
-        sets: list = []
-        params: list = []
-        for key, value in kwargs.items():
+        for key in kwargs:
             if key not in _LOG_UPDATE_COLUMNS:
                 raise ValueError(f"Invalid column for log update: {key}")
-            sets.append(f"{key} = %s")
-            params.append(value)
-        sets.append("updated_at = NOW()")
-        params.append(log_id)
-        self._execute_update(f"UPDATE download_logs SET {', '.join(sets)} WHERE id = %s", tuple(params))
+        # Canonical column order: one prepared statement per column combination
+        columns = [col for col in _LOG_UPDATE_ORDER if col in kwargs]
+        sets = [f"{col} = %s" for col in columns] + ["updated_at = NOW()"]
+        params = [kwargs[col] for col in columns] + [log_id]
+        mask = sum(1 << _LOG_UPDATE_ORDER.index(col) for col in columns)
+        self._execute_update(
+            f"UPDATE download_logs SET {', '.join(sets)} WHERE id = %s", tuple(params),
+            prepare=f"update_download_log_{mask}",
+        )
 
     def get_download_logs(self, job_id: int) -> List[Dict]:
         return self._execute(
@@ -174,6 +664,157 @@ class Database:
             (job_id,)
         )
 
+    # ----------------------------------------------------------------
+    # Download tasks (durable per-filing queue, leased to any worker)
+    # ----------------------------------------------------------------
+    def enqueue_download_tasks(
+        self, job_id: int, items: Iterable[Tuple[int, int, str]], batch_size: int = 1000
+    ) -> int:
+        """Insert one task per (company_id, year, quarter).
+        `items` may be a lazy generator; it is consumed in batches of `batch_size`
+        so memory stays flat for very large plans.
+        Idempotent: re-enqueueing a resumed job keeps existing task state.
+        """
+        items = iter(items)
+        first = next(items, None)
+        if first is None:
+            return 0
+        items = chain([first], items)
+        inserted = 0
+        with self._get_conn() as conn:
+            with conn.cursor() as cur:
+                while True:
+                    batch = [
+                        (job_id, company_id, year, quarter)
+                        for company_id, year, quarter in islice(items, batch_size)
+                    ]
+                    if not batch:
+                        break
+                    psycopg2.extras.execute_values(
+                        cur,
+                        """INSERT INTO download_tasks (job_id, company_id, year, quarter)
+                           VALUES %s ON CONFLICT (job_id, company_id, year, quarter) DO NOTHING""",
+                        batch,
+                        page_size=batch_size,
+                    )
+                    inserted += cur.rowcount
+        return inserted
+
+    def claim_download_tasks(
+        self, worker_id: str, limit: int, lease_seconds: int,
+        max_attempts: int, job_id: Optional[int] = None
+    ) -> List[Dict]:
+        """Lease up to `limit` runnable tasks (pending, or running with an expired lease).
+        Only tasks of running jobs are handed out. Rows include the company columns
+        the downloader needs.
+        """
+        job_filter = "AND t.job_id = %s" if job_id is not None else ""
+        params: list = [max_attempts]
+        if job_id is not None:
+            params.append(job_id)
+        params.extend([limit, worker_id, lease_seconds])
+        return self._execute(
+            f"""WITH next AS (
+                    SELECT t.id FROM download_tasks t
+                    JOIN download_jobs j ON j.id = t.job_id AND j.status = 'running'
+                    WHERE (t.status = 'pending'
+                           OR (t.status = 'running' AND t.lease_expires_at < NOW()))
+                      AND t.attempts < %s {job_filter}
+                    ORDER BY t.id
+                    FOR UPDATE OF t SKIP LOCKED
+                    LIMIT %s
+                ), claimed AS (
+                    UPDATE download_tasks t
+                    SET status = 'running', leased_by = %s,
+                        lease_expires_at = NOW() + make_interval(secs => %s),
+                        attempts = t.attempts + 1, updated_at = NOW()
+                    FROM next WHERE t.id = next.id
+                    RETURNING t.*
+                )
+                SELECT claimed.*, c.name, c.ticker, c.sec_cik, c.ir_url, c.category
+                FROM claimed JOIN companies c ON c.id = claimed.company_id
+                ORDER BY claimed.id""",
+            tuple(params)
+        )
+
+    def complete_download_task(self, task_id: int, status: str, error_message: Optional[str] = None):
+        if status not in ('done', 'failed'):
+            raise ValueError(f"Invalid task status: {status}")
+        self._execute_update(
+            """UPDATE download_tasks
+               SET status = %s, error_message = %s, lease_expires_at = NULL, updated_at = NOW()
+               WHERE id = %s""",
+            (status, error_message, task_id),
+            prepare='complete_download_task',
+        )
+
+    def finish_download_task(
+        self, job_id: int, log_id: int, task_id: Optional[int], success: bool,
+        error_message: Optional[str] = None, filename: Optional[str] = None,
+        file_url: Optional[str] = None, file_size: Optional[int] = None,
+        download_duration_ms: Optional[int] = None,
+    ):
+        """Finish a task that saved no filing (already stored, not found, or
+        failed) in one round trip: update its log, bump the job's completed or
+        failed counter and close the task (when leased).
+        """
+        self._execute_update(
+            """WITH log AS (
+                   UPDATE download_logs
+                   SET status = %s, error_message = %s,
+                       filename = COALESCE(%s, filename), file_url = COALESCE(%s, file_url),
+                       file_size = COALESCE(%s, file_size),
+                       download_duration_ms = COALESCE(%s, download_duration_ms),
+                       updated_at = NOW()
+                   WHERE id = %s
+               ), job AS (
+                   UPDATE download_jobs
+                   SET completed_files = completed_files + %s, failed_files = failed_files + %s
+                   WHERE id = %s
+               )
+               UPDATE download_tasks
+               SET status = %s, error_message = %s, lease_expires_at = NULL, updated_at = NOW()
+               WHERE id = %s""",
+            ('success' if success else 'failed', error_message,
+             filename, file_url, file_size, download_duration_ms, log_id,
+             int(success), int(not success), job_id,
+             'done' if success else 'failed', error_message, task_id),
+            prepare='finish_download_task',
+        )
+
+    def fail_exhausted_download_tasks(self, max_attempts: int) -> int:
+        """Give up on tasks whose lease expired on their last attempt
+        (e.g. a filing that crashes the worker every time). Marks the task and its
+        download log failed and bumps the job's failed counter in one statement.
+        Returns the number of jobs touched.
+        """
+        return self._execute_update(
+            """WITH exhausted AS (
+                   UPDATE download_tasks
+                   SET status = 'failed', updated_at = NOW(),
+                       error_message = 'Lease expired after ' || attempts || ' attempts'
+                   WHERE status = 'running' AND lease_expires_at < NOW() AND attempts >= %s
+                   RETURNING job_id, log_id
+               ), logs AS (
+                   UPDATE download_logs dl
+                   SET status = 'failed', error_message = 'Worker lost while downloading',
+                       updated_at = NOW()
+                   FROM exhausted e WHERE dl.id = e.log_id
+               )
+               UPDATE download_jobs j SET failed_files = j.failed_files + x.n
+               FROM (SELECT job_id, COUNT(*) AS n FROM exhausted GROUP BY job_id) x
+               WHERE j.id = x.job_id""",
+            (max_attempts,)
+        )
+
+    def count_open_download_tasks(self, job_id: int) -> int:
+        row = self._execute_one(
+            """SELECT COUNT(*) AS n FROM download_tasks
+               WHERE job_id = %s AND status IN ('pending', 'running')""",
+            (job_id,)
+        )
+        return row['n'] if row else 0
+
     # ----------------------------------------------------------------
     # Shared filings (财报永久存储, 所有用户共享, 按公司/年/季度去重)
     # ----------------------------------------------------------------
@@ -181,85 +822,304 @@ class Database:
         return self._execute_one(
             """SELECT id, company_id, year, quarter, filename, file_url, content_type, file_size, created_at
                FROM shared_filings WHERE company_id = %s AND year = %s AND quarter = %s""",
-            (company_id, year, quarter)
+            (company_id, year, quarter),
+            prepare='get_shared_filing',
         )
 
-    def save_shared_filing(
-        self, company_id: int, year: int, quarter: str,
+    @_writes('filings')
+    def record_downloaded_filing(
+        self, job_id: int, log_id: int, task_id: Optional[int],
+        company_id: int, year: int, quarter: str,
         filename: str, file_url: str, content_type: str,
-        file_content: bytes, source: str = 'sec_edgar'
+        file_content: bytes, source: str, download_duration_ms: int,
     ) -> int:
-        existing = self.get_shared_filing(company_id, year, quarter)
-        if existing:
-            logger.info(f"Filing already exists: company={company_id} {year} {quarter}, skipping")
-            return existing['id']
-
-        with self._get_conn() as conn:
+        """Write everything that finishes a downloaded task in one round trip
+        and one transaction: insert the filing, mark its log successful, bump
+        the job's completed_files and close the task (when leased).
+        Returns the filing id, or 0 if another worker saved it first.
+        """
+        with self._get_conn('blob') as conn:
             with conn.cursor() as cur:
                 cur.execute(
-                    """INSERT INTO shared_filings
-                       (company_id, year, quarter, filename, file_url, content_type, file_size, file_content, source)
-                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                       ON CONFLICT (company_id, year, quarter) DO NOTHING
-                       RETURNING id""",
+                    """WITH filing AS (
+                           INSERT INTO shared_filings
+                             (company_id, year, quarter, filename, file_url, content_type,
+                              file_size, file_content, content_sha256, source)
+                           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                           ON CONFLICT (company_id, year, quarter) DO NOTHING
+                           RETURNING id
+                       ), log AS (
+                           UPDATE download_logs
+                           SET status = 'success', filename = %s, file_url = %s, file_size = %s,
+                               download_duration_ms = %s, updated_at = NOW()
+                           WHERE id = %s
+                       ), job AS (
+                           UPDATE download_jobs SET completed_files = completed_files + 1
+                           WHERE id = %s
+                       ), task AS (
+                           UPDATE download_tasks
+                           SET status = 'done', error_message = NULL,
+                               lease_expires_at = NULL, updated_at = NOW()
+                           WHERE id = %s
+                       )
+                       SELECT id FROM filing""",
                     (company_id, year, quarter, filename, file_url, content_type,
-                     len(file_content), psycopg2.Binary(file_content), source)
+                     len(file_content), psycopg2.Binary(file_content),
+                     hashlib.sha256(file_content).hexdigest(), source,
+                     filename, file_url, len(file_content), download_duration_ms, log_id,
+                     job_id,
+                     task_id)
                 )
                 row = cur.fetchone()
                 return row['id'] if row else 0
 
-    def get_shared_filing_content(self, filing_id: int) -> Optional[Dict]:
-        return self._execute_one("SELECT * FROM shared_filings WHERE id = %s", (filing_id,))
+    def get_filing_coverage(self) -> List[Dict]:
+        """One row per (company, period) with a filing, plus one row with NULL
+        period for each active company that has none. Reads the trigger-
+        maintained filing_coverage table, never shared_filings.
+        """
+        return self._execute(
+            """SELECT c.id AS company_id, c.ticker, c.name, c.category,
+                      fc.year, fc.quarter, fc.filing_id, fc.source, fc.file_size
+               FROM companies c
+               LEFT JOIN filing_coverage fc ON fc.company_id = c.id
+               WHERE c.is_active = true OR fc.company_id IS NOT NULL
+               ORDER BY c.category, c.name, fc.year DESC, fc.quarter DESC"""
+        )
 
-    def list_shared_filings(self, company_id: Optional[int] = None) -> List[Dict]:
+    def list_shared_filings(
+        self, company_id: Optional[int] = None, category: Optional[str] = None,
+        year_from: Optional[int] = None, year_to: Optional[int] = None,
+        source: Optional[str] = None, after: Optional[Tuple[int, str, int]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict]:
+        """Filings newest first, keyset-paginated on (year, quarter, id).
+        `after` is the (year, quarter, id) of the previous page's last row.
+        """
+        clauses, params = _listing_filters(
+            'sf', company_id, category, year_from, year_to, source=source
+        )
+        if after:
+            clauses.append("(sf.year, sf.quarter, sf.id) < (%s, %s, %s)")
+            params.extend(after)
         sql = """SELECT sf.id, sf.company_id, sf.year, sf.quarter, sf.filename,
                         sf.file_url, sf.content_type, sf.file_size, sf.source, sf.created_at,
                         c.name as company_name, c.ticker as company_ticker, c.category
                  FROM shared_filings sf
                  LEFT JOIN companies c ON sf.company_id = c.id"""
-        params: list = []
-        if company_id:
-            sql += " WHERE sf.company_id = %s"
-            params.append(company_id)
-        sql += " ORDER BY sf.year DESC, sf.quarter, c.name"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY sf.year DESC, sf.quarter DESC, sf.id DESC"
+        if limit:
+            sql += " LIMIT %s"
+            params.append(limit)
         return self._execute(sql, tuple(params) if params else None)
 
+    def lookup_shared_filings(
+        self, keys: List[Tuple[Optional[int], Optional[str], int, str]]
+    ) -> List[Dict]:
+        """Resolve (company_id, ticker, year, quarter) keys in one query.
+        Returns one row per key, in order; id is NULL where no filing exists.
+        A key's ticker is only used when its company_id is None.
+        """
+        if not keys:
+            return []
+        company_ids, tickers, years, quarters = (list(col) for col in zip(*keys))
+        return self._execute(
+            """SELECT c.id AS company_id, c.ticker, k.year, k.quarter,
+                      sf.id, sf.filename, sf.content_type, sf.file_size, sf.source, sf.created_at
+               FROM unnest(%s::int[], %s::text[], %s::int[], %s::text[]) WITH ORDINALITY
+                    AS k(company_id, ticker, year, quarter, idx)
+               LEFT JOIN companies c ON c.id = COALESCE(
+                   k.company_id, (SELECT id FROM companies WHERE ticker = k.ticker))
+               LEFT JOIN shared_filings sf
+                      ON sf.company_id = c.id AND sf.year = k.year AND sf.quarter = k.quarter
+               ORDER BY k.idx""",
+            (company_ids, tickers, years, quarters),
+        )
+
+    def count_shared_filings(
+        self, company_id: Optional[int] = None, category: Optional[str] = None,
+        year_from: Optional[int] = None, year_to: Optional[int] = None,
+        source: Optional[str] = None,
+    ) -> int:
+        """Total for the same filters as list_shared_filings (no join, index-only)"""
+        clauses, params = _listing_filters(
+            'sf', company_id, category, year_from, year_to, source=source
+        )
+        sql = "SELECT COUNT(*) AS n FROM shared_filings sf"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        row = self._execute_one(sql, tuple(params) if params else None)
+        return row['n'] if row else 0
+
     # ----------------------------------------------------------------
     # User reports (用户研报, 各自上传)
     # ----------------------------------------------------------------
-    def save_user_report(
-        self, title: str, filename: str, content_type: str,
-        file_content: bytes, uploader_name: str = 'anonymous',
+    @_writes('reports')
+    def save_user_report_stream(
+        self, source, title: str, filename: str, uploader_name: str = 'anonymous',
         company_id: Optional[int] = None, year: Optional[int] = None,
-        quarter: Optional[str] = None, description: str = ''
+        quarter: Optional[str] = None, description: str = '', chunk_bytes: int = 256 * 1024,
     ) -> int:
-        with self._get_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """INSERT INTO user_reports
-                       (uploader_name, company_id, title, description, year, quarter,
-                        filename, content_type, file_size, file_content)
-                       VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                       RETURNING id""",
-                    (uploader_name, company_id, title, description, year, quarter,
-                     filename, content_type, len(file_content), psycopg2.Binary(file_content))
-                )
-                row = cur.fetchone()
-                return row['id'] if row else 0
-
-    def get_user_report(self, report_id: int) -> Optional[Dict]:
-        return self._execute_one("SELECT * FROM user_reports WHERE id = %s", (report_id,))
+        """Insert a report whose content is read from `source` (an
+        uploads.IngestReader) chunk by chunk into a single-row COPY, so the
+        file is never held whole. Size, hash and content type are only known
+        once the COPY has drained `source` and are set in the same transaction.
+        """
+        with self._get_conn('blob') as conn:
+            conn.autocommit = False
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT nextval(pg_get_serial_sequence('user_reports', 'id')) AS id")
+                    report_id = cur.fetchone()['id']
+                    prefix = (report_id, uploader_name, company_id, title, description,
+                              year, quarter, filename, source.declared_type or 'application/octet-stream', 0)
+                    try:
+                        cur.copy_expert(
+                            """COPY user_reports (id, uploader_name, company_id, title, description,
+                                                  year, quarter, filename, content_type, file_size,
+                                                  file_content)
+                               FROM STDIN""",
+                            _ByteaCopyRow(prefix, source, chunk_bytes),
+                            size=2 * chunk_bytes,
+                        )
+                    except psycopg2.Error as e:
+                        if source.exceeded:
+                            raise UploadTooLarge(too_large_detail(source.max_bytes)) from e
+                        raise
+                    cur.execute(
+                        """UPDATE user_reports SET file_size = %s, content_sha256 = %s, content_type = %s
+                           WHERE id = %s""",
+                        (source.size, source.hexdigest(), source.content_type, report_id)
+                    )
+                conn.commit()
+                return report_id
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                conn.autocommit = True
 
-    def list_user_reports(self, company_id: Optional[int] = None) -> List[Dict]:
-        sql = """SELECT id, uploader_name, company_id, title, description,
-                        year, quarter, filename, content_type, file_size, created_at
-                 FROM user_reports"""
-        params: list = []
-        if company_id:
-            sql += " WHERE company_id = %s"
-            params.append(company_id)
-        sql += " ORDER BY created_at DESC"
+    def list_user_reports(
+        self, company_id: Optional[int] = None, category: Optional[str] = None,
+        year_from: Optional[int] = None, year_to: Optional[int] = None,
+        after: Optional[Tuple[str, int]] = None, limit: Optional[int] = None,
+    ) -> List[Dict]:
+        """Reports newest first, keyset-paginated on (created_at, id).
+        `after` is the (created_at, id) of the previous page's last row.
+        """
+        clauses, params = _listing_filters('r', company_id, category, year_from, year_to)
+        if after:
+            clauses.append("(r.created_at, r.id) < (%s::timestamptz, %s)")
+            params.extend(after)
+        sql = """SELECT r.id, r.uploader_name, r.company_id, r.title, r.description,
+                        r.year, r.quarter, r.filename, r.content_type, r.file_size, r.created_at
+                 FROM user_reports r"""
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY r.created_at DESC, r.id DESC"
+        if limit:
+            sql += " LIMIT %s"
+            params.append(limit)
         return self._execute(sql, tuple(params) if params else None)
 
+    def count_user_reports(
+        self, company_id: Optional[int] = None, category: Optional[str] = None,
+        year_from: Optional[int] = None, year_to: Optional[int] = None,
+    ) -> int:
+        clauses, params = _listing_filters('r', company_id, category, year_from, year_to)
+        sql = "SELECT COUNT(*) AS n FROM user_reports r"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        row = self._execute_one(sql, tuple(params) if params else None)
+        return row['n'] if row else 0
+
+    @_writes('reports')
     def delete_user_report(self, report_id: int) -> bool:
         return self._execute_update("DELETE FROM user_reports WHERE id = %s", (report_id,)) > 0
+
+    # ----------------------------------------------------------------
+    # Blob streaming (file_content read in chunks, never loaded whole)
+    # ----------------------------------------------------------------
+    def get_blob_meta(self, table: str, row_id: int) -> Optional[Dict]:
+        """Filename, content type, size, hash and creation time of a
+        filing/report without its content (validators for conditional GETs)
+        """
+        if table not in _BLOB_TABLES:
+            raise ValueError(f"Invalid blob table: {table}")
+        return self._execute_one(
+            f"""SELECT id, filename, content_type, content_sha256, created_at,
+                       COALESCE(file_size, octet_length(file_content)) AS file_size
+                FROM {table} WHERE id = %s""",
+            (row_id,),
+            prepare=f"{table}_blob_meta",
+        )
+
+    def read_blob_chunk(self, table: str, row_id: int, offset: int, length: int) -> Optional[memoryview]:
+        """Read `length` bytes of file_content starting at 0-based `offset`.
+        Returns None if the row is gone, an empty buffer past the end.
+        """
+        if table not in _BLOB_TABLES:
+            raise ValueError(f"Invalid blob table: {table}")
+        row = self._execute_one(
+            f"SELECT substring(file_content FROM %s FOR %s) AS chunk FROM {table} WHERE id = %s",
+            (offset + 1, length, row_id),
+            pool='blob',
+            prepare=f"{table}_read_chunk",
+        )
+        return row['chunk'] if row else None
+
+    # ----------------------------------------------------------------
+    # Bulk export (server-side cursors, never the whole result in memory)
+    # ----------------------------------------------------------------
+    def export_rows(
+        self, kind: str, batch_size: int = 2000,
+        company_id: Optional[int] = None, category: Optional[str] = None,
+        year_from: Optional[int] = None, year_to: Optional[int] = None,
+        source: Optional[str] = None, status: Optional[str] = None,
+        job_id: Optional[int] = None,
+    ) -> Iterable[List[Dict]]:
+        """Yield every filing/report/job/log row in id order, `batch_size` at a time.
+        Rows are fetched through a named (server-side) cursor with itersize =
+        batch_size, so memory stays flat however large the table is. The
+        generator holds an 'export' connection open until exhausted or closed.
+        """
+        if kind not in _EXPORT_SELECTS:
+            raise ValueError(f"Invalid export kind: {kind}")
+        alias = {'filings': 'sf', 'reports': 'r', 'jobs': 'j', 'logs': 'l'}[kind]
+        if kind in ('filings', 'reports'):
+            clauses, params = _listing_filters(
+                alias, company_id, category, year_from, year_to,
+                source=source if kind == 'filings' else None,
+            )
+        else:
+            clauses, params = [], []
+            if status:
+                clauses.append(f"{alias}.status = %s")
+                params.append(status)
+            if job_id and kind == 'logs':
+                clauses.append(f"{alias}.job_id = %s")
+                params.append(job_id)
+        sql = _EXPORT_SELECTS[kind]
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {alias}.id"
+
+        with self._get_conn('export') as conn:
+            # Named cursors only live inside a transaction
+            conn.autocommit = False
+            try:
+                with conn.cursor(name=f"export_{kind}") as cur:
+                    cur.itersize = batch_size
+                    cur.execute(sql, tuple(params) if params else None)
+                    while True:
+                        batch = list(islice(cur, batch_size))
+                        if not batch:
+                            break
+                        yield batch
+            finally:
+                try:
+                    conn.rollback()
+                finally:
+                    conn.autocommit = True
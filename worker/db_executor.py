@@ -0,0 +1,114 @@
+"""
+Dedicated executor for blocking database calls.
+The default loop executor has min(32, cpu+4) threads while the psycopg2 pool
+only has `maxconn` connections, so surplus threads fail with PoolError or
+contend for connections. DBExecutor runs DB work on exactly as many threads
+as there are connections, queues callers on the event loop with an admission
+timeout, and records queue-wait / run-time metrics.
+"""
+
+import time
+import asyncio
+import logging
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from metrics import Histogram
+
+logger = logging.getLogger('finsight-worker.db-executor')
+
+DEFAULT_QUEUE_TIMEOUT = 10.0  # seconds a caller may wait for a free DB thread
+
+
+class DBBusyError(Exception):
+    """Raised when no DB thread became free within the queue timeout"""
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, fn: Callable, *args):
+    try:
+        loop.call_soon_threadsafe(fn, *args)
+    except RuntimeError:
+        pass  # loop already closed (shutdown); its semaphore is gone with it
+
+
+class DBExecutor:
+    """Bounded thread pool sized to the connection pool"""
+
+    def __init__(self, max_workers: int, queue_timeout: float = DEFAULT_QUEUE_TIMEOUT,
+                 name: str = 'db'):
+        self.max_workers = max_workers
+        self.queue_timeout = queue_timeout
+        self.name = name
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        # One admission semaphore per event loop (tests and TestClient use several)
+        self._slots: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]' = \
+            weakref.WeakKeyDictionary()
+        self.queue_wait_ms = Histogram()
+        self.run_ms = Histogram()
+        self._queued = 0
+        self._in_flight = 0
+        self._timeouts = 0
+        self._errors = 0
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        sem = self._slots.get(loop)
+        if sem is None:
+            sem = self._slots[loop] = asyncio.Semaphore(self.max_workers)
+        return sem
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking DB call on a dedicated thread.
+        Raises DBBusyError if no thread frees up within queue_timeout.
+        """
+        sem = self._semaphore()
+        queued_at = time.monotonic()
+        self._queued += 1
+        try:
+            await asyncio.wait_for(sem.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise DBBusyError(
+                f"No database connection available within {self.queue_timeout:.0f}s"
+            ) from None
+        finally:
+            self._queued -= 1
+        started = time.monotonic()
+        self.queue_wait_ms.observe((started - queued_at) * 1000)
+        loop = asyncio.get_running_loop()
+        call = functools.partial(fn, *args, **kwargs) if args or kwargs else fn
+        try:
+            future = self._executor.submit(call)
+        except BaseException:
+            sem.release()
+            raise
+        self._in_flight += 1
+
+        def finished(done):
+            self._in_flight -= 1
+            self.run_ms.observe((time.monotonic() - started) * 1000)
+            if not done.cancelled() and done.exception() is not None:
+                self._errors += 1
+            sem.release()
+
+        # The slot belongs to the thread, not the caller: a cancelled caller
+        # must not admit another call while this one is still running
+        future.add_done_callback(lambda done: _call_soon(loop, finished, done))
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict:
+        return {
+            'max_workers': self.max_workers,
+            'queue_timeout_s': self.queue_timeout,
+            'queued': self._queued,
+            'in_flight': self._in_flight,
+            'timeouts': self._timeouts,
+            'errors': self._errors,
+            'queue_wait_ms': self.queue_wait_ms.snapshot(),
+            'run_ms': self.run_ms.snapshot(),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
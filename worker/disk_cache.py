@@ -0,0 +1,162 @@
+"""
+Byte-bounded on-disk LRU of downloaded blobs.
+A full download that misses is written through to <dir>/<table>/<id>-<sha256>
+while it streams; later requests (including ranges) are served from the file
+with FileResponse, which uses sendfile / ASGI pathsend where the server
+supports it, instead of pulling the BYTEA out of Postgres again.
+Keys include the content hash, so a stale file can never be served for a
+row. The index lives in this process; files left by a previous run are
+adopted by load().
+"""
+
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger('finsight-worker.disk-cache')
+
+Key = Tuple[str, int, str]  # (table, row_id, content_sha256)
+
+
+class DiskBlobCache:
+    """LRU of blob files, evicting least recently served first"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._files: 'OrderedDict[Key, int]' = OrderedDict()  # key -> size
+        self._filling: Set[Key] = set()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def path(self, key: Key) -> str:
+        table, row_id, sha = key
+        return os.path.join(self.directory, table, f"{row_id}-{sha}")
+
+    def load(self):
+        """Adopt files from a previous run (oldest first) and drop partial writes"""
+        if not self.enabled or not os.path.isdir(self.directory):
+            return
+        found = []
+        for table in os.listdir(self.directory):
+            table_dir = os.path.join(self.directory, table)
+            if not os.path.isdir(table_dir):
+                continue
+            for name in os.listdir(table_dir):
+                path = os.path.join(table_dir, name)
+                if name.endswith('.tmp'):
+                    self._remove(path)
+                    continue
+                row_id, _, sha = name.partition('-')
+                if not row_id.isdigit() or not sha:
+                    continue
+                st = os.stat(path)
+                found.append((st.st_mtime, (table, int(row_id), sha), st.st_size))
+        for _, key, size in sorted(found):
+            self._add(key, size)
+        logger.info(f"Disk blob cache: adopted {len(self._files)} files ({self._bytes} bytes)")
+
+    def lookup(self, key: Key) -> Optional[str]:
+        """Path of the cached file, or None (counted as a miss)"""
+        if key in self._files:
+            self._files.move_to_end(key)
+            self._hits += 1
+            return self.path(key)
+        self._misses += 1
+        return None
+
+    def discard(self, key: Key):
+        """Forget a file that disappeared underneath the index"""
+        size = self._files.pop(key, None)
+        if size is not None:
+            self._bytes -= size
+
+    async def write_through(
+        self, key: Key, size: int, body: AsyncIterator[memoryview]
+    ) -> AsyncIterator[memoryview]:
+        """Pass `body` through, saving it as `key` if it streams completely.
+        Only one request fills a given key; oversized blobs are not cached.
+        """
+        if key in self._filling or key in self._files or size > self.max_bytes:
+            async for chunk in body:
+                yield chunk
+            return
+        self._filling.add(key)
+        final = self.path(key)
+        tmp = f"{final}.{os.getpid()}.tmp"
+        written = 0
+        f = None
+        try:
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            f = open(tmp, 'wb')
+        except OSError as e:
+            logger.warning(f"Disk blob cache unavailable: {e}")
+        try:
+            async for chunk in body:
+                yield chunk
+                if f is not None:
+                    try:
+                        await asyncio.to_thread(f.write, chunk)
+                        written += len(chunk)
+                    except OSError as e:
+                        # e.g. ENOSPC: stop caching, never fail the download
+                        logger.warning(f"Disk blob cache write failed, not caching {final}: {e}")
+                        f.close()
+                        f = None
+                        self._remove(tmp)
+        finally:
+            self._filling.discard(key)
+            if f is not None:
+                f.close()
+                if written == size:
+                    os.replace(tmp, final)
+                    self._add(key, size)
+                    self._writes += 1
+                else:
+                    self._remove(tmp)
+
+    def invalidate(self, table: str, row_id: int):
+        """Delete every cached version of one row (e.g. a deleted report)"""
+        for key in [k for k in self._files if k[:2] == (table, row_id)]:
+            self.discard(key)
+            self._remove(self.path(key))
+
+    def _add(self, key: Key, size: int):
+        self._files[key] = size
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._files:
+            old, old_size = self._files.popitem(last=False)
+            self._bytes -= old_size
+            self._evictions += 1
+            self._remove(self.path(old))
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not remove {path}: {e}")
+
+    def stats(self) -> Dict:
+        lookups = self._hits + self._misses
+        return {
+            'max_bytes': self.max_bytes,
+            'bytes': self._bytes,
+            'files': len(self._files),
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_rate': round(self._hits / lookups, 4) if lookups else None,
+            'writes': self._writes,
+            'evictions': self._evictions,
+        }
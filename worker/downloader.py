@@ -8,14 +8,16 @@ import re
 import asyncio
 import time
 import logging
-from typing import Optional, List, Dict, Tuple
+from typing import Optional, List, Dict, Tuple, Set, Iterable, Iterator
 from datetime import datetime
-from dataclasses import dataclass
 
 import httpx
 from bs4 import BeautifulSoup
 
+from config import settings
 from database import Database
+from db_executor import DBExecutor
+from metrics import Histogram
 
 logger = logging.getLogger('finsight-worker.downloader')
 
@@ -50,15 +52,73 @@ MAX_RETRIES = 3
 RETRY_BASE_DELAY = 2.0  # seconds, exponential backoff
 RATE_LIMIT_DELAY = 1.2  # seconds between requests (SEC EDGAR asks for 10 req/s max)
 REQUEST_TIMEOUT = 30
+TASK_POLL_INTERVAL = 5  # seconds between checks for tasks leased by peers
+CLAIM_RETRY_DELAY = 1.0  # seconds, doubled per consecutive failed task claim
+MAX_CLAIM_ERRORS = 5  # consecutive failed claims before a consumer gives up
 
 
-@dataclass
 class DownloadTask:
-    """Represents a single file download task"""
-    job_id: int
-    company: Dict
-    year: int
-    quarter: str
+    """Represents a single file download task.
+    Slotted and holding a reference to a shared company dict (not a copy),
+    so tens of thousands of tasks stay cheap.
+    """
+    __slots__ = ('job_id', 'company', 'year', 'quarter', 'task_id', 'log_id', 'completed')
+
+    def __init__(
+        self, job_id: int, company: Dict, year: int, quarter: str,
+        task_id: Optional[int] = None,  # download_tasks row, when leased from the queue
+        log_id: Optional[int] = None,   # download_logs row, reused when a task is retried
+    ):
+        self.job_id = job_id
+        self.company = company
+        self.year = year
+        self.quarter = quarter
+        self.task_id = task_id
+        self.log_id = log_id
+        # Set once the task row was closed together with the filing writes
+        self.completed = False
+
+    @property
+    def company_id(self) -> int:
+        return self.company['id']
+
+    def __repr__(self) -> str:
+        return (f"DownloadTask(job_id={self.job_id}, company_id={self.company_id}, "
+                f"year={self.year}, quarter={self.quarter!r}, task_id={self.task_id})")
+
+    @classmethod
+    def from_row(cls, row: Dict, companies: Optional[Dict[int, Dict]] = None) -> 'DownloadTask':
+        """Build a task from a claim_download_tasks row.
+        With a `companies` cache, tasks for the same company share one dict.
+        """
+        fields = {
+            'id': row['company_id'], 'name': row.get('name'),
+            'ticker': row['ticker'], 'sec_cik': row.get('sec_cik') or '',
+            'ir_url': row.get('ir_url') or '', 'category': row.get('category'),
+        }
+        if companies is None:
+            company = fields
+        else:
+            company = companies.setdefault(row['company_id'], fields)
+            company.update(fields)
+        return cls(
+            job_id=row['job_id'],
+            company=company,
+            year=row['year'],
+            quarter=row['quarter'],
+            task_id=row['id'],
+            log_id=row.get('log_id'),
+        )
+
+
+def iter_download_plan(
+    company_ids: Iterable[int], years: List[int], quarters: List[str]
+) -> Iterator[Tuple[int, int, str]]:
+    """Lazily yield (company_id, year, quarter) for every filing in a job"""
+    for company_id in company_ids:
+        for year in years:
+            for quarter in quarters:
+                yield company_id, year, quarter
 
 
 class EarningsDownloader:
@@ -66,11 +126,24 @@ class EarningsDownloader:
     Features: concurrent downloads, retry with exponential backoff, content validation.
     """
 
-    def __init__(self, db: Database):
+    def __init__(
+        self, db: Database, executor: Optional[DBExecutor] = None,
+        blob_executor: Optional[DBExecutor] = None,
+    ):
         self.db = db
+        # Blocking DB calls run on threads sized to the connection pool;
+        # filing content writes may use a separate executor for the blob pool
+        self.executor = executor or DBExecutor(settings.db_pool_max_connections)
+        self.blob_executor = blob_executor or self.executor
         self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
         self._rate_limiter = asyncio.Lock()
         self._last_request_time = 0.0
+        # company_id -> company dict shared by every task of that company
+        self._companies: Dict[int, Dict] = {}
+        # task_id -> (job_id, download coroutine) for tasks leased by this worker
+        self._inflight: Dict[int, Tuple[int, asyncio.Task]] = {}
+        # Client-side wait for each task's batched result writes
+        self.task_write_ms = Histogram()
 
     async def _rate_limited_request(
         self, client: httpx.AsyncClient, url: str, headers: dict = None
@@ -87,17 +160,20 @@ class EarningsDownloader:
         response.raise_for_status()
         return response
 
+    async def _run_db(self, fn, *args, **kwargs):
+        """Run a blocking Database method off the event loop"""
+        return await self.executor.run(fn, *args, **kwargs)
+
+    async def _run_blob(self, fn, *args, **kwargs):
+        """Run a Database method that moves file content (blob pool)"""
+        return await self.blob_executor.run(fn, *args, **kwargs)
+
     async def process_job(self, job_id: int):
         """Process a complete download job with concurrency and retry"""
         try:
-            # Mark job as running
-            self.db.update_job_status(
-                job_id, 'running',
-                started_at=datetime.utcnow().isoformat()
-            )
-
+            # claim_job/claim_next_job already set status 'running' and started_at
             # Get job details
-            job = self.db.get_job(job_id)
+            job = await self._run_db(self.db.get_job, job_id)
             if not job:
                 logger.error(f"Job #{job_id} not found")
                 return
@@ -107,100 +183,196 @@ class EarningsDownloader:
 
             # Get companies to process
             if job['company_ids']:
-                companies = self.db.get_companies(ids=job['company_ids'])
+                companies = await self._run_db(self.db.get_companies, ids=job['company_ids'])
             elif job['category_filter']:
-                companies = self.db.get_companies(category=job['category_filter'])
+                companies = await self._run_db(self.db.get_companies, category=job['category_filter'])
             else:
-                companies = self.db.get_all_companies()
+                companies = await self._run_db(self.db.get_all_companies)
 
             # Calculate total expected files
             total_files = len(companies) * len(years) * len(quarters)
-            self.db.update_job_status(job_id, 'running', total_files=total_files)
+            if not await self._run_db(self.db.set_job_total_files, job_id, total_files):
+                logger.info(f"Job #{job_id} was cancelled or reclaimed before it started; skipping")
+                return
 
             logger.info(
                 f"Job #{job_id}: {len(companies)} companies x "
                 f"{len(years)} years x {len(quarters)} quarters = {total_files} files"
             )
 
-            # Build task list
-            tasks: List[DownloadTask] = []
-            for company in companies:
-                for year in years:
-                    for quarter in quarters:
-                        tasks.append(DownloadTask(
-                            job_id=job_id,
-                            company=company,
-                            year=year,
-                            quarter=quarter,
-                        ))
-
-            # Process all tasks with concurrency control
+            # Enqueue one durable task per filing (idempotent, so a resumed
+            # job only runs what is still pending). The plan is generated
+            # lazily and inserted in batches; download_tasks is the bounded
+            # queue that the fixed consumer pool below drains.
+            await self._run_db(self.db.enqueue_download_tasks, job_id, iter_download_plan(
+                [company['id'] for company in companies], years, quarters
+            ))
+
+            # Drain this job's tasks; other workers may lease some of them too
             async with httpx.AsyncClient(
                 timeout=REQUEST_TIMEOUT,
                 follow_redirects=True,
             ) as client:
-                download_coros = [
-                    self._download_with_semaphore(client, task)
-                    for task in tasks
-                ]
-                await asyncio.gather(*download_coros, return_exceptions=True)
+                await self._drain_tasks(client, job_id)
+                while await self._run_db(self.db.count_open_download_tasks, job_id) > 0:
+                    await asyncio.sleep(TASK_POLL_INTERVAL)
+                    await self._drain_tasks(client, job_id)  # picks up expired leases
 
             # Check final job status
-            final_job = self.db.get_job(job_id)
+            final_job = await self._run_db(self.db.get_job, job_id)
             if final_job and final_job['status'] == 'running':
-                self.db.update_job_status(
-                    job_id, 'completed',
+                await self._run_db(
+                    self.db.update_job_status, job_id, 'completed',
                     completed_at=datetime.utcnow().isoformat()
                 )
                 logger.info(f"Job #{job_id} completed successfully")
 
         except Exception as e:
             logger.error(f"Job #{job_id} failed: {e}")
-            self.db.update_job_status(
-                job_id, 'failed',
+            await self._run_db(
+                self.db.update_job_status, job_id, 'failed',
                 error_message=str(e),
                 completed_at=datetime.utcnow().isoformat()
             )
 
-    async def _download_with_semaphore(
-        self, client: httpx.AsyncClient, task: DownloadTask
-    ):
-        """Download with concurrency limit"""
-        async with self._semaphore:
-            await self._download_filing_with_retry(client, task)
+    @property
+    def leased_task_ids(self) -> Set[int]:
+        """Tasks whose leases the heartbeat loop must keep alive"""
+        return set(self._inflight)
+
+    def cancel_tasks(self, task_ids: Set[int] = frozenset(), job_id: Optional[int] = None) -> int:
+        """Abort in-flight downloads by task id and/or job. Their semaphore slot,
+        rate-limiter lock and HTTP connection are released as the coroutine unwinds.
+        """
+        cancelled = 0
+        for task_id, (task_job_id, run) in list(self._inflight.items()):
+            if task_id in task_ids or (job_id is not None and task_job_id == job_id):
+                run.cancel()
+                cancelled += 1
+        return cancelled
+
+    async def run_shared_tasks(self) -> int:
+        """Help with queued tasks of any running job (used by idle workers).
+        Returns the number of tasks processed.
+        """
+        async with httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            follow_redirects=True,
+        ) as client:
+            return await self._drain_tasks(client)
+
+    async def _drain_tasks(
+        self, client: httpx.AsyncClient, job_id: Optional[int] = None
+    ) -> int:
+        """Run MAX_CONCURRENT_DOWNLOADS consumers until no task is claimable.
+        job_id=None takes tasks from any running job.
+        """
+        try:
+            await self._run_db(self.db.fail_exhausted_download_tasks, settings.max_task_attempts)
+        except Exception as e:
+            logger.warning(f"Could not fail exhausted tasks (retried on next drain): {e}")
+        consumers = [
+            asyncio.ensure_future(self._task_consumer(client, job_id))
+            for _ in range(MAX_CONCURRENT_DOWNLOADS)
+        ]
+        try:
+            counts = await asyncio.gather(*consumers)
+        except BaseException:
+            # Never let siblings keep leasing on a client the caller is closing
+            for consumer in consumers:
+                consumer.cancel()
+            await asyncio.gather(*consumers, return_exceptions=True)
+            raise
+        return sum(counts)
+
+    async def _task_consumer(
+        self, client: httpx.AsyncClient, job_id: Optional[int]
+    ) -> int:
+        """Lease one task at a time and download it.
+        Leases are taken only after acquiring a download slot so they do not
+        tick away while waiting behind other jobs.
+        """
+        processed = 0
+        claim_errors = 0
+        while True:
+            if claim_errors:
+                await asyncio.sleep(CLAIM_RETRY_DELAY * 2 ** (claim_errors - 1))
+            async with self._semaphore:
+                try:
+                    rows = await self._run_db(
+                        self.db.claim_download_tasks,
+                        settings.worker_id, 1, settings.task_lease_seconds, settings.max_task_attempts,
+                        job_id=job_id
+                    )
+                except Exception as e:
+                    # Transient (DBBusyError, PoolTimeout): back off, don't fail the job
+                    claim_errors += 1
+                    if claim_errors >= MAX_CLAIM_ERRORS:
+                        raise
+                    logger.warning(f"Task claim failed ({claim_errors}/{MAX_CLAIM_ERRORS}): {e}")
+                    continue
+                claim_errors = 0
+                if not rows:
+                    return processed
+                task = DownloadTask.from_row(rows[0], self._companies)
+                run = asyncio.ensure_future(self._download_filing_with_retry(client, task))
+                self._inflight[task.task_id] = (task.job_id, run)
+                try:
+                    await asyncio.wait({run})
+                except asyncio.CancelledError:
+                    run.cancel()  # whole job/consumer cancelled: abort the download too
+                    raise
+                finally:
+                    self._inflight.pop(task.task_id, None)
+
+                if run.cancelled():
+                    logger.info(f"Task #{task.task_id} cancelled")
+                    continue
+                try:
+                    ok = run.result()
+                    if not task.completed:
+                        await self._run_db(
+                            self.db.complete_download_task, task.task_id, 'done' if ok else 'failed'
+                        )
+                except Exception as e:
+                    # Leave the lease to expire so another attempt picks it up
+                    logger.error(f"Task #{task.task_id} aborted: {e}")
+            processed += 1
 
     async def _download_filing_with_retry(
         self, client: httpx.AsyncClient, task: DownloadTask
-    ):
+    ) -> bool:
         """Download a single filing with retry logic.
         Saves to shared_filings table in PostgreSQL (permanent, shared across all users).
         Skips download if filing already exists in DB.
+        Returns True if the filing is available afterwards.
         """
         company = task.company
         ticker = company['ticker']
         company_id = company['id']
-        log_id = self.db.create_download_log(
-            task.job_id, company_id, task.year, task.quarter
-        )
+        log_id = task.log_id
+        if not log_id:
+            log_id = await self._run_db(
+                self.db.create_download_log, task.job_id, company_id, task.year, task.quarter,
+                task_id=task.task_id,
+            )
 
         # Check if this filing already exists in DB (去重: 不重复下载)
-        existing = self.db.get_shared_filing(company_id, task.year, task.quarter)
+        existing = await self._run_db(self.db.get_shared_filing, company_id, task.year, task.quarter)
         if existing:
-            self.db.update_download_log(
-                log_id,
-                status='success',
+            await self._finish(
+                task, log_id, True,
                 filename=existing['filename'],
                 file_url=existing.get('file_url', ''),
                 file_size=existing['file_size'],
                 download_duration_ms=0,
             )
-            self.db.increment_job_counter(task.job_id, 'completed_files')
             logger.info(f"Skipped (already in DB): {ticker} {task.year} {task.quarter}")
-            return
+            return True
 
         for attempt in range(1, MAX_RETRIES + 1):
             try:
-                self.db.update_download_log(log_id, status='downloading')
+                await self._run_db(self.db.update_download_log, log_id, status='downloading')
                 start_time = time.time()
 
                 # Try SEC EDGAR first for US-listed companies with CIK
@@ -233,14 +405,12 @@ class EarningsDownloader:
                     )
 
                 if not filing_url:
-                    self.db.update_download_log(
-                        log_id,
-                        status='failed',
+                    await self._finish(
+                        task, log_id, False,
                         error_message=f'No filing found for {ticker} {task.year} {task.quarter}'
                     )
-                    self.db.increment_job_counter(task.job_id, 'failed_files')
                     logger.warning(f"No filing found: {ticker} {task.year} {task.quarter}")
-                    return
+                    return False
 
                 # Download the file
                 headers = EDGAR_HEADERS if 'sec.gov' in filing_url else HTTP_HEADERS
@@ -265,8 +435,16 @@ class EarningsDownloader:
                     filename += '.pdf'
                     content_type = 'application/pdf'
 
-                # Save to PostgreSQL (永久存储, 所有用户共享)
-                self.db.save_shared_filing(
+                duration_ms = int((time.time() - start_time) * 1000)
+
+                # Save to PostgreSQL (永久存储, 所有用户共享). Filing insert, log
+                # update, job counter and task completion go out as one batch.
+                write_started = time.monotonic()
+                await self._run_blob(
+                    self.db.record_downloaded_filing,
+                    job_id=task.job_id,
+                    log_id=log_id,
+                    task_id=task.task_id,
                     company_id=company_id,
                     year=task.year,
                     quarter=task.quarter,
@@ -275,21 +453,12 @@ class EarningsDownloader:
                     content_type=content_type,
                     file_content=content,
                     source='sec_edgar' if 'sec.gov' in filing_url else 'ir_page',
-                )
-
-                duration_ms = int((time.time() - start_time) * 1000)
-
-                self.db.update_download_log(
-                    log_id,
-                    status='success',
-                    filename=filename,
-                    file_url=filing_url,
-                    file_size=file_size,
                     download_duration_ms=duration_ms,
                 )
-                self.db.increment_job_counter(task.job_id, 'completed_files')
+                self.task_write_ms.observe((time.monotonic() - write_started) * 1000)
+                task.completed = task.task_id is not None
                 logger.info(f"Saved to DB: {filename} ({file_size / 1024:.1f} KB) [attempt {attempt}]")
-                return
+                return True
 
             except Exception as e:
                 logger.warning(
@@ -300,13 +469,19 @@ class EarningsDownloader:
                     delay = RETRY_BASE_DELAY * (2 ** (attempt - 1))
                     await asyncio.sleep(delay)
                 else:
-                    self.db.update_download_log(
-                        log_id,
-                        status='failed',
+                    await self._finish(
+                        task, log_id, False,
                         error_message=f'Failed after {MAX_RETRIES} attempts: {str(e)}'
                     )
-                    self.db.increment_job_counter(task.job_id, 'failed_files')
                     logger.error(f"Download failed: {ticker} {task.year} {task.quarter}: {e}")
+        return False
+
+    async def _finish(self, task: DownloadTask, log_id: int, success: bool, **log_fields):
+        """Log, job counter and task close for a task that saved no filing, in one write"""
+        await self._run_db(
+            self.db.finish_download_task, task.job_id, log_id, task.task_id, success, **log_fields
+        )
+        task.completed = task.task_id is not None
 
     def _validate_content(self, content: bytes, url: str) -> bool:
         """Validate that downloaded content is a real document, not an error page.
@@ -0,0 +1,66 @@
+"""
+Fast JSON responses for the listing endpoints.
+FastAPI's default path walks every row through jsonable_encoder and then
+json.dumps; orjson serialises dicts, datetimes and dates natively and returns
+bytes, so thousands of rows encode in a few milliseconds. Bodies are
+gzip-compressed when the client accepts it.
+"""
+
+import gzip
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Optional
+
+import orjson
+from fastapi import Request
+from fastapi.responses import Response
+
+# Smaller bodies are sent as-is (gzip overhead outweighs the saving)
+GZIP_MIN_BYTES = 1024
+# Level 5 keeps most of level 9's ratio on JSON at a fraction of the CPU
+GZIP_LEVEL = 5
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(obj: Any, option: int = 0) -> bytes:
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS | option)
+
+
+def dumps_ndjson(rows: Iterable[Any]) -> bytes:
+    """One JSON document per line (application/x-ndjson)"""
+    return b''.join(dumps(row, orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """True if Accept-Encoding lists gzip (or *) without q=0"""
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        if coding.strip().lower() not in ('gzip', '*'):
+            continue
+        q = params.strip().lower()
+        if q.startswith('q='):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def json_response(
+    request: Request, payload: Any, status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Serialise `payload` with orjson, gzip-compressing it when worthwhile"""
+    body = dumps(payload)
+    headers = dict(headers or {})
+    if len(body) >= GZIP_MIN_BYTES:
+        headers['Vary'] = 'Accept-Encoding'
+        if accepts_gzip(request.headers.get('accept-encoding')):
+            body = gzip.compress(body, GZIP_LEVEL)
+            headers['Content-Encoding'] = 'gzip'
+    return Response(body, status_code=status_code, headers=headers, media_type='application/json')
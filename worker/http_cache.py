@@ -0,0 +1,112 @@
+"""
+Conditional GET and byte-range helpers for blob downloads (RFC 9110).
+Filings and reports are immutable once stored, so a content hash is a strong
+validator and responses can be cached forever.
+"""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, Optional, Tuple
+
+# Beyond this many ranges the full body is sent instead (guards against
+# pathological many-small-range requests)
+MAX_RANGES = 16
+
+IMMUTABLE_CACHE_CONTROL = "max-age=31536000, immutable"
+
+
+class RangeNotSatisfiable(Exception):
+    """None of the requested ranges overlaps the representation (416)"""
+
+
+def make_etag(content_sha256: Optional[str]) -> Optional[str]:
+    """Strong ETag from the stored content hash"""
+    return f'"{content_sha256}"' if content_sha256 else None
+
+
+def http_date(value: Optional[datetime]) -> Optional[str]:
+    """IMF-fixdate in GMT. psycopg2 returns timestamptz in the session TimeZone
+    (e.g. Asia/Shanghai), which format_datetime(usegmt=True) rejects; naive
+    values are taken as UTC.
+    """
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith('W/') else tag
+
+
+def is_not_modified(
+    etag: Optional[str], last_modified: Optional[datetime],
+    if_none_match: Optional[str], if_modified_since: Optional[str],
+) -> bool:
+    """True when the client's cached copy is current (respond 304).
+    If-None-Match uses weak comparison and takes precedence over If-Modified-Since.
+    """
+    if if_none_match is not None:
+        if not etag:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        return any(_opaque(tag) == etag for tag in if_none_match.split(','))
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None or last_modified.tzinfo is None:
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def if_range_allows(if_range: Optional[str], etag: Optional[str]) -> bool:
+    """Honour Range only if If-Range is absent or strongly matches the ETag"""
+    if if_range is None:
+        return True
+    return bool(etag) and if_range.strip() == etag
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[List[Tuple[int, int]]]:
+    """Parse a `Range: bytes=...` header into inclusive (start, end) pairs.
+    Returns None when the header is absent, malformed, not in bytes, or asks
+    for more than MAX_RANGES ranges (the full body should be sent).
+    Raises RangeNotSatisfiable if no range overlaps the content.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+    parts = spec.split(',')
+    if len(parts) > MAX_RANGES:
+        return None
+    ranges: List[Tuple[int, int]] = []
+    for part in parts:
+        first, dash, last = part.strip().partition('-')
+        if not dash:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if start < 0 or end < start:
+                    return None
+            else:
+                suffix = int(last)  # bytes=-N: the last N bytes
+                if suffix <= 0:
+                    continue
+                start, end = max(size - suffix, 0), size - 1
+        except ValueError:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+    if not ranges:
+        raise RangeNotSatisfiable()
+    return ranges
@@ -6,15 +6,32 @@ Files are stored permanently in PostgreSQL (no filesystem dependency).
 
 import os
 import asyncio
+import secrets
 import logging
+from typing import Optional, Set, Dict, List, Tuple, AsyncIterator, Awaitable, Callable, Iterator
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, BackgroundTasks, HTTPException, UploadFile, File, Form
-from fastapi.responses import Response
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel, Field, model_validator
 
-from database import Database
+from chunk_cache import ChunkCache
+from config import settings
+from database import Database, PoolTimeout
+from db_executor import DBExecutor, DBBusyError
+from disk_cache import DiskBlobCache
 from downloader import EarningsDownloader
+from fast_json import dumps_ndjson, json_response
+from http_cache import (
+    IMMUTABLE_CACHE_CONTROL, RangeNotSatisfiable, http_date, if_range_allows,
+    is_not_modified, make_etag, parse_range,
+)
+from notifier import JobNotifier
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor
+from response_cache import ResponseCache
+from scheduler import estimate_start_times
+from uploads import IngestReader, UploadLimitMiddleware, UploadTooLarge, too_large_detail
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,10 +39,43 @@ logging.basicConfig(
 )
 logger = logging.getLogger('finsight-worker')
 
-db = Database()
-downloader = EarningsDownloader(db)
+db = Database(settings)
+# All blocking DB calls go through here; one thread per pooled connection
+db_executor = DBExecutor(
+    settings.db_pool_max_connections,
+    queue_timeout=settings.db_executor_queue_timeout,
+)
+# Multi-megabyte filing/report reads and writes use their own threads and
+# pool so they never queue ahead of job polling, heartbeats or health checks
+blob_executor = DBExecutor(
+    settings.db_blob_pool_max_connections,
+    queue_timeout=settings.db_blob_executor_queue_timeout,
+    name='db-blob',
+) if settings.db_blob_pool_max_connections else db_executor
+# Exports hold an 'export' connection for their whole duration; one thread
+# per connection keeps them from tying up the metadata threads
+export_executor = DBExecutor(
+    settings.db_export_pool_max_connections,
+    queue_timeout=settings.db_executor_queue_timeout,
+    name='db-export',
+) if settings.db_export_pool_max_connections else db_executor
+downloader = EarningsDownloader(db, db_executor, blob_executor)
+# Payloads of polled read endpoints; every DB write clears its namespace
+response_cache = ResponseCache(settings.response_cache_max_entries)
+db.add_write_listener(response_cache.invalidate)
+# Recently streamed blob chunks, shared by concurrent downloads of one file
+chunk_cache = ChunkCache(settings.blob_chunk_cache_bytes)
+# Hot filings/reports kept as local files and served with FileResponse
+disk_cache = DiskBlobCache(settings.blob_disk_cache_dir, settings.blob_disk_cache_bytes)
+notifier = JobNotifier(db, max_backoff=settings.db_listener_max_backoff)
+
+# Keys accepted by one POST /filings/lookup (a 24-company x 5-year grid is 480)
+MAX_LOOKUP_KEYS = 5000
 
 _shutdown_event = asyncio.Event()
+_active_jobs: Set[asyncio.Task] = set()
+_helper_task: Optional[asyncio.Task] = None
+_running_jobs: Dict[int, asyncio.Task] = {}  # job_id -> task running process_job
 
 
 @asynccontextmanager
@@ -33,15 +83,28 @@ async def lifespan(app: FastAPI):
     logger.info("Starting Finsight Auto Worker...")
     db.connect()
     logger.info("Database connected")
+    await asyncio.to_thread(disk_cache.load)
+    await notifier.start()
     poll_task = asyncio.create_task(job_polling_loop())
+    lease_task = asyncio.create_task(lease_maintenance_loop())
     yield
     logger.info("Shutting down worker...")
     _shutdown_event.set()
-    poll_task.cancel()
-    try:
-        await poll_task
-    except asyncio.CancelledError:
-        pass
+    for task in (poll_task, lease_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    workers = list(_active_jobs) + ([_helper_task] if _helper_task else [])
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    notifier.stop()
+    db_executor.shutdown()
+    for executor in (blob_executor, export_executor):
+        if executor is not db_executor:
+            executor.shutdown()
     db.disconnect()
     logger.info("Worker shut down cleanly")
 
@@ -60,23 +123,87 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(UploadLimitMiddleware, paths=["/reports/upload"], max_bytes=settings.max_upload_bytes)
+
+
+async def _cached(namespace: str, key, ttl: float, fetch: Callable[[], Awaitable]):
+    """Payload from response_cache, else `await fetch()` kept for `ttl` seconds"""
+    payload = response_cache.get(namespace, key)
+    if payload is None:
+        generation = response_cache.generation(namespace)
+        payload = await fetch()
+        response_cache.put(namespace, key, payload, ttl, generation)
+    return payload
+
+
+@app.exception_handler(DBBusyError)
+@app.exception_handler(PoolTimeout)
+async def db_busy_handler(request, exc: Exception):
+    """Shed load instead of piling more requests onto a saturated pool"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"},
+    )
+
+
+async def run_job(job_id: int):
+    """Process one claimed job, counting it against max_active_jobs.
+    Always started as its own task (by the poller or a manual trigger), so
+    cancelling it never touches a request.
+    """
+    task = asyncio.current_task()
+    _active_jobs.add(task)
+    _running_jobs[job_id] = task
+    logger.info(f"Processing job #{job_id}")
+    try:
+        await downloader.process_job(job_id)
+    except asyncio.CancelledError:
+        if not _shutdown_event.is_set():
+            # Cancelled or reclaimed elsewhere: tidy logs touched after cancel_job
+            logger.info(f"Job #{job_id} stopped")
+            try:
+                await db_executor.run(db.skip_unfinished_download_logs, job_id)
+            except Exception as e:
+                logger.error(f"Job #{job_id} log cleanup failed: {e}")
+        raise
+    except Exception as e:
+        logger.error(f"Job #{job_id} error: {e}")
+        await db_executor.run(db.update_job_status, job_id, 'failed', error_message=str(e))
+    finally:
+        _running_jobs.pop(job_id, None)
+        _active_jobs.discard(task)
+
+
+async def help_with_shared_tasks():
+    """While idle, run queued tasks of jobs owned by other workers.
+    Not counted against max_active_jobs: a long backfill being helped with
+    must not hold the slot a newly NOTIFYed job needs (the two share the
+    downloader's semaphore instead).
+    """
+    try:
+        processed = await downloader.run_shared_tasks()
+        if processed:
+            logger.info(f"Helped with {processed} queued download tasks")
+    except Exception as e:
+        logger.error(f"Shared task error: {e}")
 
 
 async def job_polling_loop():
+    global _helper_task
     while not _shutdown_event.is_set():
         try:
-            loop = asyncio.get_event_loop()
-            pending_job = await loop.run_in_executor(None, db.get_next_pending_job)
+            if len(_active_jobs) >= settings.max_active_jobs:
+                # All slots busy: resume claiming as soon as any job finishes
+                await asyncio.wait(set(_active_jobs), return_when=asyncio.FIRST_COMPLETED)
+                continue
+            pending_job = await db_executor.run(db.claim_next_job)
             if pending_job:
-                job_id = pending_job['id']
-                logger.info(f"Processing job #{job_id}")
-                try:
-                    await downloader.process_job(job_id)
-                except Exception as e:
-                    logger.error(f"Job #{job_id} error: {e}")
-                    db.update_job_status(job_id, 'failed', error_message=str(e))
+                _active_jobs.add(asyncio.create_task(run_job(pending_job['id'])))
             else:
-                await asyncio.sleep(10)
+                if _helper_task is None or _helper_task.done():
+                    _helper_task = asyncio.create_task(help_with_shared_tasks())
+                await notifier.wait(settings.job_poll_interval)
         except asyncio.CancelledError:
             break
         except Exception as e:
@@ -84,13 +211,52 @@ async def job_polling_loop():
             await asyncio.sleep(30)
 
 
+def _stop_local_job(job_id: int):
+    """Abort this worker's processing of a job and any of its in-flight tasks"""
+    task = _running_jobs.get(job_id)
+    if task:
+        task.cancel()
+    downloader.cancel_tasks(job_id=job_id)
+
+
+async def lease_maintenance_loop():
+    """Heartbeat the jobs/tasks this worker holds and requeue jobs whose
+    owner stopped heartbeating (crashed, OOM-killed, partitioned).
+    Also the cancellation watcher: anything no longer owned (cancelled via
+    another replica, or reclaimed) is stopped within one interval.
+    """
+    while not _shutdown_event.is_set():
+        try:
+            job_ids = list(_running_jobs)
+            task_ids = list(downloader.leased_task_ids)
+            if job_ids or task_ids:
+                owned_jobs, owned_tasks = await db_executor.run(
+                    db.heartbeat_leases, job_ids, task_ids, settings.task_lease_seconds
+                )
+                for job_id in set(job_ids) - set(owned_jobs):
+                    if job_id in _running_jobs:  # not just finished meanwhile
+                        logger.warning(f"Job #{job_id} no longer owned (cancelled or reclaimed), stopping")
+                        _stop_local_job(job_id)
+                lost_tasks = set(task_ids) - set(owned_tasks)
+                if lost_tasks:
+                    downloader.cancel_tasks(task_ids=lost_tasks)
+            reclaimed = await db_executor.run(db.reclaim_expired_jobs)
+            for job in reclaimed:
+                logger.warning(f"Requeued job #{job['id']} (lease held by {job['claimed_by']} expired)")
+        except asyncio.CancelledError:
+            break
+        except Exception as e:
+            logger.error(f"Lease maintenance error: {e}")
+        await asyncio.sleep(settings.job_heartbeat_interval)
+
+
 # ================================================================
 # Health
 # ================================================================
 @app.get("/health")
 async def health_check():
-    loop = asyncio.get_event_loop()
-    db_ok = await loop.run_in_executor(None, db.check_connection)
+    db_ok = await _cached('health', None, settings.cache_ttl_health,
+                          lambda: db_executor.run(db.check_connection))
     return {
         "status": "healthy" if db_ok else "degraded",
         "database": "connected" if db_ok else "disconnected",
@@ -99,70 +265,369 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """In-process metrics for the DB executors and connection pools"""
+    return {
+        "db_executor": db_executor.stats(),
+        "blob_executor": blob_executor.stats(),
+        "export_executor": export_executor.stats(),
+        "db_pools": db.pool_stats(),  # in-memory only; must not queue behind a saturated pool
+        "task_write_ms": downloader.task_write_ms.snapshot(),
+        "response_cache": response_cache.stats(),
+        "blob_chunk_cache": chunk_cache.stats(),
+        "blob_disk_cache": disk_cache.stats(),
+    }
+
+
 # ================================================================
 # Jobs
 # ================================================================
 @app.post("/jobs/{job_id}/trigger")
-async def trigger_job(job_id: int, background_tasks: BackgroundTasks):
-    loop = asyncio.get_event_loop()
-    job = await loop.run_in_executor(None, db.get_job, job_id)
+async def trigger_job(job_id: int):
+    job = await db_executor.run(db.get_job, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     if job['status'] not in ('pending', 'failed'):
         raise HTTPException(status_code=400, detail=f"Job status is '{job['status']}'")
-    if job['status'] == 'failed':
-        db.update_job_status(job_id, 'pending', error_message=None)
-    background_tasks.add_task(downloader.process_job, job_id)
+    if len(_active_jobs) >= settings.max_active_jobs:
+        # Left unclaimed: the poller starts it once a slot frees up
+        raise HTTPException(
+            status_code=503,
+            detail=f"Worker is running {settings.max_active_jobs} jobs; try again later",
+            headers={"Retry-After": str(int(settings.job_poll_interval))},
+        )
+    claimed = await db_executor.run(db.claim_job, job_id)
+    if not claimed:
+        raise HTTPException(status_code=409, detail=f"Job #{job_id} was claimed by another worker")
+    _active_jobs.add(asyncio.create_task(run_job(job_id)))
     return {"message": f"Job #{job_id} triggered", "status": "processing"}
 
 
+def _job_queue_snapshot() -> Dict[int, Dict]:
+    """Scheduler order of pending jobs with position and estimated start"""
+    queue = db.list_job_queue()
+    backlog = db.get_queue_backlog()
+    estimated = estimate_start_times(queue, backlog['backlog_files'], backlog['files_per_second'])
+    return {job['id']: job for job in estimated}
+
+
+def _with_queue_info(job: Dict, queue: Dict[int, Dict]) -> Dict:
+    entry = queue.get(job['id'])
+    if entry:
+        job = {**job, 'queue_position': entry['queue_position'],
+               'estimated_start_at': entry['estimated_start_at']}
+    return job
+
+
+@app.get("/queue")
+async def get_queue():
+    """Pending jobs in scheduling order, with queue position and estimated start"""
+    queue = await db_executor.run(_job_queue_snapshot)
+    return {"queue": list(queue.values()), "total": len(queue)}
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: int):
+    """Cancel a pending or running job. Work on this worker stops at once;
+    other replicas stop within job_heartbeat_interval.
+    """
+    cancelled = await db_executor.run(db.cancel_job, job_id)
+    if not cancelled:
+        job = await db_executor.run(db.get_job, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        raise HTTPException(status_code=400, detail=f"Job status is '{job['status']}'")
+    _stop_local_job(job_id)
+    return {"message": f"Job #{job_id} cancelled", "status": "cancelled"}
+
+
 @app.get("/jobs")
-async def list_jobs(limit: int = 20):
-    loop = asyncio.get_event_loop()
-    jobs = await loop.run_in_executor(None, db.list_jobs, limit)
-    return {"jobs": jobs}
+async def list_jobs(request: Request, limit: int = 20):
+    async def fetch():
+        jobs = await db_executor.run(db.list_jobs, limit)
+        if any(job['status'] == 'pending' for job in jobs):
+            queue = await db_executor.run(_job_queue_snapshot)
+            jobs = [_with_queue_info(job, queue) for job in jobs]
+        return {"jobs": jobs}
+
+    return json_response(request, await _cached('jobs', ('list', limit), settings.cache_ttl_jobs, fetch))
 
 
 @app.get("/jobs/{job_id}")
-async def get_job(job_id: int):
-    loop = asyncio.get_event_loop()
-    job = await loop.run_in_executor(None, db.get_job, job_id)
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
-    logs = await loop.run_in_executor(None, db.get_download_logs, job_id)
-    return {"job": job, "logs": logs}
+async def get_job(job_id: int, request: Request):
+    async def fetch():
+        job = await db_executor.run(db.get_job, job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job['status'] == 'pending':
+            queue = await db_executor.run(_job_queue_snapshot)
+            job = _with_queue_info(job, queue)
+        logs = await db_executor.run(db.get_download_logs, job_id)
+        return {"job": job, "logs": logs}
+
+    return json_response(request, await _cached('jobs', job_id, settings.cache_ttl_jobs, fetch))
 
 
 # ================================================================
 # Shared Filings (财报下载 - 所有用户共享, 存在PostgreSQL里)
 # ================================================================
+async def _keyset_page(list_fn, count_fn, filters: Dict, after, limit: int):
+    """Fetch one page (limit + 1 rows to detect more) and, on the first page
+    only, the filtered total via a separate COUNT run in parallel.
+    """
+    page = db_executor.run(list_fn, **filters, after=after, limit=limit + 1)
+    if after is None:
+        rows, total = await asyncio.gather(page, db_executor.run(count_fn, **filters))
+    else:
+        rows, total = await page, None
+    return rows[:limit], len(rows) > limit, total
+
+
+def _decode_cursor_param(cursor: Optional[str], types) -> Optional[Tuple]:
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor, types)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
 @app.get("/filings")
-async def list_filings(company_id: int = None):
-    """List all shared filings metadata (no content)"""
-    loop = asyncio.get_event_loop()
-    filings = await loop.run_in_executor(None, db.list_shared_filings, company_id)
-    return {"filings": filings, "total": len(filings)}
+async def list_filings(
+    request: Request,
+    company_id: int = None,
+    category: str = None,
+    year_from: int = None,
+    year_to: int = None,
+    source: str = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+):
+    """List shared filings metadata (no content), newest first.
+    Pass the returned next_cursor to get the following page; total is only
+    computed for the first page.
+    """
+    after = _decode_cursor_param(cursor, (int, str, int))
+    filters = dict(company_id=company_id, category=category,
+                   year_from=year_from, year_to=year_to, source=source)
+
+    async def fetch():
+        filings, more, total = await _keyset_page(
+            db.list_shared_filings, db.count_shared_filings, filters, after, limit
+        )
+        last = filings[-1] if filings else None
+        result = {
+            "filings": filings,
+            "next_cursor": encode_cursor(last['year'], last['quarter'], last['id']) if more else None,
+        }
+        if total is not None:
+            result["total"] = total
+        return result
+
+    key = (tuple(filters.values()), after, limit)
+    return json_response(request, await _cached('filings', key, settings.cache_ttl_listings, fetch))
+
+
+class FilingKey(BaseModel):
+    company_id: Optional[int] = None
+    ticker: Optional[str] = None
+    year: int
+    quarter: str
+
+    @model_validator(mode='after')
+    def _company_given(self):
+        if self.company_id is None and not self.ticker:
+            raise ValueError("company_id or ticker is required")
+        return self
+
+
+class FilingLookup(BaseModel):
+    filings: List[FilingKey] = Field(..., max_length=MAX_LOOKUP_KEYS)
+
+
+@app.post("/filings/lookup")
+async def lookup_filings(lookup: FilingLookup, request: Request):
+    """Which (company, year, quarter) filings exist, in one query.
+    Results follow the request order; id/size/content type are null when the
+    filing (or company) is missing.
+    """
+    keys = [
+        (k.company_id, k.ticker.upper() if k.company_id is None else None, k.year, k.quarter.upper())
+        for k in lookup.filings
+    ]
+    rows = await db_executor.run(db.lookup_shared_filings, keys)
+    results = [
+        {**row, 'company_id': row['company_id'] or key.company_id,
+         'ticker': row['ticker'] or key.ticker, 'exists': row['id'] is not None}
+        for key, row in zip(lookup.filings, rows)
+    ]
+    return json_response(request, {
+        "results": results,
+        "found": sum(1 for r in results if r['exists']),
+    })
+
+
+def _coverage_matrix(rows: List[Dict]) -> Dict:
+    """Group coverage rows into one entry per company keyed by 'YEAR-QUARTER'"""
+    companies: Dict[int, Dict] = {}
+    periods: Set[Tuple[int, str]] = set()
+    for row in rows:
+        company = companies.setdefault(row['company_id'], {
+            'company_id': row['company_id'], 'ticker': row['ticker'], 'name': row['name'],
+            'category': row['category'], 'coverage': {},
+        })
+        if row['year'] is not None:
+            periods.add((row['year'], row['quarter']))
+            company['coverage'][f"{row['year']}-{row['quarter']}"] = {
+                'filing_id': row['filing_id'], 'source': row['source'], 'file_size': row['file_size'],
+            }
+    return {
+        "periods": [f"{year}-{quarter}" for year, quarter in sorted(periods, reverse=True)],
+        "companies": list(companies.values()),
+        "total_filings": sum(len(c['coverage']) for c in companies.values()),
+    }
+
+
+@app.get("/filings/coverage")
+async def filing_coverage(request: Request):
+    """Which periods are stored for each company (dashboard heatmap).
+    Served from memory for coverage_cache_ttl seconds, or until this worker
+    stores a new filing.
+    """
+    async def fetch():
+        return _coverage_matrix(await db_executor.run(db.get_filing_coverage))
+
+    payload = await _cached('filings', 'coverage', settings.coverage_cache_ttl, fetch)
+    return json_response(request, payload, headers={
+        "Cache-Control": f"public, max-age={int(settings.coverage_cache_ttl)}",
+    })
 
 
 @app.get("/filings/{filing_id}/download")
-async def download_filing(filing_id: int):
-    """Download a shared filing by ID"""
-    loop = asyncio.get_event_loop()
-    filing = await loop.run_in_executor(None, db.get_shared_filing_content, filing_id)
-    if not filing:
-        raise HTTPException(status_code=404, detail="Filing not found")
-
-    raw = filing.get('file_content')
-    if not raw:
-        raise HTTPException(status_code=404, detail="Filing content is empty")
-    content = bytes(raw) if not isinstance(raw, bytes) else raw
-    return Response(
-        content=content,
-        media_type=filing.get('content_type', 'application/octet-stream'),
-        headers={
-            "Content-Disposition": f"attachment; filename=\"{filing.get('filename', 'download')}\"",
-            "Content-Length": str(len(content)),
-        }
+async def download_filing(filing_id: int, request: Request):
+    """Download a shared filing by ID (streamed; supports Range and conditional GET)"""
+    return await _stream_blob(
+        request, 'shared_filings', filing_id, "Filing", f"public, {IMMUTABLE_CACHE_CONTROL}"
+    )
+
+
+async def _iter_blob(
+    table: str, row_id: int, meta: Dict, start: int, stop: int
+) -> AsyncIterator[memoryview]:
+    """Yield bytes [start, stop) of file_content in blob_stream_chunk_bytes pieces.
+    Only one chunk is in memory per request, and each chunk is its own short
+    query, so no connection is held while a slow client reads. Chunks are
+    read on a fixed grid through chunk_cache, so concurrent and repeated
+    downloads (and ranges) of the same blob share one database read.
+    """
+    size, version = meta['file_size'], meta.get('content_sha256')
+    chunk_bytes = settings.blob_stream_chunk_bytes
+    offset = start
+    while offset < stop:
+        base = offset - offset % chunk_bytes
+        length = min(chunk_bytes, size - base)
+        chunk = await chunk_cache.get(
+            (table, row_id, version, base, length),
+            lambda base=base, length=length: blob_executor.run(
+                db.read_blob_chunk, table, row_id, base, length
+            ),
+        )
+        piece = memoryview(chunk)[offset - base:stop - base] if chunk else None
+        if not piece:
+            logger.warning(f"{table} #{row_id} vanished while streaming at byte {offset}")
+            break
+        yield piece
+        offset += len(piece)
+
+
+async def _iter_byteranges(
+    table: str, row_id: int, meta: Dict, ranges: List[Tuple[int, int]],
+    parts: List[bytes], closing: bytes,
+) -> AsyncIterator[bytes]:
+    for (first, last), head in zip(ranges, parts):
+        yield head
+        async for chunk in _iter_blob(table, row_id, meta, first, last + 1):
+            yield chunk
+    yield closing
+
+
+async def _stream_blob(
+    request: Request, table: str, row_id: int, label: str, cache_control: str
+) -> Response:
+    meta = await db_executor.run(db.get_blob_meta, table, row_id)
+    if not meta:
+        raise HTTPException(status_code=404, detail=f"{label} not found")
+    size = meta.get('file_size') or 0
+    if not size:
+        raise HTTPException(status_code=404, detail=f"{label} content is empty")
+
+    etag = make_etag(meta.get('content_sha256'))
+    last_modified = meta.get('created_at')
+    headers = {"Accept-Ranges": "bytes"}
+    if etag:
+        # Content never changes for a given id; rows hashed before the
+        # content_sha256 backfill are served without validators
+        headers["ETag"] = etag
+        headers["Cache-Control"] = cache_control
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+    if is_not_modified(etag, last_modified,
+                       request.headers.get('if-none-match'),
+                       request.headers.get('if-modified-since')):
+        return Response(status_code=304, headers=headers)
+
+    content_type = meta.get('content_type') or 'application/octet-stream'
+    headers["Content-Disposition"] = f"attachment; filename=\"{meta.get('filename') or 'download'}\""
+    cache_key = (table, row_id, meta.get('content_sha256'))
+    if etag and disk_cache.enabled:
+        path = disk_cache.lookup(cache_key)
+        if path:
+            try:
+                st = await asyncio.to_thread(os.stat, path)
+            except FileNotFoundError:
+                disk_cache.discard(cache_key)
+            else:
+                # FileResponse handles Range/If-Range itself (starlette>=0.40) and keeps our validators
+                return FileResponse(path, media_type=content_type, headers=headers, stat_result=st)
+
+    ranges = None
+    if if_range_allows(request.headers.get('if-range'), etag):
+        try:
+            ranges = parse_range(request.headers.get('range'), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if not ranges:
+        headers["Content-Length"] = str(size)
+        body = _iter_blob(table, row_id, meta, 0, size)
+        if etag and disk_cache.enabled:
+            body = disk_cache.write_through(cache_key, size, body)
+        return StreamingResponse(body, media_type=content_type, headers=headers)
+
+    if len(ranges) == 1:
+        first, last = ranges[0]
+        headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+        headers["Content-Length"] = str(last - first + 1)
+        return StreamingResponse(
+            _iter_blob(table, row_id, meta, first, last + 1),
+            status_code=206, media_type=content_type, headers=headers,
+        )
+
+    # multipart/byteranges: part headers are tiny, so the exact length is known up front
+    boundary = secrets.token_hex(16)
+    parts = [
+        (f"\r\n--{boundary}\r\nContent-Type: {content_type}\r\n"
+         f"Content-Range: bytes {first}-{last}/{size}\r\n\r\n").encode()
+        for first, last in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode()
+    headers["Content-Length"] = str(
+        sum(len(p) for p in parts) + sum(last - first + 1 for first, last in ranges) + len(closing)
+    )
+    return StreamingResponse(
+        _iter_byteranges(table, row_id, meta, ranges, parts, closing),
+        status_code=206, media_type=f"multipart/byteranges; boundary={boundary}", headers=headers,
     )
 
 
@@ -170,11 +635,35 @@ async def download_filing(filing_id: int):
 # User Reports (用户研报上传 - 各人独立)
 # ================================================================
 @app.get("/reports")
-async def list_reports(company_id: int = None):
-    """List user-uploaded research reports"""
-    loop = asyncio.get_event_loop()
-    reports = await loop.run_in_executor(None, db.list_user_reports, company_id)
-    return {"reports": reports, "total": len(reports)}
+async def list_reports(
+    request: Request,
+    company_id: int = None,
+    category: str = None,
+    year_from: int = None,
+    year_to: int = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str = None,
+):
+    """List user-uploaded research reports, newest first (keyset-paginated)"""
+    after = _decode_cursor_param(cursor, (str, int))
+    filters = dict(company_id=company_id, category=category,
+                   year_from=year_from, year_to=year_to)
+
+    async def fetch():
+        reports, more, total = await _keyset_page(
+            db.list_user_reports, db.count_user_reports, filters, after, limit
+        )
+        last = reports[-1] if reports else None
+        result = {
+            "reports": reports,
+            "next_cursor": encode_cursor(last['created_at'], last['id']) if more else None,
+        }
+        if total is not None:
+            result["total"] = total
+        return result
+
+    key = (tuple(filters.values()), after, limit)
+    return json_response(request, await _cached('reports', key, settings.cache_ttl_listings, fetch))
 
 
 @app.post("/reports/upload")
@@ -187,58 +676,127 @@ async def upload_report(
     quarter: str = Form(default=None),
     description: str = Form(default=""),
 ):
-    """Upload a user research report"""
-    content = await file.read()
-    if len(content) > 50 * 1024 * 1024:  # 50MB limit
-        raise HTTPException(status_code=413, detail="File too large (max 50MB)")
-
-    loop = asyncio.get_event_loop()
-    report_id = await loop.run_in_executor(None, lambda: db.save_user_report(
-        title=title,
-        filename=file.filename or "report.pdf",
-        content_type=file.content_type or "application/octet-stream",
-        file_content=content,
-        uploader_name=uploader_name,
-        company_id=company_id if company_id else None,
-        year=year if year else None,
-        quarter=quarter if quarter else None,
-        description=description,
-    ))
+    """Upload a user research report.
+    The body was capped by UploadLimitMiddleware and spooled by the form
+    parser; the spooled file is hashed and copied into Postgres in chunks.
+    """
+    if file.size is not None and file.size > settings.max_upload_bytes:
+        # Within the middleware's multipart allowance but over the file limit
+        raise HTTPException(status_code=413, detail=too_large_detail(settings.max_upload_bytes))
+    source = IngestReader(file.file, settings.max_upload_bytes, file.content_type)
+    try:
+        report_id = await blob_executor.run(
+            db.save_user_report_stream,
+            source,
+            title=title,
+            filename=file.filename or "report.pdf",
+            uploader_name=uploader_name,
+            company_id=company_id if company_id else None,
+            year=year if year else None,
+            quarter=quarter if quarter else None,
+            description=description,
+            chunk_bytes=settings.upload_chunk_bytes,
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    finally:
+        await file.close()
     return {"id": report_id, "message": "Report uploaded successfully"}
 
 
 @app.get("/reports/{report_id}/download")
-async def download_report(report_id: int):
-    """Download a user research report"""
-    loop = asyncio.get_event_loop()
-    report = await loop.run_in_executor(None, db.get_user_report, report_id)
-    if not report:
-        raise HTTPException(status_code=404, detail="Report not found")
-
-    raw = report.get('file_content')
-    if not raw:
-        raise HTTPException(status_code=404, detail="Report content is empty")
-    content = bytes(raw) if not isinstance(raw, bytes) else raw
-    return Response(
-        content=content,
-        media_type=report.get('content_type', 'application/octet-stream'),
-        headers={
-            "Content-Disposition": f"attachment; filename=\"{report.get('filename', 'download')}\"",
-            "Content-Length": str(len(content)),
-        }
+async def download_report(report_id: int, request: Request):
+    """Download a user research report (streamed; supports Range and conditional GET)"""
+    return await _stream_blob(
+        request, 'user_reports', report_id, "Report", f"private, {IMMUTABLE_CACHE_CONTROL}"
     )
 
 
 @app.delete("/reports/{report_id}")
 async def delete_report(report_id: int):
     """Delete a user research report"""
-    loop = asyncio.get_event_loop()
-    ok = await loop.run_in_executor(None, db.delete_user_report, report_id)
+    ok = await db_executor.run(db.delete_user_report, report_id)
+    chunk_cache.invalidate('user_reports', report_id)
+    disk_cache.invalidate('user_reports', report_id)
     if not ok:
         raise HTTPException(status_code=404, detail="Report not found")
     return {"message": "Report deleted"}
 
 
+# ================================================================
+# Bulk export (newline-delimited JSON, streamed batch by batch)
+# ================================================================
+def _next_ndjson_batch(rows: Iterator[List[Dict]]) -> Optional[bytes]:
+    """Fetch the next cursor batch and encode it, both on the export thread"""
+    batch = next(rows, None)
+    if batch is None:
+        return None
+    return dumps_ndjson(batch)
+
+
+async def _stream_export(kind: str, **filters) -> StreamingResponse:
+    rows = db.export_rows(kind, settings.export_batch_rows, **filters)
+    # First batch before responding, so a busy pool is still a 503
+    first = await export_executor.run(_next_ndjson_batch, rows)
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            chunk = first
+            while chunk:
+                yield chunk
+                chunk = await export_executor.run(_next_ndjson_batch, rows)
+        finally:
+            # Releases the export connection (also done if the generator is collected)
+            await export_executor.run(rows.close)
+
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{kind}.ndjson"'},
+    )
+
+
+@app.get("/export/filings")
+async def export_filings(
+    company_id: int = None,
+    category: str = None,
+    year_from: int = None,
+    year_to: int = None,
+    source: str = None,
+):
+    """All matching filings metadata as NDJSON, one object per line, in id order"""
+    return await _stream_export(
+        'filings', company_id=company_id, category=category,
+        year_from=year_from, year_to=year_to, source=source,
+    )
+
+
+@app.get("/export/reports")
+async def export_reports(
+    company_id: int = None,
+    category: str = None,
+    year_from: int = None,
+    year_to: int = None,
+):
+    """All matching user reports metadata as NDJSON"""
+    return await _stream_export(
+        'reports', company_id=company_id, category=category,
+        year_from=year_from, year_to=year_to,
+    )
+
+
+@app.get("/export/jobs")
+async def export_jobs(status: str = None):
+    """All download jobs as NDJSON"""
+    return await _stream_export('jobs', status=status)
+
+
+@app.get("/export/logs")
+async def export_logs(job_id: int = None, status: str = None):
+    """All download logs (optionally one job's) as NDJSON"""
+    return await _stream_export('logs', job_id=job_id, status=status)
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
@@ -0,0 +1,50 @@
+"""
+Lightweight in-process metrics for the worker (no external dependency).
+Exposed as JSON through GET /metrics.
+"""
+
+import bisect
+import threading
+from typing import Dict, Sequence
+
+# Millisecond buckets suitable for queue waits and query latencies
+DEFAULT_MS_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Thread-safe cumulative histogram with fixed upper bounds"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_MS_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counts = list(self._counts)
+            total, peak = self._sum, self._max
+        n = sum(counts)
+        cumulative, running = {}, 0
+        for bound, c in zip(list(self.buckets) + ['+Inf'], counts):
+            running += c
+            cumulative[f"le_{bound}"] = running
+        return {
+            'count': n,
+            'sum': round(total, 3),
+            'avg': round(total / n, 3) if n else 0.0,
+            'max': round(peak, 3),
+            'buckets': cumulative,
+        }
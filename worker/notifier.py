@@ -0,0 +1,94 @@
+"""
+LISTEN/NOTIFY wake-up for the job polling loop.
+The download_jobs trigger NOTIFYs on insert (or re-queue), so idle workers
+block on the listener socket instead of polling Postgres every few seconds.
+Slow polling remains as a safety net if the listener connection drops.
+Reconnects run in a thread, with exponential backoff, so a database outage
+never blocks the event loop.
+"""
+
+import time
+import asyncio
+import logging
+from typing import Optional
+
+from database import Database, JOB_CHANNEL
+
+logger = logging.getLogger('finsight-worker.notifier')
+
+
+class JobNotifier:
+    """Wakes waiters when a NOTIFY arrives on the job channel"""
+
+    def __init__(self, db: Database, channel: str = JOB_CHANNEL, max_backoff: float = 60.0):
+        self.db = db
+        self.channel = channel
+        self.max_backoff = max_backoff
+        self._conn = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event = asyncio.Event()
+        self._backoff = 0.0
+        self._retry_at = 0.0
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None
+
+    async def start(self):
+        """Open the listener connection (in a thread) and register it with
+        the event loop. Failures are logged, not raised: the poller falls
+        back to timeouts and the next attempt waits out a growing backoff.
+        """
+        self._loop = asyncio.get_running_loop()
+        try:
+            self._conn = await asyncio.to_thread(self.db.open_listener, self.channel)
+            self._loop.add_reader(self._conn.fileno(), self._on_readable)
+            self._backoff = 0.0
+            logger.info(f"Listening for jobs on channel '{self.channel}'")
+        except Exception as e:
+            self._close()
+            self._backoff = min(max(self._backoff * 2, 1.0), self.max_backoff)
+            self._retry_at = time.monotonic() + self._backoff
+            logger.warning(f"Job listener unavailable, polling; retrying in {self._backoff:.0f}s: {e}")
+
+    def stop(self):
+        self._close()
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                if self._loop is not None:
+                    self._loop.remove_reader(self._conn.fileno())
+            except Exception:
+                pass
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except Exception as e:
+            logger.warning(f"Job listener connection lost: {e}")
+            self._close()
+            self._event.set()  # let the poller re-check (and reconnect) right away
+            return
+        if self._conn.notifies:
+            self._conn.notifies.clear()
+            self._event.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Block until a job notification arrives or the timeout elapses.
+        Returns True if woken by a notification.
+        """
+        if self._conn is None and time.monotonic() >= self._retry_at:
+            await self.start()
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._event.clear()
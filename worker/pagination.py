@@ -0,0 +1,29 @@
+"""
+Opaque cursors for keyset pagination.
+A cursor is the sort key of the last row on a page, JSON-encoded and
+base64url'd; the next page starts strictly after it.
+"""
+
+import json
+import base64
+from typing import Any, Sequence, Tuple
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps(values, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: str, types: Sequence[type]) -> Tuple:
+    """Decode a cursor whose values must match `types`; raises ValueError"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}") from None
+    if (not isinstance(values, list) or len(values) != len(types)
+            or not all(isinstance(v, t) and not isinstance(v, bool) for v, t in zip(values, types))):
+        raise ValueError("Invalid cursor")
+    return tuple(values)
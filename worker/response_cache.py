@@ -0,0 +1,86 @@
+"""
+In-process response cache for read-heavy endpoints.
+Entries live in named namespaces ('jobs', 'filings', ...) with per-entry TTLs
+and a global LRU bound. Database writes invalidate whole namespaces; each
+namespace carries a generation number so a result computed before an
+invalidation is never stored after it.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class ResponseCache:
+    """TTL + LRU cache of endpoint payloads, safe to invalidate from DB threads"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[str, Hashable], Tuple[float, Any]]' = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, namespace: str, key: Hashable) -> Optional[Any]:
+        """Cached value, or None if absent or expired"""
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end((namespace, key))
+                self._hits[namespace] = self._hits.get(namespace, 0) + 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[(namespace, key)]
+            self._misses[namespace] = self._misses.get(namespace, 0) + 1
+            return None
+
+    def generation(self, namespace: str) -> int:
+        """Read before computing a value; pass to put() with it"""
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def put(self, namespace: str, key: Hashable, value: Any, ttl: float, generation: int):
+        """Store `value` unless `namespace` was invalidated since `generation`"""
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            if self._generations.get(namespace, 0) != generation:
+                return
+            self._entries[(namespace, key)] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end((namespace, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, *namespaces: str):
+        with self._lock:
+            for namespace in namespaces:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            stale = [k for k in self._entries if k[0] in namespaces]
+            for k in stale:
+                del self._entries[k]
+            self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            namespaces = sorted(set(self._hits) | set(self._misses))
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'hits': sum(self._hits.values()),
+                'misses': sum(self._misses.values()),
+                'by_namespace': {
+                    ns: {'hits': self._hits.get(ns, 0), 'misses': self._misses.get(ns, 0)}
+                    for ns in namespaces
+                },
+            }
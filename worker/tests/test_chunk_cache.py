@@ -0,0 +1,109 @@
+"""
+Unit tests for worker/chunk_cache.py
+Tests single-flight coalescing, byte-bounded LRU eviction and invalidation.
+"""
+
+import unittest
+import asyncio
+from unittest.mock import AsyncMock
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from chunk_cache import ChunkCache
+
+
+def run_async(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def _key(row_id, offset=0, length=4):
+    return ('shared_filings', row_id, 'sha', offset, length)
+
+
+class TestChunkCache(unittest.TestCase):
+    """Test ChunkCache"""
+
+    def test_concurrent_gets_share_one_fetch(self):
+        """Test simultaneous requests for a chunk trigger a single read"""
+        cache = ChunkCache(max_bytes=100)
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return memoryview(b'data')
+
+        async def test():
+            return await asyncio.gather(*(cache.get(_key(1), fetch) for _ in range(5)))
+
+        results = run_async(test())
+        self.assertEqual([bytes(r) for r in results], [b'data'] * 5)
+        self.assertEqual(len(calls), 1)
+        stats = cache.stats()
+        self.assertEqual((stats['misses'], stats['coalesced']), (1, 4))
+
+        # Repeat burst is served from memory
+        again = run_async(cache.get(_key(1), AsyncMock()))
+        self.assertEqual(bytes(again), b'data')
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        """Test a disconnecting first client leaves the shared read running"""
+        cache = ChunkCache(max_bytes=100)
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return memoryview(b'data')
+
+        async def test():
+            leader = asyncio.ensure_future(cache.get(_key(1), fetch))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(cache.get(_key(1), fetch))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await follower
+
+        self.assertEqual(bytes(run_async(test())), b'data')
+
+    def test_lru_bounded_in_bytes(self):
+        """Test the least recently used chunks are evicted past max_bytes"""
+        cache = ChunkCache(max_bytes=8)
+
+        async def test():
+            for row_id in (1, 2, 3):
+                await cache.get(_key(row_id), AsyncMock(return_value=memoryview(b'abcd')))
+
+        run_async(test())
+        stats = cache.stats()
+        self.assertEqual((stats['chunks'], stats['bytes'], stats['evictions']), (2, 8, 1))
+
+    def test_failed_read_is_not_cached(self):
+        """Test errors propagate and the next request retries"""
+        cache = ChunkCache(max_bytes=100)
+        with self.assertRaises(RuntimeError):
+            run_async(cache.get(_key(1), AsyncMock(side_effect=RuntimeError('db down'))))
+        self.assertEqual(cache.stats()['chunks'], 0)
+        self.assertEqual(cache.stats()['in_flight'], 0)
+
+    def test_invalidate_row(self):
+        """Test invalidation drops only the given row's chunks"""
+        cache = ChunkCache(max_bytes=100)
+
+        async def test():
+            await cache.get(_key(1), AsyncMock(return_value=memoryview(b'abcd')))
+            await cache.get(_key(2), AsyncMock(return_value=memoryview(b'efgh')))
+
+        run_async(test())
+        cache.invalidate('shared_filings', 1)
+        self.assertEqual(cache.stats()['chunks'], 1)
+        self.assertEqual(cache.stats()['bytes'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+Unit tests for worker/db_executor.py
+Tests bounded concurrency, queue timeouts and metrics.
+"""
+
+import unittest
+import asyncio
+import threading
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from db_executor import DBExecutor, DBBusyError
+from metrics import Histogram
+
+
+def run_async(coro):
+    """Helper to run async functions in tests"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class TestDBExecutor(unittest.TestCase):
+    """Test DBExecutor admission and metrics"""
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_runs_call_on_db_thread(self):
+        """Test args/kwargs are passed and the call runs off the loop thread"""
+        self.executor = DBExecutor(2)
+
+        def call(a, b=0):
+            return a + b, threading.current_thread().name
+
+        result, thread_name = run_async(self.executor.run(call, 1, b=2))
+        self.assertEqual(result, 3)
+        self.assertTrue(thread_name.startswith('db'))
+        stats = self.executor.stats()
+        self.assertEqual(stats['queue_wait_ms']['count'], 1)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_concurrency_bounded_by_pool_size(self):
+        """Test no more than max_workers calls hold a connection at once"""
+        self.executor = DBExecutor(2)
+        lock = threading.Lock()
+        state = {'current': 0, 'peak': 0}
+
+        def call():
+            with lock:
+                state['current'] += 1
+                state['peak'] = max(state['peak'], state['current'])
+            time.sleep(0.02)
+            with lock:
+                state['current'] -= 1
+
+        async def test():
+            await asyncio.gather(*[self.executor.run(call) for _ in range(6)])
+
+        run_async(test())
+        self.assertEqual(state['peak'], 2)
+        self.assertEqual(self.executor.stats()['run_ms']['count'], 6)
+
+    def test_queue_timeout_raises_busy(self):
+        """Test callers give up with DBBusyError when every slot stays busy"""
+        self.executor = DBExecutor(1, queue_timeout=0.05)
+
+        async def test():
+            slow = asyncio.ensure_future(self.executor.run(time.sleep, 0.3))
+            await asyncio.sleep(0.01)
+            with self.assertRaises(DBBusyError):
+                await self.executor.run(lambda: None)
+            await slow
+
+        run_async(test())
+        stats = self.executor.stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['queued'], 0)
+
+    def test_errors_propagate_and_release_slot(self):
+        """Test a failing call re-raises and frees its slot"""
+        self.executor = DBExecutor(1, queue_timeout=0.5)
+
+        def boom():
+            raise RuntimeError("db down")
+
+        async def test():
+            with self.assertRaises(RuntimeError):
+                await self.executor.run(boom)
+            return await self.executor.run(lambda: 'ok')
+
+        self.assertEqual(run_async(test()), 'ok')
+        self.assertEqual(self.executor.stats()['errors'], 1)
+
+    def test_cancelled_caller_keeps_slot_until_thread_finishes(self):
+        """Test cancelling the awaiting coroutine does not admit extra calls"""
+        import threading
+        self.executor = DBExecutor(1, queue_timeout=0.1)
+        release = threading.Event()
+
+        async def test():
+            first = asyncio.ensure_future(self.executor.run(release.wait, 2))
+            await asyncio.sleep(0.02)
+            first.cancel()
+            await asyncio.sleep(0)
+            self.assertEqual(self.executor.stats()['in_flight'], 1)
+            with self.assertRaises(DBBusyError):
+                await self.executor.run(lambda: 'too early')
+            release.set()
+            return await self.executor.run(lambda: 'ok')
+
+        self.assertEqual(run_async(test()), 'ok')
+        self.assertEqual(self.executor.stats()['in_flight'], 0)
+
+
+class TestHistogram(unittest.TestCase):
+    """Test cumulative histogram snapshot"""
+
+    def test_snapshot_buckets(self):
+        """Test values land in cumulative buckets including +Inf"""
+        hist = Histogram(buckets=(1, 10))
+        for value in (0.5, 5, 50):
+            hist.observe(value)
+        snap = hist.snapshot()
+        self.assertEqual(snap['count'], 3)
+        self.assertEqual(snap['buckets'], {'le_1': 1, 'le_10': 2, 'le_+Inf': 3})
+        self.assertEqual(snap['max'], 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Unit tests for worker/disk_cache.py
+Tests write-through filling, LRU eviction by bytes, invalidation and reload.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import asyncio
+import sys
+from unittest.mock import mock_open, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from disk_cache import DiskBlobCache
+
+
+def run_async(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+async def _body(*chunks):
+    for chunk in chunks:
+        yield memoryview(chunk)
+
+
+async def _drain(stream):
+    return b''.join([bytes(chunk) async for chunk in stream])
+
+
+class TestDiskBlobCache(unittest.TestCase):
+    """Test DiskBlobCache"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_write_through_then_hit(self):
+        """Test a complete stream is saved and later found"""
+        cache = DiskBlobCache(self.dir, 100)
+        key = ('shared_filings', 7, 'ab12')
+        self.assertIsNone(cache.lookup(key))
+        data = run_async(_drain(cache.write_through(key, 6, _body(b'abc', b'def'))))
+        self.assertEqual(data, b'abcdef')
+        path = cache.lookup(key)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'abcdef')
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+
+    def test_incomplete_stream_is_not_cached(self):
+        """Test a short or abandoned stream leaves no file behind"""
+        cache = DiskBlobCache(self.dir, 100)
+        key = ('shared_filings', 7, 'ab12')
+        run_async(_drain(cache.write_through(key, 10, _body(b'abc'))))
+        self.assertIsNone(cache.lookup(key))
+
+        async def abandon():
+            stream = cache.write_through(key, 6, _body(b'abc', b'def'))
+            await stream.__anext__()
+            await stream.aclose()
+
+        run_async(abandon())
+        self.assertIsNone(cache.lookup(key))
+        self.assertEqual(os.listdir(os.path.join(self.dir, 'shared_filings')), [])
+
+    def test_write_error_keeps_streaming(self):
+        """Test a failing cache write (disk full) neither breaks the download nor leaves a file"""
+        cache = DiskBlobCache(self.dir, 100)
+        key = ('shared_filings', 7, 'ab12')
+        with patch('builtins.open', mock_open()) as opened:
+            opened.return_value.write.side_effect = OSError(28, 'No space left on device')
+            data = run_async(_drain(cache.write_through(key, 6, _body(b'abc', b'def'))))
+        self.assertEqual(data, b'abcdef')
+        opened.return_value.write.assert_called_once()
+        self.assertIsNone(cache.lookup(key))
+        self.assertEqual(cache.stats()['files'], 0)
+
+    def test_lru_eviction_by_bytes(self):
+        """Test least recently served files are deleted past max_bytes"""
+        cache = DiskBlobCache(self.dir, 10)
+        keys = [('shared_filings', i, 'h') for i in (1, 2, 3)]
+        for key in keys[:2]:
+            run_async(_drain(cache.write_through(key, 4, _body(b'abcd'))))
+        cache.lookup(keys[0])  # 1 is now most recently used
+        run_async(_drain(cache.write_through(keys[2], 4, _body(b'abcd'))))
+        self.assertIsNone(cache.lookup(keys[1]))
+        self.assertFalse(os.path.exists(cache.path(keys[1])))
+        self.assertIsNotNone(cache.lookup(keys[0]))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_oversized_blob_passes_through(self):
+        """Test blobs larger than the cache are streamed but not stored"""
+        cache = DiskBlobCache(self.dir, 4)
+        key = ('shared_filings', 1, 'h')
+        self.assertEqual(run_async(_drain(cache.write_through(key, 6, _body(b'abcdef')))), b'abcdef')
+        self.assertEqual(cache.stats()['files'], 0)
+
+    def test_invalidate_deletes_file(self):
+        """Test invalidation removes every version of a row"""
+        cache = DiskBlobCache(self.dir, 100)
+        key = ('user_reports', 5, 'h')
+        run_async(_drain(cache.write_through(key, 3, _body(b'pdf'))))
+        cache.invalidate('user_reports', 5)
+        self.assertFalse(os.path.exists(cache.path(key)))
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+    def test_load_adopts_previous_files(self):
+        """Test a restarted worker reuses cached files and drops partial writes"""
+        cache = DiskBlobCache(self.dir, 100)
+        key = ('shared_filings', 9, 'h')
+        run_async(_drain(cache.write_through(key, 3, _body(b'abc'))))
+        open(cache.path(key) + '.123.tmp', 'wb').close()
+        restarted = DiskBlobCache(self.dir, 100)
+        restarted.load()
+        self.assertEqual(restarted.lookup(key), cache.path(key))
+        self.assertEqual(restarted.stats()['bytes'], 3)
+        self.assertEqual(os.listdir(os.path.join(self.dir, 'shared_filings')), ['9-h'])
+
+
+if __name__ == '__main__':
+    unittest.main()
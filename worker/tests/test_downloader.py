@@ -12,7 +12,7 @@ import json
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
-from downloader import EarningsDownloader, DownloadTask
+from downloader import EarningsDownloader, DownloadTask, iter_download_plan
 
 
 def run_async(coro):
@@ -275,6 +275,9 @@ class TestProcessJob(unittest.TestCase):
 
     def setUp(self):
         self.db = MagicMock()
+        # Empty durable task queue
+        self.db.claim_download_tasks.return_value = []
+        self.db.count_open_download_tasks.return_value = 0
         self.downloader = EarningsDownloader(self.db)
 
     def test_job_not_found(self):
@@ -283,12 +286,31 @@ class TestProcessJob(unittest.TestCase):
 
         async def test():
             await self.downloader.process_job(999)
-            self.db.update_job_status.assert_called()
+            self.db.enqueue_download_tasks.assert_not_called()
 
         run_async(test())
 
-    def test_job_marks_running(self):
-        """Test job is marked as running when processing starts"""
+    def test_job_total_files_set_without_rewriting_status(self):
+        """Test the claimed job gets its file count but its status is left to the claim"""
+        self.db.get_job.return_value = {
+            'id': 1,
+            'years': [2024],
+            'quarters': ['Q1', 'Q2'],
+            'company_ids': None,
+            'category_filter': None,
+        }
+        self.db.get_all_companies.return_value = [{'id': 5}]
+
+        async def test():
+            await self.downloader.process_job(1)
+            self.db.set_job_total_files.assert_called_once_with(1, 2)
+            statuses = [c[0][1] for c in self.db.update_job_status.call_args_list]
+            self.assertNotIn('running', statuses)
+
+        run_async(test())
+
+    def test_job_cancelled_before_start_is_not_enqueued(self):
+        """Test a job cancelled after its claim is not resurrected or downloaded"""
         self.db.get_job.return_value = {
             'id': 1,
             'years': [2024],
@@ -296,13 +318,13 @@ class TestProcessJob(unittest.TestCase):
             'company_ids': None,
             'category_filter': None,
         }
-        self.db.get_all_companies.return_value = []
+        self.db.get_all_companies.return_value = [{'id': 5}]
+        self.db.set_job_total_files.return_value = False
 
         async def test():
             await self.downloader.process_job(1)
-            # First call should set status to 'running'
-            first_call = self.db.update_job_status.call_args_list[0]
-            self.assertEqual(first_call[0][1], 'running')
+            self.db.enqueue_download_tasks.assert_not_called()
+            self.db.update_job_status.assert_not_called()
 
         run_async(test())
 
@@ -370,6 +392,207 @@ class TestProcessJob(unittest.TestCase):
         run_async(test())
 
 
+    def test_job_enqueues_durable_tasks(self):
+        """Test every company x year x quarter is enqueued as a task row"""
+        self.db.get_job.side_effect = [
+            {
+                'id': 1,
+                'years': [2023, 2024],
+                'quarters': ['Q1'],
+                'company_ids': [1, 2],
+                'category_filter': None,
+            },
+            {'id': 1, 'status': 'running'},
+        ]
+        self.db.get_companies.return_value = [{'id': 1}, {'id': 2}]
+
+        async def test():
+            await self.downloader.process_job(1)
+
+        run_async(test())
+        job_id, items = self.db.enqueue_download_tasks.call_args[0]
+        self.assertEqual(job_id, 1)
+        self.assertEqual(
+            sorted(items),
+            [(1, 2023, 'Q1'), (1, 2024, 'Q1'), (2, 2023, 'Q1'), (2, 2024, 'Q1')],
+        )
+        self.db.claim_download_tasks.assert_called()
+        self.assertEqual(self.db.claim_download_tasks.call_args[1]['job_id'], 1)
+
+
+class TestTaskQueue(unittest.TestCase):
+    """Test leasing and completing durable download tasks"""
+
+    def setUp(self):
+        self.db = MagicMock()
+        self.downloader = EarningsDownloader(self.db)
+        self.row = {
+            'id': 5, 'job_id': 1, 'company_id': 3, 'year': 2024, 'quarter': 'Q2',
+            'log_id': None, 'name': 'Microsoft', 'ticker': 'MSFT',
+            'sec_cik': '0000789019', 'ir_url': None, 'category': 'AI_Applications',
+        }
+
+    def test_task_from_row(self):
+        """Test a claimed row becomes a DownloadTask with company details"""
+        task = DownloadTask.from_row(self.row)
+        self.assertEqual(task.task_id, 5)
+        self.assertEqual(task.company['id'], 3)
+        self.assertEqual(task.company['ticker'], 'MSFT')
+        self.assertEqual(task.company['ir_url'], '')
+        self.assertIsNone(task.log_id)
+
+    def test_consumer_completes_tasks_until_queue_empty(self):
+        """Test the consumer runs each leased task and records its outcome"""
+        self.db.claim_download_tasks.side_effect = [[self.row], [dict(self.row, id=6)], []]
+
+        async def test():
+            with patch.object(self.downloader, '_download_filing_with_retry',
+                              AsyncMock(side_effect=[True, False])):
+                return await self.downloader._task_consumer(AsyncMock(), 1)
+
+        self.assertEqual(run_async(test()), 2)
+        calls = [c[0] for c in self.db.complete_download_task.call_args_list]
+        self.assertEqual(calls, [(5, 'done'), (6, 'failed')])
+        self.assertEqual(self.downloader.leased_task_ids, set())
+
+    def test_consumer_leaves_lease_on_crash(self):
+        """Test an unexpected error does not complete the task (lease expires instead)"""
+        self.db.claim_download_tasks.side_effect = [[self.row], []]
+
+        async def test():
+            with patch.object(self.downloader, '_download_filing_with_retry',
+                              AsyncMock(side_effect=RuntimeError('db gone'))):
+                await self.downloader._task_consumer(AsyncMock(), None)
+
+        run_async(test())
+        self.db.complete_download_task.assert_not_called()
+
+    @patch('downloader.CLAIM_RETRY_DELAY', 0)
+    def test_consumer_retries_transient_claim_errors(self):
+        """Test a busy executor while leasing backs off instead of failing the job"""
+        from db_executor import DBBusyError
+        self.db.claim_download_tasks.side_effect = [DBBusyError('busy'), [self.row], []]
+
+        async def test():
+            with patch.object(self.downloader, '_download_filing_with_retry', AsyncMock(return_value=True)):
+                return await self.downloader._task_consumer(AsyncMock(), 1)
+
+        self.assertEqual(run_async(test()), 1)
+        self.assertEqual(self.db.claim_download_tasks.call_count, 3)
+
+    def test_drain_cancels_siblings_when_a_consumer_fails(self):
+        """Test no consumer outlives a failed drain"""
+        started = []
+
+        async def consumer(client, job_id):
+            started.append(1)
+            if len(started) == 1:
+                raise RuntimeError('db down')
+            await asyncio.sleep(10)
+
+        async def test():
+            with patch.object(self.downloader, '_task_consumer', consumer):
+                with self.assertRaises(RuntimeError):
+                    await self.downloader._drain_tasks(AsyncMock(), 1)
+            pending = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            self.assertEqual(pending, [])
+
+        run_async(test())
+
+    def test_cancel_tasks_aborts_inflight_download(self):
+        """Test cancelling a job's tasks aborts the download without completing it"""
+        self.db.claim_download_tasks.side_effect = [[self.row], []]
+
+        async def slow_download(client, task):
+            await asyncio.sleep(10)
+            return True
+
+        async def test():
+            with patch.object(self.downloader, '_download_filing_with_retry', slow_download):
+                consumer = asyncio.ensure_future(self.downloader._task_consumer(AsyncMock(), None))
+                await asyncio.sleep(0.01)
+                self.assertEqual(self.downloader.leased_task_ids, {5})
+                self.assertEqual(self.downloader.cancel_tasks(job_id=1), 1)
+                return await asyncio.wait_for(consumer, 1)
+
+        self.assertEqual(run_async(test()), 0)
+        self.db.complete_download_task.assert_not_called()
+        self.assertEqual(self.downloader.leased_task_ids, set())
+
+    def test_consumer_skips_completion_already_batched(self):
+        """Test a task closed by the batched filing write is not completed again"""
+        self.db.claim_download_tasks.side_effect = [[self.row], []]
+
+        async def download(client, task):
+            task.completed = True
+            return True
+
+        async def test():
+            with patch.object(self.downloader, '_download_filing_with_retry', download):
+                return await self.downloader._task_consumer(AsyncMock(), 1)
+
+        self.assertEqual(run_async(test()), 1)
+        self.db.complete_download_task.assert_not_called()
+
+    def test_successful_download_writes_in_one_batch(self):
+        """Test a downloaded filing is persisted with one batched DB call"""
+        self.db.get_shared_filing.return_value = None
+        self.db.create_download_log.return_value = 88
+        task = DownloadTask.from_row(dict(self.row, sec_cik=''))
+        task.company['ir_url'] = 'https://ir.example.com'
+        response = MagicMock()
+        response.content = b'%PDF-1.4' + b'x' * 2000
+        response.headers = {'content-type': 'application/pdf'}
+
+        async def test():
+            with patch.object(self.downloader, '_search_ir_page',
+                              AsyncMock(return_value='https://ir.example.com/q2.pdf')), \
+                    patch.object(self.downloader, '_rate_limited_request',
+                                 AsyncMock(return_value=response)):
+                return await self.downloader._download_filing_with_retry(AsyncMock(), task)
+
+        self.assertTrue(run_async(test()))
+        kwargs = self.db.record_downloaded_filing.call_args.kwargs
+        self.assertEqual((kwargs['log_id'], kwargs['task_id']), (88, 5))
+        self.db.finish_download_task.assert_not_called()
+        self.assertTrue(task.completed)
+        self.assertEqual(self.downloader.task_write_ms.count, 1)
+
+    def test_retry_reuses_existing_log(self):
+        """Test a re-leased task keeps writing to its original download log"""
+        self.db.get_shared_filing.return_value = {
+            'id': 99, 'filename': 'f.htm', 'file_size': 1, 'file_url': ''
+        }
+        task = DownloadTask.from_row(dict(self.row, log_id=77))
+
+        async def test():
+            return await self.downloader._download_filing_with_retry(AsyncMock(), task)
+
+        self.assertTrue(run_async(test()))
+        self.db.create_download_log.assert_not_called()
+        self.assertEqual(self.db.finish_download_task.call_args[0][1], 77)
+
+    def test_new_log_attached_to_task(self):
+        """Test the first attempt records its download log on the task row"""
+        self.db.get_shared_filing.return_value = {
+            'id': 99, 'filename': 'f.htm', 'file_size': 1, 'file_url': ''
+        }
+        self.db.create_download_log.return_value = 88
+        task = DownloadTask.from_row(self.row)
+
+        async def test():
+            await self.downloader._download_filing_with_retry(AsyncMock(), task)
+
+        run_async(test())
+        self.db.create_download_log.assert_called_once_with(1, 3, 2024, 'Q2', task_id=5)
+        # Already stored: log, counter and task close are a single write
+        self.db.finish_download_task.assert_called_once_with(
+            1, 88, 5, True, filename='f.htm', file_url='', file_size=1, download_duration_ms=0,
+        )
+        self.db.update_download_log.assert_not_called()
+        self.assertTrue(task.completed)
+
+
 class TestDownloadTask(unittest.TestCase):
     """Test DownloadTask dataclass"""
 
@@ -386,6 +609,28 @@ class TestDownloadTask(unittest.TestCase):
         self.assertEqual(task.quarter, 'Q1')
         self.assertEqual(task.company['ticker'], 'MSFT')
 
+    def test_task_is_slotted(self):
+        """Test tasks carry no per-instance __dict__"""
+        task = DownloadTask(job_id=1, company={'id': 1}, year=2024, quarter='Q1')
+        self.assertFalse(hasattr(task, '__dict__'))
+        self.assertEqual(task.company_id, 1)
+
+    def test_tasks_share_company_dict(self):
+        """Test tasks of the same company reference one cached dict"""
+        companies = {}
+        row = {'id': 1, 'job_id': 1, 'company_id': 3, 'year': 2024, 'quarter': 'Q1',
+               'ticker': 'MSFT', 'sec_cik': '', 'ir_url': ''}
+        a = DownloadTask.from_row(row, companies)
+        b = DownloadTask.from_row(dict(row, id=2, quarter='Q2'), companies)
+        self.assertIs(a.company, b.company)
+        self.assertEqual(list(companies), [3])
+
+    def test_download_plan_is_lazy(self):
+        """Test the plan is a generator covering companies x years x quarters"""
+        plan = iter_download_plan([1, 2], [2023, 2024], ['Q1', 'Q2'])
+        self.assertEqual(next(plan), (1, 2023, 'Q1'))
+        self.assertEqual(len(list(plan)), 7)
+
 
 class TestRetryLogic(unittest.TestCase):
     """Test retry and error handling logic"""
@@ -413,8 +658,8 @@ class TestRetryLogic(unittest.TestCase):
 
             await self.downloader._download_filing_with_retry(mock_client, task)
 
-            self.db.update_download_log.assert_called()
-            self.db.increment_job_counter.assert_called_with(1, 'failed_files')
+            self.db.finish_download_task.assert_called_once()
+            self.assertEqual(self.db.finish_download_task.call_args[0], (1, 1, None, False))
 
         run_async(test())
 
@@ -433,11 +678,9 @@ class TestRetryLogic(unittest.TestCase):
             self.downloader._last_request_time = 0
             await self.downloader._download_filing_with_retry(mock_client, task)
 
-            failed_calls = [
-                c for c in self.db.update_download_log.call_args_list
-                if any(v == 'failed' for v in c[1].values() if isinstance(v, str))
-            ]
-            self.assertEqual(len(failed_calls), 1)
+            self.db.finish_download_task.assert_called_once()
+            self.assertEqual(self.db.finish_download_task.call_args[0], (1, 1, None, False))
+            self.assertIn('No filing found', self.db.finish_download_task.call_args[1]['error_message'])
 
         run_async(test())
 
@@ -460,7 +703,7 @@ class TestRetryLogic(unittest.TestCase):
             await self.downloader._download_filing_with_retry(mock_client, task)
 
             # Should skip and mark as success without downloading
-            self.db.increment_job_counter.assert_called_with(1, 'completed_files')
+            self.assertEqual(self.db.finish_download_task.call_args[0], (1, 1, None, True))
             # Should NOT have made any HTTP requests
             mock_client.get.assert_not_called()
 
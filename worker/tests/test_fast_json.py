@@ -0,0 +1,78 @@
+"""
+Unit tests for worker/fast_json.py
+Tests orjson encoding of DB rows and gzip negotiation.
+"""
+
+import gzip
+import json
+import unittest
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import MagicMock
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fast_json import GZIP_MIN_BYTES, accepts_gzip, dumps, dumps_ndjson, json_response
+
+
+def _request(accept_encoding=None):
+    request = MagicMock()
+    request.headers = {'accept-encoding': accept_encoding} if accept_encoding else {}
+    return request
+
+
+class TestDumps(unittest.TestCase):
+    """Test row encoding matches what jsonable_encoder would produce"""
+
+    def test_datetimes_and_decimals(self):
+        """Test datetimes are ISO 8601 and Decimals become numbers"""
+        row = {'created_at': datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+               'avg': Decimal('1.5'), 'n': Decimal('3'), 'years': [2023, 2024]}
+        self.assertEqual(json.loads(dumps(row)), {
+            'created_at': '2024-05-01T12:30:00+00:00', 'avg': 1.5, 'n': 3, 'years': [2023, 2024],
+        })
+
+    def test_unsupported_type_raises(self):
+        """Test binary content is never silently encoded"""
+        with self.assertRaises(TypeError):
+            dumps({'file_content': memoryview(b'pdf')})
+
+    def test_ndjson_one_row_per_line(self):
+        """Test NDJSON output ends every row with a newline"""
+        self.assertEqual(dumps_ndjson([{'id': 1}, {'id': 2}]), b'{"id":1}\n{"id":2}\n')
+
+
+class TestGzipNegotiation(unittest.TestCase):
+    """Test Accept-Encoding handling"""
+
+    def test_accepts_gzip(self):
+        """Test gzip, wildcard and q-values"""
+        self.assertTrue(accepts_gzip('gzip, deflate, br'))
+        self.assertTrue(accepts_gzip('br;q=1.0, gzip;q=0.8'))
+        self.assertTrue(accepts_gzip('*'))
+        self.assertFalse(accepts_gzip('gzip;q=0'))
+        self.assertFalse(accepts_gzip('br'))
+        self.assertFalse(accepts_gzip(None))
+
+    def test_large_body_is_compressed(self):
+        """Test bodies over the threshold are gzipped for clients that accept it"""
+        payload = {'rows': [{'id': i, 'name': 'x' * 20} for i in range(GZIP_MIN_BYTES)]}
+        response = json_response(_request('gzip'), payload)
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        self.assertEqual(response.headers['vary'], 'Accept-Encoding')
+        self.assertEqual(json.loads(gzip.decompress(response.body)), payload)
+
+    def test_small_or_unaccepted_body_is_plain(self):
+        """Test tiny bodies and clients without gzip get identity encoding"""
+        small = json_response(_request('gzip'), {'ok': True})
+        self.assertNotIn('content-encoding', small.headers)
+        self.assertEqual(small.body, b'{"ok":true}')
+        large = json_response(_request(), {'rows': ['x' * 50] * 100})
+        self.assertNotIn('content-encoding', large.headers)
+        self.assertEqual(large.headers['vary'], 'Accept-Encoding')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""
+Unit tests for worker/http_cache.py
+Tests Range parsing and conditional GET evaluation.
+"""
+
+import unittest
+from datetime import datetime, timedelta, timezone
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from http_cache import (
+    MAX_RANGES, RangeNotSatisfiable, http_date, if_range_allows, is_not_modified, make_etag, parse_range,
+)
+
+
+class TestParseRange(unittest.TestCase):
+    """Test Range header parsing against a 100-byte body"""
+
+    def test_no_or_invalid_header_means_full_body(self):
+        """Test absent, malformed or non-byte ranges are ignored"""
+        for header in (None, '', 'items=0-1', 'bytes=', 'bytes=a-b', 'bytes=5-2', 'bytes=7'):
+            self.assertIsNone(parse_range(header, 100), header)
+
+    def test_single_and_open_ranges(self):
+        """Test explicit, open-ended and suffix ranges"""
+        self.assertEqual(parse_range('bytes=0-9', 100), [(0, 9)])
+        self.assertEqual(parse_range('bytes=90-', 100), [(90, 99)])
+        self.assertEqual(parse_range('bytes=-10', 100), [(90, 99)])
+        self.assertEqual(parse_range('bytes=-500', 100), [(0, 99)])
+        self.assertEqual(parse_range('bytes=95-500', 100), [(95, 99)])
+
+    def test_multiple_ranges(self):
+        """Test multi-range requests keep their order and drop out-of-bounds parts"""
+        self.assertEqual(parse_range('bytes=0-0, 50-59, 200-300', 100), [(0, 0), (50, 59)])
+
+    def test_unsatisfiable(self):
+        """Test ranges entirely past the end raise RangeNotSatisfiable"""
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=100-200', 100)
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=-0', 100)
+
+    def test_too_many_ranges_sends_full_body(self):
+        """Test requests with more than MAX_RANGES parts are not honoured"""
+        header = 'bytes=' + ','.join(f"{i}-{i}" for i in range(MAX_RANGES + 1))
+        self.assertIsNone(parse_range(header, 100))
+
+
+class TestConditionalGet(unittest.TestCase):
+    """Test If-None-Match / If-Modified-Since / If-Range"""
+
+    def setUp(self):
+        self.etag = make_etag('ab' * 32)
+        self.modified = datetime(2024, 5, 1, 12, 0, 0, 500, tzinfo=timezone.utc)
+
+    def test_if_none_match(self):
+        """Test weak comparison over a list of tags, and '*'"""
+        self.assertTrue(is_not_modified(self.etag, None, f'"x", W/{self.etag}', None))
+        self.assertTrue(is_not_modified(self.etag, None, '*', None))
+        self.assertFalse(is_not_modified(self.etag, None, '"other"', None))
+        self.assertFalse(is_not_modified(None, None, '*', None))
+
+    def test_if_none_match_takes_precedence(self):
+        """Test a non-matching ETag wins over a satisfied If-Modified-Since"""
+        since = 'Wed, 01 May 2024 12:00:00 GMT'
+        self.assertTrue(is_not_modified(self.etag, self.modified, None, since))
+        self.assertFalse(is_not_modified(self.etag, self.modified, '"other"', since))
+        self.assertFalse(is_not_modified(self.etag, self.modified, None, 'Tue, 30 Apr 2024 00:00:00 GMT'))
+        self.assertFalse(is_not_modified(self.etag, self.modified, None, 'garbage'))
+
+    def test_if_range(self):
+        """Test If-Range requires a strong match"""
+        self.assertTrue(if_range_allows(None, self.etag))
+        self.assertTrue(if_range_allows(self.etag, self.etag))
+        self.assertFalse(if_range_allows(f'W/{self.etag}', self.etag))
+        self.assertFalse(if_range_allows('Wed, 01 May 2024 12:00:00 GMT', self.etag))
+
+    def test_http_date_converts_to_gmt(self):
+        """Test timestamps in a non-UTC session TimeZone are rendered in GMT"""
+        shanghai = timezone(timedelta(hours=8))
+        local = datetime(2024, 5, 1, 20, 0, 0, tzinfo=shanghai)
+        self.assertEqual(http_date(local), 'Wed, 01 May 2024 12:00:00 GMT')
+        self.assertEqual(http_date(datetime(2024, 5, 1, 12, 0, 0)), 'Wed, 01 May 2024 12:00:00 GMT')
+        self.assertIsNone(http_date(None))
+        self.assertTrue(is_not_modified(None, local, None, http_date(local)))
+
+
+if __name__ == '__main__':
+    unittest.main()
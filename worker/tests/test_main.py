@@ -2,8 +2,12 @@
 Unit tests for worker/main.py (FastAPI endpoints)
 """
 
+import json
+import shutil
+import tempfile
 import unittest
-from unittest.mock import patch, MagicMock
+import asyncio
+from unittest.mock import patch, MagicMock, AsyncMock
 import sys
 import os
 
@@ -31,12 +35,35 @@ class TestWorkerAPI(unittest.TestCase):
                 'id': 1, 'status': 'pending', 'created_at': '2024-01-01'
             }
             mock_db.get_download_logs.return_value = []
+            mock_db.pool_stats.return_value = {
+                'meta': {'in_use': 0, 'timeouts': 0},
+                'blob': {'in_use': 0, 'timeouts': 0},
+            }
+            mock_db.list_job_queue.return_value = [
+                {'id': 1, 'estimated_files': 4, 'lane': 0, 'priority': 0}
+            ]
+            mock_db.get_queue_backlog.return_value = {
+                'backlog_files': 0, 'files_per_second': 1.0
+            }
 
             # Patch at module level
             import main as main_module
             main_module.db = mock_db
             cls.mock_db = mock_db
             cls.client = TestClient(main_module.app, raise_server_exceptions=False)
+        cls.cache_dir = tempfile.mkdtemp()
+        cls._reset_disk_cache()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.cache_dir, ignore_errors=True)
+
+    @classmethod
+    def _reset_disk_cache(cls):
+        import main as main_module
+        from disk_cache import DiskBlobCache
+        shutil.rmtree(cls.cache_dir, ignore_errors=True)
+        main_module.disk_cache = DiskBlobCache(cls.cache_dir, 1024 * 1024)
 
     def test_health_check(self):
         """Test health check endpoint"""
@@ -60,6 +87,21 @@ class TestWorkerAPI(unittest.TestCase):
         data = response.json()
         self.assertIn('job', data)
 
+    def test_get_pending_job_has_queue_position(self):
+        """Test pending jobs report their queue position and estimated start"""
+        response = self.client.get('/jobs/1')
+        job = response.json()['job']
+        self.assertEqual(job['queue_position'], 1)
+        self.assertIn('estimated_start_at', job)
+
+    def test_queue(self):
+        """Test the scheduler queue endpoint"""
+        response = self.client.get('/queue')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(data['queue'][0]['queue_position'], 1)
+
     def test_get_nonexistent_job(self):
         """Test 404 for non-existent job"""
         self.mock_db.get_job.return_value = None
@@ -75,10 +117,65 @@ class TestWorkerAPI(unittest.TestCase):
         self.mock_db.get_job.return_value = {
             'id': 1, 'status': 'pending', 'created_at': '2024-01-01'
         }
-        response = self.client.post('/jobs/1/trigger')
+        import main as main_module
+        with patch.object(main_module, 'run_job', new=AsyncMock()) as run_job:
+            response = self.client.post('/jobs/1/trigger')
         self.assertEqual(response.status_code, 200)
         data = response.json()
         self.assertEqual(data['status'], 'processing')
+        # Runs as its own task counted against max_active_jobs, not as a
+        # background task of the request
+        run_job.assert_awaited_once_with(1)
+        self.assertEqual(len(main_module._active_jobs), 1)
+        main_module._active_jobs.clear()
+
+    def test_trigger_job_at_capacity(self):
+        """Test 503 and no claim while all max_active_jobs slots are busy"""
+        import main as main_module
+        self.mock_db.get_job.return_value = {
+            'id': 1, 'status': 'pending', 'created_at': '2024-01-01'
+        }
+        self.mock_db.claim_job.reset_mock()
+        busy = [MagicMock() for _ in range(main_module.settings.max_active_jobs)]
+        main_module._active_jobs.update(busy)
+        try:
+            response = self.client.post('/jobs/1/trigger')
+        finally:
+            main_module._active_jobs.difference_update(busy)
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+        self.mock_db.claim_job.assert_not_called()
+
+    def test_trigger_job_claimed_elsewhere(self):
+        """Test 409 when another worker claims the job first"""
+        self.mock_db.get_job.return_value = {
+            'id': 1, 'status': 'pending', 'created_at': '2024-01-01'
+        }
+        self.mock_db.claim_job.return_value = None
+        response = self.client.post('/jobs/1/trigger')
+        self.assertEqual(response.status_code, 409)
+        # Reset
+        self.mock_db.claim_job.return_value = {'id': 1, 'status': 'running'}
+
+    def test_cancel_job(self):
+        """Test cancelling a pending or running job"""
+        self.mock_db.cancel_job.return_value = {'id': 1, 'status': 'cancelled'}
+        response = self.client.post('/jobs/1/cancel')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'cancelled')
+
+    def test_cancel_finished_job_fails(self):
+        """Test cancelling a completed job returns 400"""
+        self.mock_db.cancel_job.return_value = None
+        self.mock_db.get_job.return_value = {
+            'id': 1, 'status': 'completed', 'created_at': '2024-01-01'
+        }
+        response = self.client.post('/jobs/1/cancel')
+        self.assertEqual(response.status_code, 400)
+        # Reset
+        self.mock_db.get_job.return_value = {
+            'id': 1, 'status': 'pending', 'created_at': '2024-01-01'
+        }
 
     def test_trigger_running_job_fails(self):
         """Test that triggering a running job returns error"""
@@ -92,6 +189,537 @@ class TestWorkerAPI(unittest.TestCase):
             'id': 1, 'status': 'pending', 'created_at': '2024-01-01'
         }
 
+    def _filing_meta(self, size=10):
+        from datetime import datetime, timezone
+        self.mock_db.get_blob_meta.return_value = {
+            'id': 3, 'filename': 'f.pdf', 'content_type': 'application/pdf', 'file_size': size,
+            'content_sha256': 'ab' * 32,
+            'created_at': datetime(2024, 5, 1, tzinfo=timezone.utc),
+        }
+
+    def _serve_blob(self, data: bytes):
+        """read_blob_chunk backed by an in-memory blob"""
+        self.mock_db.read_blob_chunk.side_effect = \
+            lambda table, row_id, offset, length: memoryview(data[offset:offset + length])
+
+    def tearDown(self):
+        import main as main_module
+        main_module.response_cache.clear()
+        main_module.chunk_cache.clear()
+        self._reset_disk_cache()
+        self.mock_db.read_blob_chunk.side_effect = None
+        self.mock_db.export_rows.side_effect = None
+
+    def test_download_filing_streams_chunks(self):
+        """Test filing content is streamed chunk by chunk with cache validators"""
+        import main as main_module
+        self._filing_meta(size=5)
+        self._serve_blob(b'abcde')
+        with patch.object(main_module.settings, 'blob_stream_chunk_bytes', 3):
+            response = self.client.get('/filings/3/download')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'abcde')
+        self.assertEqual(response.headers['content-length'], '5')
+        self.assertEqual(response.headers['etag'], '"' + 'ab' * 32 + '"')
+        self.assertEqual(response.headers['accept-ranges'], 'bytes')
+        self.assertIn('immutable', response.headers['cache-control'])
+        self.assertEqual(response.headers['last-modified'], 'Wed, 01 May 2024 00:00:00 GMT')
+        offsets = [c[0][2] for c in self.mock_db.read_blob_chunk.call_args_list[-2:]]
+        self.assertEqual(offsets, [0, 3])
+
+    def test_iter_blob_passes_driver_buffers_through(self):
+        """Test streamed pieces are views of the buffers read_blob_chunk returned"""
+        import main as main_module
+        self._filing_meta(size=10)
+        source = bytes(range(10))
+        self.mock_db.read_blob_chunk.side_effect = \
+            lambda table, row_id, offset, length: memoryview(source)[offset:offset + length]
+        meta = self.mock_db.get_blob_meta.return_value
+
+        async def collect():
+            return [piece async for piece in main_module._iter_blob('shared_filings', 3, meta, 2, 9)]
+
+        with patch.object(main_module.settings, 'blob_stream_chunk_bytes', 4):
+            loop = asyncio.new_event_loop()
+            try:
+                pieces = loop.run_until_complete(collect())
+            finally:
+                loop.close()
+        self.assertEqual(b''.join(pieces), source[2:9])
+        self.assertTrue(all(isinstance(p, memoryview) and p.obj is source for p in pieces))
+
+    def test_download_filing_not_modified(self):
+        """Test a matching If-None-Match returns 304 without reading content"""
+        self._filing_meta()
+        self.mock_db.read_blob_chunk.reset_mock()
+        response = self.client.get(
+            '/filings/3/download', headers={'If-None-Match': '"' + 'ab' * 32 + '"'}
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.mock_db.read_blob_chunk.assert_not_called()
+
+    def test_download_filing_single_range(self):
+        """Test a byte range is served as 206 straight from the database"""
+        self._filing_meta()
+        self._serve_blob(b'0123456789')
+        response = self.client.get('/filings/3/download', headers={'Range': 'bytes=2-5'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, b'2345')
+        self.assertEqual(response.headers['content-range'], 'bytes 2-5/10')
+        self.assertEqual(response.headers['content-length'], '4')
+
+    def test_download_filing_multi_range(self):
+        """Test multiple ranges are served as multipart/byteranges"""
+        self._filing_meta()
+        self._serve_blob(b'0123456789')
+        response = self.client.get('/filings/3/download', headers={'Range': 'bytes=0-1,-2'})
+        self.assertEqual(response.status_code, 206)
+        content_type = response.headers['content-type']
+        self.assertTrue(content_type.startswith('multipart/byteranges; boundary='))
+        boundary = content_type.split('boundary=')[1]
+        body = response.content
+        self.assertEqual(int(response.headers['content-length']), len(body))
+        self.assertIn(b'Content-Range: bytes 0-1/10\r\n\r\n01', body)
+        self.assertIn(b'Content-Range: bytes 8-9/10\r\n\r\n89', body)
+        self.assertTrue(body.endswith(f'--{boundary}--\r\n'.encode()))
+
+    def test_repeat_and_range_downloads_reuse_chunks(self):
+        """Test a second download and a range of the same filing hit the chunk cache"""
+        self._filing_meta()
+        self._serve_blob(b'0123456789')
+        self.mock_db.read_blob_chunk.reset_mock()
+        self.assertEqual(self.client.get('/filings/3/download').content, b'0123456789')
+        response = self.client.get('/filings/3/download', headers={'Range': 'bytes=0-1,-2'})
+        self.assertIn(b'89', response.content)
+        self.assertEqual(self.client.get('/filings/3/download').content, b'0123456789')
+        self.mock_db.read_blob_chunk.assert_called_once_with('shared_filings', 3, 0, 10)
+
+    def test_downloaded_filing_served_from_disk_cache(self):
+        """Test a completed download is written to disk and later served from the file"""
+        import main as main_module
+        self._filing_meta()
+        self._serve_blob(b'0123456789')
+        self.assertEqual(self.client.get('/filings/3/download').content, b'0123456789')
+        self.assertEqual(main_module.disk_cache.stats()['writes'], 1)
+        main_module.chunk_cache.clear()
+        self.mock_db.read_blob_chunk.reset_mock()
+        response = self.client.get('/filings/3/download')
+        self.assertEqual(response.content, b'0123456789')
+        self.assertEqual(response.headers['etag'], '"' + 'ab' * 32 + '"')
+        ranged = self.client.get('/filings/3/download', headers={'Range': 'bytes=2-5'})
+        self.assertEqual((ranged.status_code, ranged.content), (206, b'2345'))
+        self.mock_db.read_blob_chunk.assert_not_called()
+        stats = main_module.disk_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+
+    def test_download_filing_range_not_satisfiable(self):
+        """Test a range past the end returns 416"""
+        self._filing_meta()
+        response = self.client.get('/filings/3/download', headers={'Range': 'bytes=50-60'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['content-range'], 'bytes */10')
+
+    def test_stale_if_range_sends_full_body(self):
+        """Test Range is ignored when If-Range does not match the current ETag"""
+        self._filing_meta()
+        self._serve_blob(b'0123456789')
+        response = self.client.get(
+            '/filings/3/download', headers={'Range': 'bytes=2-5', 'If-Range': '"old"'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'0123456789')
+
+    def test_upload_report_streams_to_database(self):
+        """Test uploads are handed to the database as a hashing, sniffing reader"""
+        import hashlib
+        seen = {}
+
+        def save(source, **kwargs):
+            seen['content'] = b''.join(iter(lambda: source.read(4), b''))
+            seen['sha'] = source.hexdigest()
+            seen['type'] = source.content_type
+            seen.update(kwargs)
+            return 7
+
+        self.mock_db.save_user_report_stream.side_effect = save
+        try:
+            response = self.client.post(
+                '/reports/upload',
+                files={'file': ('r.bin', b'%PDF-1.4 report', 'application/octet-stream')},
+                data={'title': 'Q1', 'year': '2024'},
+            )
+        finally:
+            self.mock_db.save_user_report_stream.side_effect = None
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], 7)
+        self.assertEqual(seen['content'], b'%PDF-1.4 report')
+        self.assertEqual(seen['sha'], hashlib.sha256(b'%PDF-1.4 report').hexdigest())
+        self.assertEqual(seen['type'], 'application/pdf')
+        self.assertEqual((seen['title'], seen['year'], seen['company_id']), ('Q1', 2024, None))
+
+    def test_upload_report_too_large(self):
+        """Test a file past the limit while copying is a 413"""
+        from uploads import UploadTooLarge
+        self.mock_db.save_user_report_stream.side_effect = UploadTooLarge('File too large (max 50MB)')
+        try:
+            response = self.client.post(
+                '/reports/upload', files={'file': ('r.pdf', b'x', 'application/pdf')}, data={'title': 'Q1'},
+            )
+        finally:
+            self.mock_db.save_user_report_stream.side_effect = None
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.json()['detail'], 'File too large (max 50MB)')
+
+    def test_upload_report_over_limit_within_multipart_allowance(self):
+        """Test a file just past max_upload_bytes is refused before the COPY starts"""
+        import main as main_module
+        self.mock_db.save_user_report_stream.reset_mock()
+        with patch.object(main_module.settings, 'max_upload_bytes', 8):
+            response = self.client.post(
+                '/reports/upload', files={'file': ('r.pdf', b'x' * 9, 'application/pdf')}, data={'title': 'Q1'},
+            )
+        self.assertEqual(response.status_code, 413)
+        self.mock_db.save_user_report_stream.assert_not_called()
+
+    def test_download_missing_report(self):
+        """Test 404 for a missing or empty report"""
+        self.mock_db.get_blob_meta.return_value = None
+        self.assertEqual(self.client.get('/reports/9/download').status_code, 404)
+        self.mock_db.get_blob_meta.return_value = {'id': 9, 'file_size': 0}
+        self.assertEqual(self.client.get('/reports/9/download').status_code, 404)
+
+    def test_list_filings_first_page_has_total_and_cursor(self):
+        """Test the first page fetches limit + 1 rows, a separate count, and a cursor"""
+        from pagination import decode_cursor
+        rows = [{'id': 30 - i, 'year': 2024, 'quarter': 'Q2'} for i in range(3)]
+        self.mock_db.list_shared_filings.return_value = rows
+        self.mock_db.count_shared_filings.return_value = 41
+        response = self.client.get('/filings?limit=2&category=AI_Applications')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['filings']), 2)
+        self.assertEqual(data['total'], 41)
+        self.assertEqual(decode_cursor(data['next_cursor'], (int, str, int)), (2024, 'Q2', 29))
+        kwargs = self.mock_db.list_shared_filings.call_args.kwargs
+        self.assertEqual((kwargs['limit'], kwargs['after'], kwargs['category']),
+                         (3, None, 'AI_Applications'))
+
+    def test_list_filings_gzip(self):
+        """Test large listings are served gzip-compressed to clients that accept it"""
+        rows = [{'id': i, 'year': 2024, 'quarter': 'Q1', 'filename': f"F{i}.pdf"} for i in range(200)]
+        self.mock_db.list_shared_filings.return_value = rows
+        self.mock_db.count_shared_filings.return_value = 200
+        response = self.client.get('/filings?limit=500', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['content-encoding'], 'gzip')
+        self.assertEqual(response.json()['filings'], rows)
+
+    def test_lookup_filings(self):
+        """Test a batch lookup answers every key in request order"""
+        self.mock_db.lookup_shared_filings.return_value = [
+            {'company_id': 3, 'ticker': 'NVDA', 'year': 2024, 'quarter': 'Q1',
+             'id': 11, 'file_size': 900, 'content_type': 'application/pdf'},
+            {'company_id': None, 'ticker': None, 'year': 2023, 'quarter': 'Q4',
+             'id': None, 'file_size': None, 'content_type': None},
+        ]
+        response = self.client.post('/filings/lookup', json={'filings': [
+            {'company_id': 3, 'year': 2024, 'quarter': 'q1'},
+            {'ticker': 'zzzz', 'year': 2023, 'quarter': 'Q4'},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['found'], 1)
+        self.assertEqual([r['exists'] for r in data['results']], [True, False])
+        self.assertEqual(data['results'][1]['ticker'], 'zzzz')
+        self.mock_db.lookup_shared_filings.assert_called_with(
+            [(3, None, 2024, 'Q1'), (None, 'ZZZZ', 2023, 'Q4')]
+        )
+
+    def test_lookup_filings_requires_company(self):
+        """Test keys without company_id or ticker are rejected"""
+        response = self.client.post('/filings/lookup',
+                                    json={'filings': [{'year': 2024, 'quarter': 'Q1'}]})
+        self.assertEqual(response.status_code, 422)
+
+    def test_filing_coverage_matrix_is_cached(self):
+        """Test coverage is grouped per company and cached until a new filing is stored"""
+        import main as main_module
+        self.mock_db.get_filing_coverage.reset_mock()
+        self.mock_db.get_filing_coverage.return_value = [
+            {'company_id': 1, 'ticker': 'NVDA', 'name': 'NVIDIA', 'category': 'AI_Hardware',
+             'year': 2024, 'quarter': 'Q2', 'filing_id': 8, 'source': 'sec_edgar', 'file_size': 10},
+            {'company_id': 1, 'ticker': 'NVDA', 'name': 'NVIDIA', 'category': 'AI_Hardware',
+             'year': 2024, 'quarter': 'Q1', 'filing_id': 7, 'source': 'sec_edgar', 'file_size': 9},
+            {'company_id': 2, 'ticker': 'SNPS', 'name': 'Synopsys', 'category': 'AI_Supply_Chain',
+             'year': None, 'quarter': None, 'filing_id': None, 'source': None, 'file_size': None},
+        ]
+        data = self.client.get('/filings/coverage').json()
+        self.assertEqual(data['periods'], ['2024-Q2', '2024-Q1'])
+        self.assertEqual(data['total_filings'], 2)
+        self.assertEqual(data['companies'][0]['coverage']['2024-Q1']['filing_id'], 7)
+        self.assertEqual(data['companies'][1]['coverage'], {})
+        self.client.get('/filings/coverage')
+        self.assertEqual(self.mock_db.get_filing_coverage.call_count, 1)
+        main_module.response_cache.invalidate('filings')  # a filing was saved
+        self.client.get('/filings/coverage')
+        self.assertEqual(self.mock_db.get_filing_coverage.call_count, 2)
+
+    def test_list_filings_next_page_skips_count(self):
+        """Test later pages seek past the cursor and do not recount"""
+        from pagination import encode_cursor
+        self.mock_db.list_shared_filings.return_value = [{'id': 5, 'year': 2023, 'quarter': 'Q4'}]
+        self.mock_db.count_shared_filings.reset_mock()
+        response = self.client.get(f"/filings?cursor={encode_cursor(2024, 'Q1', 9)}")
+        data = response.json()
+        self.assertIsNone(data['next_cursor'])
+        self.assertNotIn('total', data)
+        self.assertEqual(self.mock_db.list_shared_filings.call_args.kwargs['after'], (2024, 'Q1', 9))
+        self.mock_db.count_shared_filings.assert_not_called()
+
+    def test_list_filings_invalid_cursor(self):
+        """Test a malformed cursor returns 400"""
+        self.assertEqual(self.client.get('/filings?cursor=abc').status_code, 400)
+        self.assertEqual(self.client.get('/filings?limit=0').status_code, 422)
+
+    def test_export_jobs_streams_ndjson(self):
+        """Test exports emit one JSON object per line, batch by batch"""
+        from datetime import datetime, timezone
+        created = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        closed = []
+
+        def export_rows(kind, batch_size, **filters):
+            try:
+                yield [{'id': 1, 'created_at': created}, {'id': 2, 'created_at': None}]
+                yield [{'id': 3, 'created_at': None}]
+            finally:
+                closed.append(kind)
+
+        self.mock_db.export_rows.side_effect = export_rows
+        response = self.client.get('/export/jobs?status=completed')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers['content-type'].startswith('application/x-ndjson'))
+        lines = response.text.splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [1, 2, 3])
+        self.assertEqual(json.loads(lines[0])['created_at'], '2024-05-01T00:00:00+00:00')
+        self.assertEqual(self.mock_db.export_rows.call_args.kwargs, {'status': 'completed'})
+        self.assertEqual(closed, ['jobs'])
+
+    def test_export_pool_timeout_returns_503(self):
+        """Test an exhausted export pool sheds load before the stream starts"""
+        from database import PoolTimeout
+        self.mock_db.export_rows.side_effect = PoolTimeout("export pool exhausted")
+        response = self.client.get('/export/filings')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['retry-after'], '1')
+
+    def test_metrics(self):
+        """Test DB executor metrics are exposed"""
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertIn('queue_wait_ms', data['db_executor'])
+        self.assertIn('blob_executor', data)
+        self.assertIn('export_executor', data)
+        self.assertIn('in_use', data['db_pools']['blob'])
+
+    def test_jobs_served_from_cache_until_invalidated(self):
+        """Test polled endpoints reuse payloads until a job write invalidates them"""
+        import main as main_module
+        self.mock_db.list_jobs.reset_mock()
+        before = main_module.response_cache.stats()['by_namespace'].get('jobs', {'hits': 0, 'misses': 0})
+        self.client.get('/jobs')
+        self.client.get('/jobs')
+        self.assertEqual(self.mock_db.list_jobs.call_count, 1)
+        self.client.get('/jobs?limit=5')
+        self.assertEqual(self.mock_db.list_jobs.call_count, 2)
+        main_module.response_cache.invalidate('jobs')
+        self.client.get('/jobs')
+        self.assertEqual(self.mock_db.list_jobs.call_count, 3)
+        stats = self.client.get('/metrics').json()['response_cache']
+        after = stats['by_namespace']['jobs']
+        self.assertEqual((after['hits'] - before['hits'], after['misses'] - before['misses']), (1, 3))
+
+    def test_db_busy_returns_503(self):
+        """Test a saturated DB executor sheds load with 503 + Retry-After"""
+        import main as main_module
+        from db_executor import DBBusyError
+        with patch.object(main_module.db_executor, 'run',
+                          AsyncMock(side_effect=DBBusyError("busy"))):
+            response = self.client.get('/jobs')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['retry-after'], '1')
+
+
+
+class TestJobPollingLoop(unittest.TestCase):
+    """Test concurrent job processing in the polling loop"""
+
+    def test_runs_jobs_concurrently_up_to_limit(self):
+        """Test several claimed jobs run at once, capped by max_active_jobs"""
+        import main as main_module
+
+        mock_db = MagicMock()
+        jobs = [{'id': 1}, {'id': 2}, {'id': 3}]
+        mock_db.claim_next_job.side_effect = lambda: jobs.pop(0) if jobs else None
+        running = set()
+        peak = []
+
+        async def fake_process_job(job_id):
+            running.add(job_id)
+            peak.append(len(running))
+            await asyncio.sleep(0.05)
+            running.discard(job_id)
+
+        mock_downloader = MagicMock()
+        mock_downloader.process_job = fake_process_job
+        mock_downloader.run_shared_tasks = AsyncMock(return_value=0)
+        mock_notifier = MagicMock()
+
+        async def fake_wait(timeout):
+            await asyncio.sleep(0.01)
+            if not jobs and not main_module._active_jobs:
+                main_module._shutdown_event.set()
+            return False
+
+        mock_notifier.wait = fake_wait
+
+        async def test():
+            await main_module.job_polling_loop()
+
+        with patch.object(main_module, 'db', mock_db), \
+                patch.object(main_module, 'downloader', mock_downloader), \
+                patch.object(main_module, 'notifier', mock_notifier), \
+                patch.object(main_module.settings, 'max_active_jobs', 2), \
+                patch.object(main_module, '_shutdown_event', asyncio.Event()):
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(asyncio.wait_for(test(), 5))
+            finally:
+                loop.close()
+
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(len(peak), 3)
+        mock_downloader.run_shared_tasks.assert_awaited()
+
+    def test_shared_task_helper_does_not_hold_a_job_slot(self):
+        """Test a long-running helper does not delay a newly arrived job"""
+        import main as main_module
+
+        mock_db = MagicMock()
+        jobs = [None, {'id': 5}]
+        mock_db.claim_next_job.side_effect = lambda: jobs.pop(0) if jobs else None
+        started = []
+        helper_done = asyncio.Event()
+
+        async def fake_process_job(job_id):
+            started.append(job_id)
+            main_module._shutdown_event.set()
+
+        async def long_backfill():
+            await helper_done.wait()
+            return 0
+
+        mock_downloader = MagicMock()
+        mock_downloader.process_job = fake_process_job
+        mock_downloader.run_shared_tasks = long_backfill
+        mock_notifier = MagicMock()
+        mock_notifier.wait = AsyncMock(return_value=True)  # NOTIFY for job 5
+
+        async def test():
+            await main_module.job_polling_loop()
+            await asyncio.gather(*main_module._active_jobs)
+            self.assertFalse(main_module._helper_task.done())
+            main_module._helper_task.cancel()
+
+        with patch.object(main_module, 'db', mock_db), \
+                patch.object(main_module, 'downloader', mock_downloader), \
+                patch.object(main_module, 'notifier', mock_notifier), \
+                patch.object(main_module.settings, 'max_active_jobs', 1), \
+                patch.object(main_module, '_helper_task', None), \
+                patch.object(main_module, '_shutdown_event', asyncio.Event()):
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(asyncio.wait_for(test(), 5))
+            finally:
+                loop.close()
+
+        self.assertEqual(started, [5])
+
+
+
+class TestLeaseMaintenance(unittest.TestCase):
+    """Test job/task heartbeats and reaping of expired jobs"""
+
+    def test_heartbeats_held_leases_and_reaps(self):
+        """Test held job and task ids are heartbeated and expired jobs reclaimed"""
+        import main as main_module
+
+        mock_db = MagicMock()
+        mock_db.heartbeat_leases.return_value = ([7], [11])
+        shutdown = asyncio.Event()
+
+        def reclaim():
+            shutdown.set()
+            return [{'id': 9, 'claimed_by': 'dead-worker'}]
+
+        mock_db.reclaim_expired_jobs.side_effect = reclaim
+        mock_downloader = MagicMock()
+        mock_downloader.leased_task_ids = {11}
+
+        with patch.object(main_module, 'db', mock_db), \
+                patch.object(main_module, 'downloader', mock_downloader), \
+                patch.object(main_module, '_running_jobs', {7: MagicMock()}), \
+                patch.object(main_module.settings, 'job_heartbeat_interval', 0), \
+                patch.object(main_module, '_shutdown_event', shutdown):
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(
+                    asyncio.wait_for(main_module.lease_maintenance_loop(), 5)
+                )
+            finally:
+                loop.close()
+
+        args = mock_db.heartbeat_leases.call_args[0]
+        self.assertEqual(args[0], [7])
+        self.assertEqual(args[1], [11])
+        mock_db.reclaim_expired_jobs.assert_called_once()
+        mock_downloader.cancel_tasks.assert_not_called()
+
+    def test_stops_jobs_and_tasks_no_longer_owned(self):
+        """Test a job cancelled on another replica is stopped locally"""
+        import main as main_module
+
+        mock_db = MagicMock()
+        mock_db.heartbeat_leases.return_value = ([], [])
+        shutdown = asyncio.Event()
+
+        def reclaim():
+            shutdown.set()
+            return []
+
+        mock_db.reclaim_expired_jobs.side_effect = reclaim
+        mock_downloader = MagicMock()
+        mock_downloader.leased_task_ids = {11}
+        job_task = MagicMock()
+
+        with patch.object(main_module, 'db', mock_db), \
+                patch.object(main_module, 'downloader', mock_downloader), \
+                patch.object(main_module, '_running_jobs', {7: job_task}), \
+                patch.object(main_module.settings, 'job_heartbeat_interval', 0), \
+                patch.object(main_module, '_shutdown_event', shutdown):
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(
+                    asyncio.wait_for(main_module.lease_maintenance_loop(), 5)
+                )
+            finally:
+                loop.close()
+
+        job_task.cancel.assert_called_once()
+        mock_downloader.cancel_tasks.assert_any_call(job_id=7)
+        mock_downloader.cancel_tasks.assert_any_call(task_ids={11})
+
+
 
 if __name__ == '__main__':
     unittest.main()
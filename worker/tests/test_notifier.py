@@ -0,0 +1,133 @@
+"""
+Unit tests for worker/notifier.py
+Tests LISTEN/NOTIFY wake-up with a mocked listener connection.
+"""
+
+import unittest
+import asyncio
+import socket
+from unittest.mock import MagicMock
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from notifier import JobNotifier
+
+
+def run_async(coro):
+    """Helper to run async functions in tests"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+class TestJobNotifier(unittest.TestCase):
+    """Test JobNotifier wake-up behaviour"""
+
+    def setUp(self):
+        self.db = MagicMock()
+        # Real socket so the event loop can register a reader on its fd
+        self.sock_a, self.sock_b = socket.socketpair()
+        self.conn = MagicMock()
+        self.conn.fileno.return_value = self.sock_a.fileno()
+        self.conn.notifies = []
+        self.db.open_listener.return_value = self.conn
+
+    def tearDown(self):
+        self.sock_a.close()
+        self.sock_b.close()
+
+    def test_wait_times_out_without_notification(self):
+        """Test wait returns False after the safety-net timeout"""
+        async def test():
+            notifier = JobNotifier(self.db)
+            await notifier.start()
+            woke = await notifier.wait(0.05)
+            notifier.stop()
+            return woke
+
+        self.assertFalse(run_async(test()))
+
+    def test_notification_wakes_waiter(self):
+        """Test a NOTIFY on the channel wakes the waiter immediately"""
+        async def test():
+            notifier = JobNotifier(self.db)
+            await notifier.start()
+
+            def deliver():
+                self.conn.notifies.append(MagicMock(payload='42'))
+                self.sock_b.send(b'x')
+
+            asyncio.get_running_loop().call_later(0.01, deliver)
+            woke = await notifier.wait(5)
+            notifier.stop()
+            return woke
+
+        self.assertTrue(run_async(test()))
+        self.conn.poll.assert_called()
+        self.assertEqual(self.conn.notifies, [])
+
+    def test_listener_failure_falls_back_to_polling(self):
+        """Test that a failed LISTEN connection degrades to timeout polling"""
+        self.db.open_listener.side_effect = Exception('connection refused')
+
+        async def test():
+            notifier = JobNotifier(self.db)
+            await notifier.start()
+            self.assertFalse(notifier.connected)
+            return await notifier.wait(0.01)
+
+        self.assertFalse(run_async(test()))
+
+    def test_reconnect_runs_off_loop_with_backoff(self):
+        """Test reconnects happen in a thread and are not retried every poll cycle"""
+        import threading
+        threads = []
+
+        def refuse(channel):
+            threads.append(threading.current_thread())
+            raise Exception('connection timed out')
+
+        self.db.open_listener.side_effect = refuse
+
+        async def test():
+            notifier = JobNotifier(self.db)
+            for _ in range(3):
+                await notifier.wait(0.01)
+            self.assertEqual(self.db.open_listener.call_count, 1)
+            self.assertEqual(notifier._backoff, 1.0)
+
+            # Once the backoff has passed the next wait reconnects and resets it
+            self.db.open_listener.side_effect = None
+            notifier._retry_at = 0.0
+            await notifier.wait(0.01)
+            notifier.stop()
+            return notifier
+
+        notifier = run_async(test())
+        self.assertIsNot(threads[0], threading.main_thread())
+        self.assertEqual(self.db.open_listener.call_count, 2)
+        self.assertEqual(notifier._backoff, 0.0)
+
+    def test_lost_connection_wakes_and_closes(self):
+        """Test a poll error closes the listener and wakes the poller"""
+        self.conn.poll.side_effect = Exception('server closed the connection')
+
+        async def test():
+            notifier = JobNotifier(self.db)
+            await notifier.start()
+            asyncio.get_running_loop().call_later(0.01, self.sock_b.send, b'x')
+            woke = await notifier.wait(5)
+            return woke, notifier.connected
+
+        woke, connected = run_async(test())
+        self.assertTrue(woke)
+        self.assertFalse(connected)
+        self.conn.close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+"""
+Unit tests for worker/pagination.py
+"""
+
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pagination import encode_cursor, decode_cursor
+
+
+class TestCursor(unittest.TestCase):
+    """Test opaque keyset cursors"""
+
+    def test_round_trip(self):
+        """Test a cursor decodes to the values it was built from"""
+        token = encode_cursor(2024, 'Q3', 917)
+        self.assertNotIn('=', token)
+        self.assertEqual(decode_cursor(token, (int, str, int)), (2024, 'Q3', 917))
+
+    def test_rejects_garbage_and_wrong_shape(self):
+        """Test tampered cursors raise ValueError"""
+        for token in ('not-base64!', encode_cursor(2024, 'Q3'), encode_cursor('x', 'Q3', 1),
+                      encode_cursor(True, 'Q3', 1)):
+            with self.assertRaises(ValueError):
+                decode_cursor(token, (int, str, int))
+
+
+if __name__ == '__main__':
+    unittest.main()
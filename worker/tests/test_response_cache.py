@@ -0,0 +1,80 @@
+"""
+Unit tests for worker/response_cache.py
+Tests TTL expiry, LRU eviction, namespace invalidation and counters.
+"""
+
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from response_cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test ResponseCache"""
+
+    def _put(self, cache, namespace, key, value, ttl=10):
+        cache.put(namespace, key, value, ttl, cache.generation(namespace))
+
+    def test_hit_and_miss_counters(self):
+        """Test hits and misses are counted per namespace"""
+        cache = ResponseCache()
+        self.assertIsNone(cache.get('jobs', 1))
+        self._put(cache, 'jobs', 1, {'id': 1})
+        self.assertEqual(cache.get('jobs', 1), {'id': 1})
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['by_namespace']['jobs'], {'hits': 1, 'misses': 1})
+
+    @patch('response_cache.time.monotonic')
+    def test_entries_expire(self, mock_now):
+        """Test entries are dropped once their TTL has passed"""
+        mock_now.return_value = 100.0
+        cache = ResponseCache()
+        self._put(cache, 'health', None, True, ttl=5)
+        mock_now.return_value = 104.9
+        self.assertTrue(cache.get('health', None))
+        mock_now.return_value = 105.0
+        self.assertIsNone(cache.get('health', None))
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted past max_entries"""
+        cache = ResponseCache(max_entries=2)
+        self._put(cache, 'filings', 'a', 1)
+        self._put(cache, 'filings', 'b', 2)
+        cache.get('filings', 'a')
+        self._put(cache, 'filings', 'c', 3)
+        self.assertIsNone(cache.get('filings', 'b'))
+        self.assertEqual(cache.get('filings', 'a'), 1)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_invalidate_namespace(self):
+        """Test invalidation drops only the named namespaces"""
+        cache = ResponseCache()
+        self._put(cache, 'jobs', 1, 'job')
+        self._put(cache, 'reports', 1, 'report')
+        cache.invalidate('jobs')
+        self.assertIsNone(cache.get('jobs', 1))
+        self.assertEqual(cache.get('reports', 1), 'report')
+
+    def test_put_after_invalidation_is_dropped(self):
+        """Test a value computed before a write is not cached after it"""
+        cache = ResponseCache()
+        generation = cache.generation('filings')
+        cache.invalidate('filings')  # a filing is saved while the listing query runs
+        cache.put('filings', 'page', ['stale'], 10, generation)
+        self.assertIsNone(cache.get('filings', 'page'))
+
+    def test_zero_ttl_disables(self):
+        """Test a TTL of 0 never stores anything"""
+        cache = ResponseCache()
+        self._put(cache, 'jobs', 1, 'job', ttl=0)
+        self.assertIsNone(cache.get('jobs', 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+Unit tests for worker/scheduler.py
+Tests queue position and start-time estimation.
+"""
+
+import unittest
+from datetime import datetime, timedelta, timezone
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from scheduler import estimate_start_times, DEFAULT_SECONDS_PER_FILE
+
+
+class TestEstimateStartTimes(unittest.TestCase):
+    """Test estimate_start_times"""
+
+    def setUp(self):
+        self.now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def test_positions_follow_queue_order(self):
+        """Test positions are 1-based in scheduler order"""
+        queue = [{'id': 5, 'estimated_files': 2}, {'id': 3, 'estimated_files': 100}]
+        result = estimate_start_times(queue, 0, 1.0, now=self.now)
+        self.assertEqual([(r['id'], r['queue_position']) for r in result], [(5, 1), (3, 2)])
+
+    def test_start_accounts_for_backlog_and_jobs_ahead(self):
+        """Test each job waits for running backlog plus the jobs ahead of it"""
+        queue = [{'id': 1, 'estimated_files': 10}, {'id': 2, 'estimated_files': 5}]
+        result = estimate_start_times(queue, 20, 2.0, now=self.now)
+        self.assertEqual(result[0]['estimated_start_at'], (self.now + timedelta(seconds=10)).isoformat())
+        self.assertEqual(result[1]['estimated_start_at'], (self.now + timedelta(seconds=15)).isoformat())
+
+    def test_unknown_throughput_uses_default(self):
+        """Test a cold fleet falls back to the rate-limiter bound"""
+        result = estimate_start_times([{'id': 1, 'estimated_files': 1}], 3, 0, now=self.now)
+        expected = self.now + timedelta(seconds=3 * DEFAULT_SECONDS_PER_FILE)
+        self.assertEqual(result[0]['estimated_start_at'], expected.isoformat())
+
+    def test_empty_queue(self):
+        """Test an empty queue yields no estimates"""
+        self.assertEqual(estimate_start_times([], 10, 1.0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
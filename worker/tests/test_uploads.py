@@ -0,0 +1,113 @@
+"""
+Unit tests for worker/uploads.py
+Tests the body-size middleware, incremental hashing and content sniffing.
+"""
+
+import hashlib
+import unittest
+from io import BytesIO
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from uploads import IngestReader, UploadLimitMiddleware, UploadTooLarge, sniff_content_type
+
+
+class TestIngestReader(unittest.TestCase):
+    """Test IngestReader"""
+
+    def test_counts_and_hashes_while_reading(self):
+        """Test size and SHA-256 match the whole file after chunked reads"""
+        content = os.urandom(1000)
+        reader = IngestReader(BytesIO(content), 1000)
+        chunks = list(iter(lambda: reader.read(64), b''))
+        self.assertEqual(b''.join(chunks), content)
+        self.assertEqual(reader.size, 1000)
+        self.assertEqual(reader.hexdigest(), hashlib.sha256(content).hexdigest())
+        self.assertEqual(reader.head, content[:64])
+
+    def test_limit_enforced_as_bytes_arrive(self):
+        """Test reading past max_bytes raises before the rest is consumed"""
+        source = BytesIO(b'x' * 100)
+        reader = IngestReader(source, 10)
+        reader.read(8)
+        with self.assertRaises(UploadTooLarge):
+            reader.read(8)
+        self.assertEqual(source.tell(), 16)
+
+    def test_content_type(self):
+        """Test a specific client type is kept and a generic one is sniffed"""
+        reader = IngestReader(BytesIO(b'%PDF-1.7'), 100, 'application/octet-stream')
+        reader.read()
+        self.assertEqual(reader.content_type, 'application/pdf')
+        reader.declared_type = 'application/x-custom'
+        self.assertEqual(reader.content_type, 'application/x-custom')
+        self.assertEqual(IngestReader(BytesIO(), 100).content_type, 'application/octet-stream')
+
+    def test_sniff(self):
+        self.assertEqual(sniff_content_type(b'PK\x03\x04rest'), 'application/zip')
+        self.assertEqual(sniff_content_type(b'\n <!DOCTYPE html><html>'), 'text/html')
+        self.assertIsNone(sniff_content_type(b'plain text'))
+
+
+class TestUploadLimitMiddleware(unittest.TestCase):
+    """Test UploadLimitMiddleware"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.reached = []
+        app = FastAPI()
+
+        @app.post('/upload')
+        async def upload(file: UploadFile = File(...)):
+            cls.reached.append(file.filename)
+            return {'size': len(await file.read())}
+
+        @app.post('/other')
+        async def other(file: UploadFile = File(...)):
+            return {'size': len(await file.read())}
+
+        app.add_middleware(UploadLimitMiddleware, paths=['/upload'], max_bytes=1024, overhead_bytes=256)
+        cls.client = TestClient(app)
+
+    def setUp(self):
+        self.reached.clear()
+
+    def test_within_limit_passes(self):
+        response = self.client.post('/upload', files={'file': ('a.pdf', b'x' * 1000)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'size': 1000})
+
+    def test_declared_length_rejected_before_reading(self):
+        """Test an oversized Content-Length is refused without running the endpoint"""
+        response = self.client.post('/upload', files={'file': ('a.pdf', b'x' * 4000)})
+        self.assertEqual(response.status_code, 413)
+        self.assertTrue(response.json()['detail'].startswith('File too large'))
+        self.assertEqual(self.reached, [])
+
+    def test_streamed_body_rejected_while_arriving(self):
+        """Test a chunked body without Content-Length is cut off at the limit"""
+        boundary = b'b0undary'
+        chunks = [
+            b'--' + boundary + b'\r\nContent-Disposition: form-data; name="file"; filename="a.pdf"\r\n\r\n',
+            *[b'x' * 512] * 8,
+            b'\r\n--' + boundary + b'--\r\n',
+        ]
+        response = self.client.post(
+            '/upload', content=iter(chunks),
+            headers={'Content-Type': 'multipart/form-data; boundary=b0undary'},
+        )
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.reached, [])
+
+    def test_other_paths_unlimited(self):
+        response = self.client.post('/other', files={'file': ('a.pdf', b'x' * 4000)})
+        self.assertEqual(response.status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Bounded-memory ingestion of uploaded reports.
+UploadLimitMiddleware rejects an upload with 413 as soon as its declared
+Content-Length, or the bytes actually received, pass the limit, before the
+multipart body has been read (let alone spooled). The spooled file is then
+fed to the database in chunks through IngestReader, which counts, hashes and
+sniffs the content as it goes, so no step ever holds the whole file.
+"""
+
+import hashlib
+from typing import BinaryIO, Iterable, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+# Multipart boundaries and the form fields around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+_GENERIC_TYPES = {'', 'application/octet-stream', 'binary/octet-stream'}
+
+_SIGNATURES = (
+    (b'%PDF-', 'application/pdf'),
+    (b'PK\x03\x04', 'application/zip'),  # also docx/xlsx/pptx
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/msword'),  # OLE2: doc/xls/ppt
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'{\\rtf', 'application/rtf'),
+)
+
+
+class UploadTooLarge(Exception):
+    """The upload went past max_upload_bytes"""
+
+
+def too_large_detail(max_bytes: int) -> str:
+    return f"File too large (max {max_bytes // (1024 * 1024)}MB)"
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Content type from the file's leading magic bytes, if recognised"""
+    for magic, content_type in _SIGNATURES:
+        if head.startswith(magic):
+            return content_type
+    stripped = head.lstrip()[:64].lower()
+    if stripped.startswith((b'<!doctype html', b'<html')):
+        return 'text/html'
+    return None
+
+
+class IngestReader:
+    """File-like view over an upload that enforces max_bytes while it is read
+    and keeps the running size, SHA-256 and first bytes for sniffing.
+    """
+
+    def __init__(self, source: BinaryIO, max_bytes: int, declared_type: Optional[str] = None):
+        self.source = source
+        self.max_bytes = max_bytes
+        self.declared_type = declared_type
+        self.size = 0
+        self.exceeded = False
+        self.head = b''
+        self._sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self.source.read(size)
+        if not chunk:
+            return b''
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            # psycopg2 swallows exceptions from a COPY source's read(); the
+            # flag lets the caller tell its QueryCanceled apart from others
+            self.exceeded = True
+            raise UploadTooLarge(too_large_detail(self.max_bytes))
+        if len(self.head) < 64:
+            self.head += chunk[:64 - len(self.head)]
+        self._sha256.update(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        return self._sha256.hexdigest()
+
+    @property
+    def content_type(self) -> str:
+        """The client's type unless it is missing or generic, then the sniffed one"""
+        if self.declared_type and self.declared_type.lower() not in _GENERIC_TYPES:
+            return self.declared_type
+        return sniff_content_type(self.head) or 'application/octet-stream'
+
+
+class UploadLimitMiddleware:
+    """Cap request bodies on the given paths at max_bytes + multipart overhead"""
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: int,
+                 overhead_bytes: int = MULTIPART_OVERHEAD_BYTES):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+        self.limit = max_bytes + overhead_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        detail = too_large_detail(self.max_bytes)
+        declared = dict(scope['headers']).get(b'content-length')
+        if declared and declared.isdigit() and int(declared) > self.limit:
+            response = JSONResponse({"detail": detail}, status_code=413, headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.limit:
+                    # Raised inside form parsing; FastAPI passes HTTPExceptions through
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)